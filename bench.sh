@@ -0,0 +1,10 @@
+#!/bin/sh
+
+#This script runs the benchmarks and stores the results of the current commit in bench_results/
+#Compare with an earlier run like this:
+# >> ./bench.sh --compare bench_results/bench_<commit>.json
+
+export PYTHONPATH='source/'
+
+mkdir -p bench_results
+python3 benchmarks/benchmark.py --output "bench_results/bench_$(git rev-parse --short HEAD).json" "$@"
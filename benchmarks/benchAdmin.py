@@ -0,0 +1,51 @@
+#!/bin/python3
+"""
+File: benchAdmin.py
+Desc: Compares the operations on many accounts (re-encrypt, audit, export) in one process (like
+      sequential sessions) and in a pool of processes. The speedup is bounded by the number of cores.
+      Run it with: PYTHONPATH=source/ python3 benchmarks/benchAdmin.py [--users 8] [--entries 2000]
+"""
+
+import os
+import time
+import argparse
+import tempfile
+from typing import Callable
+import keyDerivation
+import vaultAdmin
+import vaultGenerator
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the parallel multi-account operations")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--entries", type=int, default=2000, help="entries per user")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--kdf", default=keyDerivation.DEFAULT_PARAMS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "vault.kwv")
+        users = vaultGenerator.createVault(path, vaultGenerator.VaultGenerator(42), args.users, args.entries)
+        keys = {user: vaultGenerator.DEFAULT_PASSWORD for user in users}
+        #All runs unlock keys with the same parameters
+        vaultAdmin.reencryptAccounts(path, keys, args.workers, args.kdf)
+        #An empty local database, so the audit does not measure the network
+        pwnedPath = os.path.join(directory, "pwned.bin")
+        open(pwnedPath, "wb").close() #pylint: disable=consider-using-with
+        operations: dict[str, Callable[[int], object]] = {
+            "reencrypt": lambda workers: vaultAdmin.reencryptAccounts(path, keys, workers, args.kdf),
+            "audit": lambda workers: vaultAdmin.auditAccounts(path, keys, workers, pwnedPath),
+            "export": lambda workers: vaultAdmin.exportAccounts(path, keys, directory, "jsonl", None, workers)
+        }
+        print(f"{args.users} users x {args.entries} entries, {os.cpu_count()} cores")
+        print(f"{'operation':<10}{'1 worker s':>12}{f'{args.workers} workers s':>14}{'speedup':>9}")
+        for name, operation in operations.items():
+            times = []
+            for workers in (1, args.workers):
+                start = time.perf_counter()
+                operation(workers)
+                times.append(time.perf_counter() - start)
+            print(f"{name:<10}{times[0]:>12.2f}{times[1]:>14.2f}{times[0] / times[1]:>9.2f}")
+
+if __name__ == "__main__":
+    main()
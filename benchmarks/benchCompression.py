@@ -0,0 +1,61 @@
+#!/bin/python3
+"""
+File: benchCompression.py
+Desc: Compares the compression methods of the records on synthetic vaults with short and with long
+      notices: the file size, the time to write all entries, the save of one changed entry and the
+      start of a session (all entries are decrypted and decompressed).
+      Run it with: PYTHONPATH=source/ python3 benchmarks/benchCompression.py [--entries 20000] [--notes-words 8 64]
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import cryptor
+import recordCompression
+import dataHandler
+import vaultConverter
+import vaultGenerator
+import benchmark
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the compression of the records")
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--notes-words", type=float, nargs="+", default=[8.0, 64.0], help="mean number of words of a notice")
+    parser.add_argument("--format", choices=list(dataHandler.STORAGES), default="csv")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.entries} entries, {args.format}")
+    print(f"{'words':>6}{'method':>7}{'MiB':>8}{'write s':>9}{'save ms':>9}{'load ms':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for words in args.notes_words:
+            for method in recordCompression.METHODS:
+                path = os.path.join(directory, f"vault{words}{method}.csv")
+                start = time.perf_counter()
+                users = vaultGenerator.createVault(path, vaultGenerator.VaultGenerator(42, notesWords=words), 1,
+                                                   args.entries, compressionMethod=method)
+                write = time.perf_counter() - start
+                if args.format != "csv":
+                    source = path
+                    path = os.path.join(directory, f"vault{words}{method}.{args.format}")
+                    vaultConverter.convertVault(source, path, args.format)
+                handler = dataHandler.DataHandler(cryptor.Cryptor())
+                vaultGenerator.unlock(handler, path, users[0])
+
+                def login() -> None:
+                    handler.openFile(path)
+                    handler.getKey(users[0])
+                load = benchmark.measure(handler.startSession, args.repeat, login)
+                category = handler.getCategories()[0]
+                title = handler.getEntries(category)[0]
+                notices = handler.getEntry(category, title)["notices"]
+                #Every save writes the changed entry and the meta record
+                save = benchmark.measure(handler.saveEntries, args.repeat,
+                                         lambda: handler.changeEntry(category, title, "notices", notices + "."))
+                handler.closeSession()
+                print(f"{words:>6.0f}{method:>7}{os.path.getsize(path) / 1024 / 1024:>8.2f}{write:>9.2f}"
+                      f"{save['p50'] * 1000:>9.2f}{load['p50'] * 1000:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/bin/python3
+"""
+File: benchFormat.py
+Desc: Compares the size, the load time and the save time of the vault formats on the same vault.
+      Run it with: PYTHONPATH=source/ python3 benchmarks/benchFormat.py [--users 8] [--entries 5000]
+"""
+
+import os
+import argparse
+import tempfile
+import cryptor
+import dataHandler
+import vaultConverter
+import vaultGenerator
+import benchmark
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the vault formats")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--entries", type=int, default=5000, help="entries per user")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {fileFormat: os.path.join(directory, f"vault.{fileFormat}") for fileFormat in dataHandler.STORAGES}
+        users = vaultGenerator.createVault(paths["csv"], vaultGenerator.VaultGenerator(42), args.users, args.entries)
+        for fileFormat, path in paths.items():
+            if fileFormat != "csv":
+                vaultConverter.convertVault(paths["csv"], path, fileFormat)
+        user = users[len(users) // 2]
+        print(f"Vault with {args.users} users x {args.entries} entries")
+        print(f"{'format':<8}{'MiB':>8}{'open ms':>10}{'load ms':>10}{'session ms':>12}{'save ms':>10}")
+        for fileFormat, path in paths.items():
+            handler = dataHandler.DataHandler(cryptor.Cryptor())
+            vaultGenerator.unlock(handler, path, user)
+
+            def login() -> None:
+                handler.openFile(path)
+                handler.getKey(user)
+            #open: the index of the file, load: the records of one user, session: load and decrypt them
+            opened = benchmark.measure(lambda: dataHandler.openStorage(path).getUsers(), args.repeat)
+            storage = dataHandler.openStorage(path)
+            loaded = benchmark.measure(lambda: storage.loadRecords(user), args.repeat)
+            session = benchmark.measure(handler.startSession, args.repeat, login)
+            #save: one changed entry
+            category = handler.getCategories()[0]
+            title = handler.getEntries(category)[0]
+            counter = [0]
+            def change() -> None:
+                counter[0] += 1
+                handler.changeEntry(category, title, "notices", f"changed {counter[0]}")
+            saved = benchmark.measure(handler.saveEntries, args.repeat, change)
+            handler.closeSession()
+            print(f"{fileFormat:<8}{os.path.getsize(path) / 1024 / 1024:>8.2f}{opened['p50'] * 1000:>10.2f}"
+                  f"{loaded['p50'] * 1000:>10.2f}{session['p50'] * 1000:>12.2f}{saved['p50'] * 1000:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/bin/python3
+"""
+File: benchLazy.py
+Desc: Compares the start of a session (time to the menu and the memory kept by the session) and the
+      first access of an entry with and without lazy decryption for growing vaults. A lazy session
+      still keeps the encrypted tokens, so its memory grows with the vault by their size only.
+      Run it with: PYTHONPATH=source/ python3 benchmarks/benchLazy.py [--entries 1000 10000 50000]
+"""
+
+import os
+import argparse
+import tempfile
+import tracemalloc
+import cryptor
+import dataHandler
+import vaultGenerator
+import benchmark
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the lazy decryption")
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'entries':>8}{'mode':>7}{'start ms':>11}{'kept MiB':>10}{'getEntry ms':>13}")
+    with tempfile.TemporaryDirectory() as directory:
+        for entries in args.entries:
+            path = os.path.join(directory, f"vault{entries}.kwv")
+            users = vaultGenerator.createVault(path, vaultGenerator.VaultGenerator(42), 1, entries)
+            for lazy in (False, True):
+                handler = dataHandler.DataHandler(cryptor.Cryptor())
+                vaultGenerator.unlock(handler, path, users[0])
+                handler.setLazyMode(lazy)
+
+                def login() -> None:
+                    handler.openFile(path)
+                    handler.getKey(users[0])
+                start = benchmark.measure(handler.startSession, args.repeat, login)
+                handler.closeSession()
+                login()
+                tracemalloc.start()
+                handler.startSession()
+                kept = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                category = handler.getCategories()[0]
+                titles = iter(handler.getEntries(category))
+                #Every call opens another entry, so a lazy session decrypts it
+                first = benchmark.measure(lambda: handler.getEntry(category, next(titles)), args.repeat)
+                handler.closeSession()
+                print(f"{entries:>8}{'lazy' if lazy else 'eager':>7}{start['p50'] * 1000:>11.2f}"
+                      f"{kept / 1024 / 1024:>10.2f}{first['p50'] * 1000:>13.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/bin/python3
+"""
+File: benchRekey.py
+Desc: Measures the change of the master password (re-encryption of all records) of one big account:
+      the time and the peak memory of the streaming re-key against encrypting all records at once.
+      Run it with: PYTHONPATH=source/ python3 benchmarks/benchRekey.py [--entries 20000 100000]
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+from typing import Callable
+import cryptor
+import dataHandler
+import vaultConverter
+import vaultGenerator
+
+def measureRekey(path: str) -> list[tuple[str, float, int]]:
+    """Returns the seconds and the peak memory in bytes of both ways to re-key the first user"""
+    handler = dataHandler.DataHandler(cryptor.Cryptor())
+    handler.getCryptor().setKdfParams("pbkdf2-sha256$i=1000")
+    password = vaultGenerator.DEFAULT_PASSWORD
+
+    def streaming() -> None:
+        handler.changeKey(password)
+
+    def atOnce() -> None:
+        #All records are decrypted and encrypted in memory and written as one dict
+        storage = dataHandler.openStorage(path)
+        records, version = storage.loadRecords("user0")
+        hashedKey, newCryptor = handler.getCryptor().rekey(password)
+        encrypted = {recordId: newCryptor.encryptBytes(handler.getCryptor().decryptBytes(token)) for recordId, token in records.items()}
+        storage.replaceAccount("user0", hashedKey, encrypted.items(), version)
+
+    results = []
+    modes: dict[str, Callable[[], None]] = {"at once": atOnce, "streaming": streaming}
+    for mode, function in modes.items():
+        handler.openFile(path)
+        handler.getCryptor().isCorrectKey(password, handler.getKey("user0"))
+        tracemalloc.start()
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results.append((mode, seconds, peak))
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the master password change")
+    parser.add_argument("--entries", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--format", choices=list(dataHandler.STORAGES), default="csv")
+    args = parser.parse_args()
+
+    print(f"{'entries':>8}{'MiB':>8}{'mode':>11}{'seconds':>9}{'peak MiB':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for entries in args.entries:
+            source = os.path.join(directory, f"vault{entries}.csv")
+            vaultGenerator.createVault(source, vaultGenerator.VaultGenerator(42), 1, entries)
+            path = source
+            if args.format != "csv":
+                path = os.path.join(directory, f"vault{entries}.{args.format}")
+                vaultConverter.convertVault(source, path, args.format)
+            for mode, seconds, peak in measureRekey(path):
+                print(f"{entries:>8}{os.path.getsize(path) / 1024 / 1024:>8.1f}{mode:>11}{seconds:>9.2f}{peak / 1024 / 1024:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/bin/python3
+"""
+File: benchSearch.py
+Desc: Compares the search with the inverted index against the former scan over all entries.
+      Run it with: PYTHONPATH=source/ python3 benchmarks/benchSearch.py [--entries 50000]
+"""
+
+import time
+import random
+import string
+import argparse
+import searchIndex
+
+def scanSearch(entries: dict[str, dict[str, dict[str, str]]], keyWord: str) -> dict[str, list[str]]:
+    """The search before the index: walks every category x title x property"""
+    result: dict[str, list[str]] = {}
+    for category in entries.keys():
+        for title in entries[category].keys():
+            for prop in entries[category][title].keys():
+                if keyWord in entries[category][title][prop] or keyWord in title or keyWord in category:
+                    if not category in result.keys(): #pylint: disable=consider-iterating-dictionary
+                        result[category] = []
+                    if not title in result[category]:
+                        result[category].append(title)
+    return result
+
+def randomWord(generator: random.Random, length: int) -> str:
+    """Returns a random word of letters and digits"""
+    return "".join(generator.choice(string.ascii_letters + string.digits) for _ in range(length))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the search index")
+    parser.add_argument("--entries", type=int, default=50000)
+    count = parser.parse_args().entries
+    generator = random.Random(42)
+    entries: dict[str, dict[str, dict[str, str]]] = {}
+    index = searchIndex.SearchIndex()
+    categories = [randomWord(generator, 8) for _ in range(20)]
+
+    for number in range(count):
+        entry = {
+            "name": randomWord(generator, 12),
+            "password": randomWord(generator, 16),
+            "url": f"https://{randomWord(generator, 10)}.com",
+            "notices": " ".join(randomWord(generator, 6) for _ in range(5)),
+            "timestamp": "2024-07-27 12:00:00"
+        }
+        entries.setdefault(generator.choice(categories), {})[f"{randomWord(generator, 10)}{number}"] = entry
+
+    start = time.perf_counter()
+    number = 0
+    for category, titles in entries.items():
+        for title, entry in titles.items():
+            index.add(str(number), category, title, entry)
+            number += 1
+    print(f"{count} entries, index built in {time.perf_counter() - start:.2f} s")
+
+    selective = [randomWord(generator, 5) for _ in range(20)] + [next(iter(entries[categories[0]]))]
+    broad = ["https", "2024", categories[0], "a"]
+    for queries, keyWords in (("selective", selective), ("broad", broad)):
+        for name, function in (("scan", lambda keyWord: scanSearch(entries, keyWord)), ("index", index.search)):
+            start = time.perf_counter()
+            for keyWord in keyWords:
+                function(keyWord)
+            duration = (time.perf_counter() - start) / len(keyWords)
+            print(f"{queries:>9} {name:>5}: {duration * 1000:9.3f} ms per search")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/bin/python3
+"""
+File: benchWrite.py
+Desc: Measures the cost of a save under every fsync policy, with a full rewrite and in journal mode.
+      Run it with: PYTHONPATH=source/ python3 benchmarks/benchWrite.py [--users 4] [--entries 2000] [--dir DIR]
+      Use --dir to measure on the file system the vaults are stored on (tmp is often in memory).
+"""
+
+import os
+import shutil
+import argparse
+import tempfile
+import cryptor
+import vaultFile
+import dataHandler
+import vaultGenerator
+import benchmark
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the fsync policies")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--entries", type=int, default=2000, help="entries per user")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--dir", help="directory for the vault files")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        template = os.path.join(directory, "template.kwv")
+        users = vaultGenerator.createVault(template, vaultGenerator.VaultGenerator(42), args.users, args.entries)
+        print(f"Vault with {args.users} users x {args.entries} entries ({os.path.getsize(template) / 1024 / 1024:.1f} MiB)")
+        print(f"{'policy':<8}{'mode':<9}{'save p50 ms':>13}{'save p90 ms':>13}{'close p50 ms':>14}")
+        for policy in vaultFile.FSYNC_POLICIES:
+            for journal in (False, True):
+                path = os.path.join(directory, f"{policy}.kwv")
+                shutil.copyfile(template, path)
+                handler = dataHandler.DataHandler(cryptor.Cryptor())
+                vaultGenerator.unlock(handler, path, users[0])
+                handler.setFsyncPolicy(policy)
+                handler.setJournalMode(journal)
+
+                def openSession() -> None:
+                    handler.openFile(path)
+                    handler.getKey(users[0])
+                    handler.startSession()
+                openSession()
+                category = handler.getCategories()[0]
+                title = handler.getEntries(category)[0]
+                counter = [0]
+                def change() -> None:
+                    counter[0] += 1
+                    handler.changeEntry(category, title, "notices", f"changed {counter[0]}")
+                save = benchmark.measure(handler.saveEntries, args.repeat, change)
+                handler.closeSession()
+                def prepareClose() -> None:
+                    openSession()
+                    change()
+                close = benchmark.measure(handler.closeSession, args.repeat, prepareClose)
+                print(f"{policy:<8}{'journal' if journal else 'rewrite':<9}{save['p50'] * 1000:>13.3f}"
+                      f"{save['p90'] * 1000:>13.3f}{close['p50'] * 1000:>14.3f}")
+
+if __name__ == "__main__":
+    main()
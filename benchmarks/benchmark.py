@@ -0,0 +1,166 @@
+#!/bin/python3
+"""
+File: benchmark.py
+Desc: Measures the hot paths of DataHandler and Cryptor on a synthetic vault. Reports throughput,
+      latency percentiles and peak memory per operation and stores them as JSON, so the results of
+      two commits can be compared with --compare.
+      Run it with: PYTHONPATH=source/ python3 benchmarks/benchmark.py [--output results.json]
+"""
+
+import os
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import tracemalloc
+import http.server
+import subprocess
+from typing import Callable
+import cryptor
+import dataHandler
+import vaultGenerator
+
+def startRangeServer() -> http.server.ThreadingHTTPServer:
+    """Starts a local stand-in for the range API, so isSafe does not depend on the network"""
+    class RangeHandler(http.server.BaseHTTPRequestHandler):
+        """Answers every prefix with the same synthetic suffixes"""
+        def do_GET(self) -> None: #pylint: disable=invalid-name
+            body = "".join(f"{number:035X}:1\r\n" for number in range(800)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: object) -> None: #pylint: disable=arguments-differ
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def measure(function: Callable[[], object], repeat: int, setup: Callable[[], object] = lambda: None) -> dict[str, float]:
+    """Runs a function repeatedly. setup runs before every call and is not measured"""
+    durations = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    setup()
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    durations.sort()
+    def percentile(value: float) -> float:
+        return durations[min(len(durations) - 1, int(value * len(durations)))]
+    return {
+        "calls": repeat,
+        "throughput": repeat / sum(durations),
+        "mean": sum(durations) / repeat,
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": durations[-1],
+        "peakMemory": peak
+    }
+
+def runBenchmarks(path: str, repeat: int, users: list[str]) -> dict[str, dict[str, float]]:
+    handler = dataHandler.DataHandler(cryptor.Cryptor())
+    user = users[len(users) // 2]
+    results: dict[str, dict[str, float]] = {}
+
+    #The key derivation of a login, it is cached afterwards -> few runs with an empty cache
+    results["unlock"] = measure(lambda: vaultGenerator.unlock(handler, path, user), min(repeat, 5), handler.getCryptor().clearKeyCache)
+
+    def login() -> None:
+        handler.openFile(path)
+        handler.getKey(user)
+
+    def openSession() -> None:
+        login()
+        handler.startSession()
+
+    results["getUsers"] = measure(handler.getUsers, repeat, login)
+    results["startSession"] = measure(handler.startSession, repeat, login)
+    handler.closeSession()
+
+    openSession()
+    category = handler.getCategories()[0]
+    title = handler.getEntries(category)[0]
+    counter = [0]
+    def changeEntry() -> None:
+        counter[0] += 1
+        handler.changeEntry(category, title, "notices", f"changed {counter[0]}")
+    results["saveEntries"] = measure(handler.saveEntries, repeat, changeEntry)
+    results["searchEntry"] = measure(lambda: handler.searchEntry("abc"), repeat)
+    handler.closeSession()
+
+    def prepareClose() -> None:
+        openSession()
+        changeEntry()
+    results["closeSession"] = measure(handler.closeSession, repeat, prepareClose)
+
+    results["genPassword"] = measure(lambda: handler.getCryptor().genPassword(24, True, True, True, True, ""), repeat)
+    server = startRangeServer()
+    handler.getCryptor().setPwnedApi(f"http://127.0.0.1:{server.server_address[1]}/range/")
+    results["isSafe"] = measure(lambda: handler.getCryptor().isSafe("Bench!Password123"), repeat)
+    server.shutdown()
+    return results
+
+def getRevision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def printResults(results: dict[str, dict[str, float]], previous: dict[str, dict[str, float]]) -> None:
+    print(f"{'operation':<14}{'ops/s':>12}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'peak KiB':>11}{'p50 change':>12}")
+    for name, result in results.items():
+        change = ""
+        if name in previous:
+            change = f"{(result['p50'] / previous[name]['p50'] - 1) * 100:+.1f} %"
+        print(f"{name:<14}{result['throughput']:>12.1f}{result['p50'] * 1000:>10.3f}{result['p90'] * 1000:>10.3f}"
+              f"{result['p99'] * 1000:>10.3f}{result['peakMemory'] / 1024:>11.1f}{change:>12}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks of DataHandler and Cryptor")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--categories", type=int, default=10)
+    parser.add_argument("--entries", type=int, default=200, help="entries per category")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="stores the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.kwv")
+        start = time.perf_counter()
+        generator = vaultGenerator.VaultGenerator(args.seed, args.categories)
+        users = vaultGenerator.createVault(path, generator, args.users, args.categories * args.entries)
+        print(f"Vault with {args.users} users x {args.categories * args.entries} entries "
+              f"({os.path.getsize(path) / 1024 / 1024:.1f} MiB) created in {time.perf_counter() - start:.1f} s")
+        results = runBenchmarks(path, args.repeat, users)
+
+    previous: dict[str, dict[str, float]] = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            previous = json.load(file)["results"]
+    printResults(results, previous)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({
+                "revision": getRevision(),
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "parameters": vars(args),
+                "results": results
+            }, file, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/bin/python3
+"""
+File: vaultGenerator.py
+Desc: Generates synthetic vault files for load and scale tests. The files are written through the
+      DataHandler, so they look like files of the TUI. All users share one password, but every account
+      has an own master key wrapped with its own salt. Every user is saved once, so the encryption of
+      all entries happens in bulk. The content only depends
+      on the seed (the record ids and the Fernet tokens are random anyway).
+      Run it with: PYTHONPATH=source/ python3 benchmarks/vaultGenerator.py <out.kwv> [--entries 100000]
+"""
+
+import os
+import time
+import random
+import string
+import argparse
+from typing import Optional
+import cryptor
+import recordCompression
+import dataHandler
+import keyDerivation
+
+DEFAULT_PASSWORD = "Bench!Key123"
+
+SITES = ["mail", "shop", "bank", "cloud", "forum", "news", "games", "music", "video", "travel",
+         "health", "office", "school", "social", "photo", "dev", "wiki", "market", "chat", "energy"]
+DOMAINS = ["com", "de", "org", "net", "io", "eu"]
+WORDS = ["login", "backup", "work", "private", "old", "new", "family", "shared", "admin", "test",
+         "pin", "recovery", "code", "account", "contract", "number", "question", "answer", "phone", "mail"]
+#Number of random words the texts are built from (drawing single characters is too slow for big vaults)
+POOL_SIZE = 8192
+
+CATEGORIES = ["Internet", "Banking", "Shopping", "Work", "Email", "Social", "Games", "Streaming",
+              "Travel", "Health", "Insurance", "Devices", "Wifi", "Servers", "School", "Family"]
+
+class VaultGenerator:
+    """Class for generating the content of synthetic vaults"""
+
+    def __init__(self, seed: int, categories: int = 12, categorySkew: float = 1.0, notesWords: float = 8.0,
+                 notesMax: int = 200, urlShare: float = 0.8, urlDepth: float = 1.0) -> None:
+        """categorySkew: zipf exponent of the category sizes (0 = all equal)
+        notesWords: mean number of words of a notice (exponential), cut at notesMax
+        urlShare: share of entries with an url, urlDepth: mean number of path elements"""
+        self.__generator = random.Random(seed)
+        self.__categories = [CATEGORIES[number % len(CATEGORIES)] + ("" if number < len(CATEGORIES) else str(number // len(CATEGORIES)))
+                             for number in range(categories)]
+        self.__weights = [1 / (rank + 1) ** categorySkew for rank in range(categories)]
+        self.__notesWords = notesWords
+        self.__notesMax = notesMax
+        self.__urlShare = urlShare
+        self.__urlDepth = urlDepth
+        self.__pool = ["".join(self.__generator.choices(string.ascii_lowercase + string.digits, k=self.__generator.randint(2, 10)))
+                       for _ in range(POOL_SIZE)] + WORDS * (POOL_SIZE // len(WORDS))
+
+    def __word(self) -> str:
+        return self.__pool[int(self.__generator.random() * len(self.__pool))]
+
+    def __count(self, mean: float, maximum: int) -> int:
+        if mean <= 0:
+            return 0
+        return min(maximum, int(self.__generator.expovariate(1 / mean)))
+
+    def getCategories(self) -> list[str]:
+        return self.__categories
+
+    def genEntry(self) -> tuple[str, dict[str, str]]:
+        """Returns the category and the fields of a new entry (title is the key "title")"""
+        site = self.__generator.choice(SITES)
+        domain = f"{site}{self.__word()}.{self.__generator.choice(DOMAINS)}"
+        url = ""
+        if self.__generator.random() < self.__urlShare:
+            path = "/".join(self.__word() for _ in range(self.__count(self.__urlDepth, 8)))
+            url = f"https://www.{domain}/{path}"
+        notices = " ".join(self.__word() for _ in range(self.__count(self.__notesWords, self.__notesMax)))
+        password = "".join(self.__generator.choices(string.ascii_letters + string.digits + "!?#$%&", k=self.__generator.randint(8, 24)))
+        day = self.__generator.randint(0, 3650)
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(1400000000 + day * 86400 + self.__generator.randint(0, 86399)))
+        category = self.__generator.choices(self.__categories, self.__weights)[0]
+        return (category, {
+            "title": domain,
+            "name": f"{self.__word()}@{self.__generator.choice(SITES)}.{self.__generator.choice(DOMAINS)}",
+            "password": password,
+            "url": url,
+            "notices": notices,
+            "timestamp": timestamp
+        })
+
+    def fillSession(self, handler: dataHandler.DataHandler, entries: int) -> None:
+        """Adds categories and entries to the open session of a DataHandler without saving in between"""
+        titles: dict[str, set[str]] = {}
+        for category in self.__categories:
+            handler.addCategory(category)
+            titles[category] = set()
+        for _ in range(entries):
+            category, entry = self.genEntry()
+            title = base = entry.pop("title")
+            number = 1
+            while title in titles[category]:
+                number += 1
+                title = f"{base} ({number})"
+            titles[category].add(title)
+            handler.addEntry(category, title, entry["name"], entry["password"], entry["url"], entry["notices"], entry["timestamp"])
+
+def unlock(handler: dataHandler.DataHandler, path: str, user: str, password: str = DEFAULT_PASSWORD) -> None:
+    """Opens the file and unwraps the master key of the user like a login. Raises ValueError for a wrong password"""
+    handler.openFile(path)
+    if not handler.getCryptor().isCorrectKey(password, handler.getKey(user)):
+        raise ValueError(f"Wrong password for {user}")
+
+def createVault(path: str, generator: VaultGenerator, users: int, entries: int, password: str = DEFAULT_PASSWORD,
+                compressionMethod: Optional[str] = None, kdfParams: str = keyDerivation.DEFAULT_PARAMS) -> list[str]:
+    """Creates a vault file with the given users, each with the given number of entries, the given
+    compression of the records (None: the default) and keys derived with the given parameters. Returns the users"""
+    handler = dataHandler.DataHandler(cryptor.Cryptor())
+    handler.getCryptor().setKdfParams(kdfParams)
+    if compressionMethod is not None:
+        handler.setCompression(compressionMethod)
+    names = [f"user{number}" for number in range(users)]
+    #newKey creates the master key of the account, its empty records are encrypted with it
+    handler.createFile(path, names[0], handler.getCryptor().newKey(password))
+    handler.openFile(path)
+    for name in names[1:]:
+        handler.addUser(name, handler.getCryptor().newKey(password))
+    for name in names:
+        unlock(handler, path, name, password)
+        handler.startSession()
+        generator.fillSession(handler, entries)
+        #One save per user -> all entries of the user are encrypted and written at once
+        handler.closeSession()
+    return names
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generates synthetic vault files")
+    parser.add_argument("path", help="the vault file to create (must not exist)")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--entries", type=int, default=100000, help="entries per user")
+    parser.add_argument("--categories", type=int, default=12)
+    parser.add_argument("--category-skew", type=float, default=1.0, help="zipf exponent of the category sizes")
+    parser.add_argument("--notes-words", type=float, default=8.0, help="mean number of words of a notice")
+    parser.add_argument("--notes-max", type=int, default=200, help="maximal number of words of a notice")
+    parser.add_argument("--url-share", type=float, default=0.8, help="share of entries with an url")
+    parser.add_argument("--url-depth", type=float, default=1.0, help="mean number of path elements of an url")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="master password of all users")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compression", choices=recordCompression.METHODS, help="compression of the records (default: the one of new accounts)")
+    parser.add_argument("--kdf", default=keyDerivation.DEFAULT_PARAMS, help="key derivation parameters of the accounts")
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        print(f"{args.path} already exists!")
+        raise SystemExit(1)
+    generator = VaultGenerator(args.seed, args.categories, args.category_skew, args.notes_words,
+                               args.notes_max, args.url_share, args.url_depth)
+    start = time.perf_counter()
+    createVault(args.path, generator, args.users, args.entries, args.password, args.compression, args.kdf)
+    print(f"Wrote {args.users} users x {args.entries} entries ({os.path.getsize(args.path) / 1024 / 1024:.1f} MiB) "
+          f"to {args.path} in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
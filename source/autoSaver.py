@@ -0,0 +1,87 @@
+#!/bin/python3
+"""
+File: autoSaver.py
+Desc: Implements a background save for the TUI. Every change schedules a save, the save runs in a
+      worker thread after a short quiet period, so rapid changes are written at once and the user
+      interface never waits on the encryption or the file.
+"""
+
+import time
+import threading
+from typing import Callable, Optional
+
+#Seconds without a new change before the save starts
+DEFAULT_DELAY = 1.0
+
+class AutoSaver:
+    """Class for running a debounced save function in a worker thread"""
+
+    def __init__(self, save: Callable[[], None], delay: float = DEFAULT_DELAY) -> None:
+        self.__save = save
+        self.__delay = delay
+        self.__condition = threading.Condition()
+        #Time (monotonic) of the pending save or None
+        self.__due: Optional[float] = None
+        self.__saving = False
+        self.__stopped = False
+        self.__error: Optional[Exception] = None
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__stopped and (self.__due is None or self.__due > time.monotonic()):
+                    self.__condition.wait(None if self.__due is None else self.__due - time.monotonic())
+                if self.__stopped:
+                    return
+                self.__due = None
+                self.__saving = True
+            self.__runSave()
+
+    def __runSave(self) -> None:
+        try:
+            self.__save()
+        except Exception as error: #pylint: disable=broad-exception-caught
+            #The worker has nobody to tell -> the error is raised by the next flush
+            self.__error = error
+        finally:
+            with self.__condition:
+                self.__saving = False
+                self.__condition.notify_all()
+
+    def schedule(self) -> None:
+        """Requests a save. Every call moves the save to the end of the quiet period"""
+        with self.__condition:
+            self.__due = time.monotonic() + self.__delay
+            self.__condition.notify_all()
+
+    def isPending(self) -> bool:
+        with self.__condition:
+            return self.__due is not None or self.__saving
+
+    def flush(self) -> None:
+        """Waits for a running save and runs a pending save at once. Raises the error of a failed save"""
+        with self.__condition:
+            while self.__saving:
+                self.__condition.wait()
+            pending = self.__due is not None
+            self.__due = None
+            if pending:
+                self.__saving = True
+        if pending:
+            self.__runSave()
+        error = self.__error
+        self.__error = None
+        if error is not None:
+            raise error
+
+    def stop(self) -> None:
+        """Flushes and ends the worker thread"""
+        try:
+            self.flush()
+        finally:
+            with self.__condition:
+                self.__stopped = True
+                self.__condition.notify_all()
+            self.__thread.join()
@@ -0,0 +1,346 @@
+#!/bin/python3
+"""
+File: binaryStorage.py
+Desc: Implements the storage of the encrypted records in a binary container. The records are stored as
+      the raw bytes of their Fernet tokens (no base64, no csv quoting) and an account table with the
+      offsets of the record blocks is read on open, so loading an account reads its block only.
+      Layout (little endian):
+        header   magic "KWVB", format version u16, flags u16, accounts u32, table length u32, data end u64
+        table    per account: name length u16, key length u16, version u64, offset u64, length u64, name, key
+        blocks   per account: records of id length u8, data length u32, id, raw token
+        journal  frames from the data end to the end of the file: "J", length u32, then
+                 name length u16, version u64, name and the changed records (data length 0: removed)
+"""
+
+import os
+import base64
+import struct
+from typing import BinaryIO, Iterable, Iterator, Optional
+import vaultFile
+import versionConflictException
+
+MAGIC = b"KWVB"
+FORMAT_VERSION = 1
+#Compact the file on close if it holds more journal frames
+JOURNAL_LIMIT = 64
+
+HEADER = struct.Struct("<4sHHIIQ")
+TABLE_ENTRY = struct.Struct("<HHQQQ")
+RECORD = struct.Struct("<BI")
+FRAME = struct.Struct("<cI")
+FRAME_ACCOUNT = struct.Struct("<HQ")
+FRAME_MARKER = b"J"
+
+def packRecords(records: dict[str, str], removed: frozenset[str] = frozenset()) -> bytes:
+    """Packs the records with the raw bytes of their tokens, removed records get an empty data"""
+    parts = []
+    for recordId, token in records.items():
+        rawId = recordId.encode("utf-8")
+        data = base64.urlsafe_b64decode(token)
+        parts.append(RECORD.pack(len(rawId), len(data)) + rawId + data)
+    for recordId in removed:
+        rawId = recordId.encode("utf-8")
+        parts.append(RECORD.pack(len(rawId), 0) + rawId)
+    return b"".join(parts)
+
+def unpackRecords(block: bytes, records: dict[str, str]) -> None:
+    """Adds the records of a block to records (and deletes the removed records)"""
+    view = memoryview(block)
+    offset = 0
+    while offset < len(view):
+        idLength, dataLength = RECORD.unpack_from(view, offset)
+        offset += RECORD.size
+        recordId = bytes(view[offset:offset + idLength]).decode("utf-8")
+        offset += idLength
+        if dataLength == 0:
+            records.pop(recordId, None)
+            continue
+        records[recordId] = base64.urlsafe_b64encode(view[offset:offset + dataLength]).decode("ascii")
+        offset += dataLength
+
+class BinaryStorage:
+    """Class for storing records in a binary container"""
+
+    def __init__(self, path: str) -> None:
+        self.__path = path
+        self.__journalMode = False
+        self.__fsyncPolicy = vaultFile.DEFAULT_FSYNC
+        #account -> (key, version, offset, length) of the block
+        self.__table: dict[str, tuple[str, int, int, int]] = {}
+        #account -> (offset, length) of the records of its journal frames
+        self.__journal: dict[str, list[tuple[int, int]]] = {}
+        self.__journalFrames = 0
+        #End of the last complete journal frame, bytes behind it are the rest of a cut off frame
+        self.__journalEnd = 0
+        #account -> version of its last block or frame
+        self.__versions: dict[str, int] = {}
+        #(inode, mtime, size) of the file when the table was read
+        self.__stamp: tuple[int, int, int] = (-1, -1, -1)
+        with vaultFile.locked(self.__path, False):
+            self.__ensureIndex()
+
+    def __ensureIndex(self) -> None:
+        """Reads the account table and scans the journal frames if the file changed since the last time"""
+        stamp = vaultFile.getStamp(self.__path)
+        if stamp == self.__stamp:
+            return
+        self.__table = {}
+        self.__journal = {}
+        self.__journalFrames = 0
+        self.__versions = {}
+        with open(self.__path, "rb") as file:
+            magic, formatVersion, _, accounts, tableLength, dataEnd = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or formatVersion > FORMAT_VERSION:
+                raise ValueError(f"{self.__path} is no binary vault of a known version")
+            table = file.read(tableLength)
+            offset = 0
+            for _ in range(accounts):
+                nameLength, keyLength, version, blockOffset, blockLength = TABLE_ENTRY.unpack_from(table, offset)
+                offset += TABLE_ENTRY.size
+                name = table[offset:offset + nameLength].decode("utf-8")
+                offset += nameLength
+                key = table[offset:offset + keyLength].decode("utf-8")
+                offset += keyLength
+                self.__table[name] = (key, version, blockOffset, blockLength)
+                self.__versions[name] = version
+            self.__scanJournal(file, dataEnd, stamp[2])
+        self.__stamp = stamp
+
+    def __scanJournal(self, file: BinaryIO, offset: int, size: int) -> None:
+        """Indexes the journal frames, only their heads are read"""
+        self.__journalEnd = offset
+        while offset + FRAME.size + FRAME_ACCOUNT.size <= size:
+            file.seek(offset)
+            marker, length = FRAME.unpack(file.read(FRAME.size))
+            if marker != FRAME_MARKER or offset + FRAME.size + length > size:
+                #A frame cut off by a crash during the append is ignored
+                break
+            nameLength, version = FRAME_ACCOUNT.unpack(file.read(FRAME_ACCOUNT.size))
+            name = file.read(nameLength).decode("utf-8")
+            recordsOffset = offset + FRAME.size + FRAME_ACCOUNT.size + nameLength
+            self.__journal.setdefault(name, []).append((recordsOffset, length - FRAME_ACCOUNT.size - nameLength))
+            self.__journalFrames += 1
+            self.__versions[name] = max(version, self.__versions.get(name, 0))
+            offset += FRAME.size + length
+            self.__journalEnd = offset
+
+    def __readRecords(self, user: str) -> dict[str, str]:
+        records: dict[str, str] = {}
+        with open(self.__path, "rb") as file:
+            if user in self.__table:
+                file.seek(self.__table[user][2])
+                unpackRecords(file.read(self.__table[user][3]), records)
+            for offset, length in self.__journal.get(user, []):
+                file.seek(offset)
+                unpackRecords(file.read(length), records)
+        return records
+
+    def __readAccounts(self) -> list[tuple[str, str, int, bytes]]:
+        """Returns name, key, version and the block of every account, the journal frames are folded in"""
+        accounts = []
+        with open(self.__path, "rb") as file:
+            for name, (key, _, offset, length) in self.__table.items():
+                if name in self.__journal:
+                    block = packRecords(self.__readRecords(name))
+                else:
+                    #Untouched blocks are copied without unpacking
+                    file.seek(offset)
+                    block = file.read(length)
+                accounts.append((name, key, self.__versions[name], block))
+        return accounts
+
+    @staticmethod
+    def __packTable(accounts: list[tuple[str, str, int, int]]) -> list[bytes]:
+        """Returns the header and the table for the name, key, version and block length of every account"""
+        table = []
+        tableLength = sum(TABLE_ENTRY.size + len(name.encode("utf-8")) + len(key.encode("utf-8")) for name, key, _, _ in accounts)
+        offset = HEADER.size + tableLength
+        for name, key, version, length in accounts:
+            rawName = name.encode("utf-8")
+            rawKey = key.encode("utf-8")
+            table.append(TABLE_ENTRY.pack(len(rawName), len(rawKey), version, offset, length) + rawName + rawKey)
+            offset += length
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(accounts), tableLength, offset)
+        return [header] + table
+
+    @staticmethod
+    def __packFile(accounts: list[tuple[str, str, int, bytes]]) -> list[bytes]:
+        return BinaryStorage.__packTable([(name, key, version, len(block)) for name, key, version, block in accounts]) + \
+               [block for _, _, _, block in accounts]
+
+    def __streamFile(self, user: str, key: str, version: int, records: Iterable[tuple[str, str]]) -> Iterator[bytes]:
+        """Yields the file with the records of one account replaced while they are produced. The other
+        blocks are copied from the file"""
+        #A new token has the length of the old one (same plain text) -> the block keeps its length
+        length = sum(RECORD.size + len(recordId.encode("utf-8")) + len(base64.urlsafe_b64decode(token))
+                     for recordId, token in self.__readRecords(user).items())
+        entries = []
+        blocks: list[bytes | tuple[int, int] | None] = []
+        for name, (accountKey, _, offset, blockLength) in self.__table.items():
+            if name == user:
+                entries.append((name, key, version, length))
+                blocks.append(None)
+            elif name in self.__journal:
+                block = packRecords(self.__readRecords(name))
+                entries.append((name, accountKey, self.__versions[name], len(block)))
+                blocks.append(block)
+            else:
+                entries.append((name, accountKey, self.__versions[name], blockLength))
+                blocks.append((offset, blockLength))
+        yield from self.__packTable(entries)
+        with open(self.__path, "rb") as file:
+            for source in blocks:
+                if isinstance(source, bytes):
+                    yield source
+                elif source is not None:
+                    file.seek(source[0])
+                    yield file.read(source[1])
+                else:
+                    written = 0
+                    for recordId, token in records:
+                        data = packRecords({recordId: token})
+                        written += len(data)
+                        yield data
+                    if written != length:
+                        raise ValueError(f"The records of {user} changed their size")
+
+    def __writeFile(self, accounts: list[tuple[str, str, int, bytes]]) -> None:
+        try:
+            vaultFile.replaceFile(self.__path, self.__packFile(accounts), self.__fsyncPolicy == "always")
+        finally:
+            #The table is read again on the next access
+            self.__stamp = (-1, -1, -1)
+
+    def __appendFrame(self, user: str, version: int, changed: dict[str, str], removed: set[str]) -> None:
+        rawName = user.encode("utf-8")
+        payload = FRAME_ACCOUNT.pack(len(rawName), version) + rawName + packRecords(changed, frozenset(removed))
+        with open(self.__path, "r+b") as file:
+            #The rest of a frame cut off by a crash is dropped, a frame behind it would never be read
+            file.seek(self.__journalEnd)
+            file.truncate()
+            file.write(FRAME.pack(FRAME_MARKER, len(payload)) + payload)
+            if self.__fsyncPolicy == "always":
+                file.flush()
+                os.fsync(file.fileno())
+
+    @staticmethod
+    def createFile(path: str, user: str, key: str, records: dict[str, str], fsyncPolicy: str = vaultFile.DEFAULT_FSYNC) -> None:
+        """Creates a new file with one account"""
+        BinaryStorage.createFileWithAccounts(path, [(user, key, records)], fsyncPolicy)
+
+    @staticmethod
+    def createFileWithAccounts(path: str, accounts: Iterable[tuple[str, str, dict[str, str]]],
+                               fsyncPolicy: str = vaultFile.DEFAULT_FSYNC) -> None:
+        """Creates a new file with the accounts (name, stored key, records) in one write. The table needs
+        the length of every block, so the packed blocks are held until the file is written"""
+        blocks = [(user, key, 0, packRecords(records)) for user, key, records in accounts]
+        vaultFile.replaceFile(path, BinaryStorage.__packFile(blocks), fsyncPolicy != "never")
+
+    def getPath(self) -> str:
+        return self.__path
+
+    def setJournalMode(self, enabled: bool) -> None:
+        """In journal mode saves append the changed records instead of rewriting the file"""
+        self.__journalMode = enabled
+
+    def setFsyncPolicy(self, policy: str) -> None:
+        self.__fsyncPolicy = vaultFile.checkFsyncPolicy(policy)
+
+    def sync(self) -> None:
+        """Forces the file to the disk, called when a session is closed"""
+        if self.__fsyncPolicy == "close":
+            vaultFile.syncFile(self.__path)
+
+    def getUsers(self) -> list[str]:
+        with vaultFile.locked(self.__path, False):
+            self.__ensureIndex()
+        return list(self.__table.keys())
+
+    def getKey(self, user: str) -> str:
+        """Returns the stored key of an account"""
+        with vaultFile.locked(self.__path, False):
+            self.__ensureIndex()
+        return vaultFile.getStoredKey(self.__table, user)
+
+    def setKey(self, user: str, key: str) -> None:
+        """Replaces the stored key of an account, its records stay as they are"""
+        with vaultFile.locked(self.__path, True):
+            self.__ensureIndex()
+            accounts = self.__readAccounts()
+            self.__writeFile([(name, key if name == user else accountKey, version, block)
+                              for name, accountKey, version, block in accounts])
+
+    def getVersion(self, user: str) -> int:
+        """Returns the version of an account, it is raised by every save"""
+        with vaultFile.locked(self.__path, False):
+            self.__ensureIndex()
+        return self.__versions.get(user, 0)
+
+    def addUser(self, user: str, key: str, records: dict[str, str]) -> None:
+        """Adds an account with its stored key and records"""
+        with vaultFile.locked(self.__path, True):
+            self.__ensureIndex()
+            vaultFile.checkNewUser(self.__table, user)
+            self.__writeFile(self.__readAccounts() + [(user, key, 0, packRecords(records))])
+
+    def remUser(self, user: str) -> None:
+        with vaultFile.locked(self.__path, True):
+            self.__ensureIndex()
+            self.__writeFile([account for account in self.__readAccounts() if account[0] != user])
+
+    def loadRecords(self, user: str) -> tuple[dict[str, str], int]:
+        """Returns the records of an user with all journal frames applied and their version. Only the
+        block and the frames of the user are read"""
+        with vaultFile.locked(self.__path, False):
+            self.__ensureIndex()
+            return (self.__readRecords(user), self.__versions.get(user, 0))
+
+    def saveRecords(self, user: str, changed: dict[str, str], removed: set[str], version: Optional[int] = None) -> int:
+        """Stores the changed records and deletes the removed records of an user. If a version is given
+        and the account has another one (someone else saved it in between) nothing is stored and a
+        VersionConflictException is raised. Returns the new version"""
+        with vaultFile.locked(self.__path, True):
+            self.__ensureIndex()
+            current = self.__versions.get(user, 0)
+            vaultFile.checkVersion(current, version)
+            if not changed and not removed:
+                return current
+            if self.__journalMode:
+                self.__appendFrame(user, current + 1, changed, removed)
+                return current + 1
+            accounts = []
+            for name, key, accountVersion, block in self.__readAccounts():
+                if name == user:
+                    records: dict[str, str] = {}
+                    unpackRecords(block, records)
+                    records.update(changed)
+                    for recordId in removed:
+                        records.pop(recordId, None)
+                    block = packRecords(records)
+                    accountVersion = current + 1
+                accounts.append((name, key, accountVersion, block))
+            self.__writeFile(accounts)
+            return current + 1
+
+    def replaceAccount(self, user: str, key: str, records: Iterable[tuple[str, str]], version: int) -> int:
+        """Replaces the key and all records of an account at once (after a re-encryption), the records
+        are written while they are produced. They must be the same records encrypted with another key.
+        Raises a VersionConflictException if the account has another version. Returns the new version"""
+        with vaultFile.locked(self.__path, True):
+            self.__ensureIndex()
+            if user not in self.__table or version != self.__versions.get(user, 0):
+                raise versionConflictException.VersionConflictException
+            try:
+                vaultFile.replaceFile(self.__path, self.__streamFile(user, key, version + 1, records), self.__fsyncPolicy == "always")
+            finally:
+                self.__stamp = (-1, -1, -1)
+            return version + 1
+
+    def needsCompaction(self) -> bool:
+        return self.__journalFrames > JOURNAL_LIMIT
+
+    def compact(self) -> None:
+        """Folds the journal frames into the blocks of the accounts"""
+        with vaultFile.locked(self.__path, True):
+            self.__ensureIndex()
+            self.__writeFile(self.__readAccounts())
@@ -3,35 +3,171 @@
 File: cryptor.py
 Desc: Implements a simple interface for cryptography. En- and decrypts text with a masterkey.
       Hashes a password to a masterkey. Checks if a password is the masterkey. Generates and 
-      checks passwords. 
+      checks passwords. Derived master keys are cached for a while and can be shared with a local
+      unlock agent, so the expensive key derivation runs only once. Known passwords are looked up
+      online or in a local copy of the haveibeenpwned database.
+      The stored key of an account holds its key derivation parameters, a random salt and the master
+      key wrapped (encrypted) with the derived key, so accounts can move to other parameters without
+      encrypting their records again. Old accounts store an unsalted hash of the password instead.
 """
 
 import sys
+import hmac
 import hashlib
 import secrets
 import base64
 import string
+import time
+import concurrent.futures
+from typing import Optional
 import requests
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import keyDerivation
+import unlockAgent
+import pwnedDatabase
+import rangeCache
+
+#Lifetime of a derived key in the cache of the process in seconds
+KEY_CACHE_TTL = 300.0
+#Start of a stored key with parameters: "$" algorithm "$" cost "$" salt "$" wrapped master key
+KEY_PREFIX = "$"
+#Range endpoint of the haveibeenpwned API (k-anonymity: only the first 5 hash characters are sent)
+PWNED_API = "https://api.pwnedpasswords.com/range/"
 
 class Cryptor:
     """Class for crypting and hashing"""
 
     def __init__(self) -> None:
         self.__fernet: Fernet
+        self.__masterKey: bytes
+        #The master key of an old stored hash is derived with a fixed salt
+        self.__legacyMasterKey = False
+        self.__kdfParams = keyDerivation.DEFAULT_PARAMS
+        #id -> derived key, proof of the password and expiry time
+        self.__keyCache: dict[str, tuple[bytes, str, float]] = {}
+        self.__agent: Optional[unlockAgent.AgentClient] = None
+        self.__pwnedDatabase: Optional[pwnedDatabase.PwnedDatabase] = None
+        self.__pwnedApi = PWNED_API
+        self.__rangeCache: Optional[rangeCache.RangeCache] = None
+
+    @staticmethod
+    def __cacheIds(key: str, hashedKey: str) -> tuple[str, str]:
+        """Returns the id of a stored key in the caches and the proof of the password a cached key is
+        handed out for. The id does not depend on the password, the proof is salted by the stored key
+        and only checked by the holder of the key (the agent forgets a key after a few wrong proofs)"""
+        keyId = hashlib.sha3_256(("kwv-agent:" + hashedKey).encode("utf-8")).hexdigest()
+        proof = hmac.new(hashedKey.encode("utf-8"), key.encode("utf-8"), hashlib.sha256).hexdigest()
+        return (keyId, proof)
 
     def __setMasterKey(self, key: str) -> None:
-        salt = "IamSalty_asThIs!Pr0jEcT".encode("utf-8")
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=480000,
-        )
-        masterKey = base64.urlsafe_b64encode(kdf.derive(key.encode("utf-8")))
+        keyId, proof = self.__cacheIds(key, self.hashKey(key, False))
+        masterKey = self.__getCachedKey(keyId, proof)
+        if masterKey is None:
+            salt = "IamSalty_asThIs!Pr0jEcT".encode("utf-8")
+            kdf = PBKDF2HMAC(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=salt,
+                iterations=480000,
+            )
+            masterKey = base64.urlsafe_b64encode(kdf.derive(key.encode("utf-8")))
+        self.__cacheKey(keyId, proof, masterKey)
+        self.__useMasterKey(masterKey)
+        self.__legacyMasterKey = True
+
+    def __useMasterKey(self, masterKey: bytes) -> None:
+        self.__masterKey = masterKey
         self.__fernet = Fernet(masterKey)
+        self.__legacyMasterKey = False
+
+    def __cacheKey(self, keyId: str, proof: str, derivedKey: bytes) -> None:
+        if keyId not in self.__keyCache and self.__agent is not None:
+            self.__agent.addKey(keyId, derivedKey.decode("utf-8"), proof)
+        self.__keyCache[keyId] = (derivedKey, proof, time.monotonic() + KEY_CACHE_TTL)
+
+    @staticmethod
+    def __splitKey(hashedKey: str) -> tuple[str, str, str]:
+        """Returns the parameters, the salt and the wrapped master key of a stored key"""
+        parts = hashedKey[len(KEY_PREFIX):].split("$")
+        if len(parts) != 4:
+            raise ValueError("Invalid stored key")
+        return ("$".join(parts[:2]), parts[2], parts[3])
+
+    def __wrapKey(self, key: str, masterKey: bytes) -> str:
+        """Encrypts the master key with a key derived from the password and a new salt"""
+        salt = base64.urlsafe_b64encode(secrets.token_bytes(keyDerivation.SALT_LENGTH)).decode("ascii")
+        derivedKey = base64.urlsafe_b64encode(keyDerivation.deriveKey(key, self.__kdfParams, base64.urlsafe_b64decode(salt)))
+        wrapped = Fernet(derivedKey).encrypt(masterKey).decode("ascii")
+        hashedKey = f"{KEY_PREFIX}{self.__kdfParams}${salt}${wrapped}"
+        self.__cacheKey(*self.__cacheIds(key, hashedKey), derivedKey)
+        return hashedKey
+
+    def __unwrapKey(self, key: str, hashedKey: str) -> Optional[bytes]:
+        """Returns the master key of a stored key, None if the password is wrong"""
+        params, salt, wrapped = self.__splitKey(hashedKey)
+        keyId, proof = self.__cacheIds(key, hashedKey)
+        derivedKey = self.__getCachedKey(keyId, proof)
+        if derivedKey is None:
+            derivedKey = base64.urlsafe_b64encode(keyDerivation.deriveKey(key, params, base64.urlsafe_b64decode(salt)))
+        try:
+            masterKey = Fernet(derivedKey).decrypt(wrapped.encode("ascii"))
+        except InvalidToken:
+            return None
+        #Only the key of a correct password is kept
+        self.__cacheKey(keyId, proof, derivedKey)
+        return masterKey
+
+    def __getCachedKey(self, keyId: str, proof: str) -> Optional[bytes]:
+        if keyId in self.__keyCache:
+            masterKey, cachedProof, expires = self.__keyCache[keyId]
+            if expires > time.monotonic():
+                return masterKey if hmac.compare_digest(proof, cachedProof) else None
+            del self.__keyCache[keyId]
+        if self.__agent is not None:
+            agentKey = self.__agent.getKey(keyId, proof)
+            if agentKey is not None:
+                return agentKey.encode("utf-8")
+        return None
+
+    def setAgent(self, agent: Optional[unlockAgent.AgentClient]) -> None:
+        """Uses a running unlock agent to share derived keys between processes"""
+        self.__agent = agent
+
+    def clearKeyCache(self) -> None:
+        """Forgets the derived keys of this process"""
+        self.__keyCache = {}
+
+    def lockAgent(self) -> None:
+        """Lets the unlock agent forget all keys (on a logout)"""
+        if self.__agent is not None:
+            self.__agent.lock()
+
+    def setKdfParams(self, params: str) -> None:
+        """Sets the key derivation parameters of new and upgraded accounts (see keyDerivation)"""
+        keyDerivation.parseParams(params)
+        self.__kdfParams = params
+
+    def getKdfParams(self) -> str:
+        return self.__kdfParams
+
+    def setPwnedDatabase(self, database: Optional[pwnedDatabase.PwnedDatabase]) -> None:
+        """Checks passwords against a local database instead of the online API"""
+        self.__pwnedDatabase = database
+
+    def setPwnedApi(self, url: str) -> None:
+        """Sets the range endpoint for the breach check, e.g. a local mirror"""
+        self.__pwnedApi = url
+
+    def setRangeCache(self, cache: Optional[rangeCache.RangeCache]) -> None:
+        """Keeps the responses of the breach check API, so repeated checks stay off the network"""
+        self.__rangeCache = cache
+
+    def clearRangeCache(self) -> None:
+        """Deletes the kept responses of the breach check, they tell the prefixes of checked passwords"""
+        if self.__rangeCache is not None:
+            self.__rangeCache.clear()
 
     def __wrongUsage(self) -> None:
         print("[Cryptor] ERROR: Wrong usage of Cryptor! Wrong order of method calls! No master key set!")
@@ -43,29 +179,77 @@ class Cryptor:
             self.__setMasterKey(key)
         return hashedKey.hexdigest()
 
+    def newKey(self, key: str) -> str:
+        """Creates a random master key for a new account and returns it wrapped with the password"""
+        masterKey = Fernet.generate_key()
+        hashedKey = self.__wrapKey(key, masterKey)
+        self.__useMasterKey(masterKey)
+        return hashedKey
+
+    def rekey(self, key: str) -> tuple[str, "Cryptor"]:
+        """Creates a new random master key wrapped with the password. Returns it and a Cryptor that
+        encrypts with it, the own master key is kept until adoptKey is called"""
+        other = Cryptor()
+        other.setKdfParams(self.__kdfParams)
+        other.setAgent(self.__agent)
+        return (other.newKey(key), other)
+
+    def adoptKey(self, other: "Cryptor") -> None:
+        """Uses the master key of another Cryptor from now on (after a re-encryption)"""
+        self.__useMasterKey(other.__masterKey) #pylint: disable=protected-access
+
     def isCorrectKey(self, key: str, hashedKey :str) -> bool:
         """Checks if a given password is the same as the hashed masterkey"""
+        if hashedKey.startswith(KEY_PREFIX):
+            masterKey = self.__unwrapKey(key, hashedKey)
+            if masterKey is None:
+                return False
+            self.__useMasterKey(masterKey)
+            return True
         isCorrect = False
         if self.hashKey(key, False) == hashedKey:
             isCorrect = True
             self.__setMasterKey(key)
         return isCorrect
 
+    def needsUpgrade(self, hashedKey: str) -> bool:
+        """Checks if a stored key is an old hash or uses other key derivation parameters"""
+        if not hashedKey.startswith(KEY_PREFIX):
+            return True
+        return self.__splitKey(hashedKey)[0] != self.__kdfParams
+
+    def upgradeKey(self, key: str) -> str:
+        """Returns the current master key wrapped with the password and the current parameters. Call it
+        after isCorrectKey, the records stay valid. The master key of an old hash is derived with a fixed
+        salt, wrapping it would keep it -> such accounts need a new master key (see rekey)"""
+        if self.__fernet is None:
+            self.__wrongUsage()
+        if self.__legacyMasterKey:
+            raise ValueError("The master key of an old stored hash can not be wrapped, the account needs a new one")
+        return self.__wrapKey(key, self.__masterKey)
+
     def encryptText(self, text: str) -> str:
         """Encrypts a given text with the master key"""
+        return self.encryptBytes(text.encode("utf-8"))
+
+    def decryptText(self, text: str) -> str:
+        """Decrypts a given text with the master key"""
+        return self.decryptBytes(text).decode("utf-8")
+
+    def encryptBytes(self, data: bytes) -> str:
+        """Encrypts given bytes with the master key"""
         if self.__fernet is None:
             self.__wrongUsage()
 	#None has no attribute "encrypt" -> None is checked above
-        token = self.__fernet.encrypt(text.encode("utf-8")) #type: ignore
+        token = self.__fernet.encrypt(data) #type: ignore
         return str(token.decode("utf-8"))
 
-    def decryptText(self, text: str) -> str:
-        """Decrypts a given text with the master key"""
+    def decryptBytes(self, text: str) -> bytes:
+        """Decrypts a given token with the master key"""
         if self.__fernet is None:
             self.__wrongUsage()
 	#None has no attribute "decrypt" -> None is checked above
-        token = self.__fernet.decrypt(text.encode("utf-8")) #type: ignore
-        return str(token.decode("utf-8"))
+        return bytes(self.__fernet.decrypt(text.encode("utf-8"))) #type: ignore
 
     def genPassword(self, length: int, digits: bool, others: bool, upper: bool, lower: bool, forbidden: str) -> str:
         """Generates a password with several options"""
@@ -109,43 +293,79 @@ class Cryptor:
 
         return str(password)
 
-    def isSafe(self, text: str) -> tuple[bool, str]:
-        """Checks if a given password is safe. Provides a additional description string"""
-        isSecure  = True
-        message = ""
-
+    def getWeaknesses(self, text: str) -> list[str]:
+        """Checks a password against the rules for strong passwords and returns the violated ones"""
+        weaknesses = []
         if not any(char.isdigit() for char in text):
-            isSecure = False
-            message += "Digit missing|"
+            weaknesses.append("Digit missing")
         if not any(char in string.punctuation for char in text):
-            isSecure = False
-            message += "Punctuation missing|"
+            weaknesses.append("Punctuation missing")
         if not any(char.isupper() for char in text):
-            isSecure = False
-            message += "Uppercase letter missing|"
+            weaknesses.append("Uppercase letter missing")
         if not any(char.islower() for char in text):
-            isSecure = False
-            message += "Lowercase letter missing|"
+            weaknesses.append("Lowercase letter missing")
         if len(text) < 8:
-            isSecure = False
-            message += "Password under 8 characters long|"
+            weaknesses.append("Password under 8 characters long")
+        return weaknesses
+
+    def getPwnedRange(self, prefix: str) -> set[str]:
+        """Returns the hash suffixes of all known passwords with the given 5 character SHA-1 prefix"""
+        if self.__rangeCache is not None:
+            suffixes = self.__rangeCache.get(prefix)
+            if suffixes is not None:
+                return suffixes
+        response = requests.get(self.__pwnedApi + prefix, timeout=5)
+        if response.status_code != 200:
+            raise ConnectionError(f"Can not reach \"{self.__pwnedApi}\"! Status code: {response.status_code}")
+        suffixes = {line.split(":", 1)[0].strip().upper() for line in response.text.splitlines()}
+        if self.__rangeCache is not None:
+            self.__rangeCache.put(prefix, suffixes)
+        return suffixes
+
+    def findPwned(self, sha1Hashes: set[str], workers: int = 8) -> tuple[set[str], set[str]]:
+        """Checks many SHA-1 hashes at once. Every prefix is requested only once and the requests run
+        concurrently. Returns the known hashes and the hashes that could not be checked"""
+        pwned: set[str] = set()
+        failed: set[str] = set()
+        if self.__pwnedDatabase is not None:
+            return ({sha1 for sha1 in sha1Hashes if self.__pwnedDatabase.containsHash(sha1)}, failed)
+        prefixes: dict[str, list[str]] = {}
+        for sha1 in sha1Hashes:
+            prefixes.setdefault(sha1[:5].upper(), []).append(sha1)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.getPwnedRange, prefix): prefix for prefix in prefixes}
+            for future in concurrent.futures.as_completed(futures):
+                prefix = futures[future]
+                try:
+                    suffixes = future.result()
+                #A failed request must not stop the other checks -> the hashes are reported as not checked
+                except Exception: #pylint: disable=broad-exception-caught
+                    failed.update(prefixes[prefix])
+                    continue
+                pwned.update(sha1 for sha1 in prefixes[prefix] if sha1[5:].upper() in suffixes)
+        return (pwned, failed)
+
+    def isSafe(self, text: str) -> tuple[bool, str]:
+        """Checks if a given password is safe. Provides a additional description string"""
+        weaknesses = self.getWeaknesses(text)
 
         #Search password in the haveibeenpwned database
-        url = "https://api.pwnedpasswords.com/range/"
         sha1 = str(hashlib.sha1(text.encode("utf-8")).hexdigest()).upper()
 
+        if self.__pwnedDatabase is not None:
+            if self.__pwnedDatabase.containsHash(sha1):
+                weaknesses.append("Password is well known")
+            return (not weaknesses, ", ".join(weaknesses))
+
+        isSecure = not weaknesses
         try:
-            response = requests.get(url + sha1[:5], timeout=5)
-            if response.status_code == 200:
-                for line in response.text.splitlines():
-                    if sha1[5:] in line:
-                        isSecure = False
-                        message += "Password is well known|"
-            else:
-                print(f"[Cryptor] WARNING: Can not reach \"{url}\"! Status code: {response.status_code}")
+            if sha1[5:] in self.getPwnedRange(sha1[:5]):
+                isSecure = False
+                weaknesses.append("Password is well known")
+        except ConnectionError as error:
+            print(f"[Cryptor] WARNING: {error}")
         #The API call is not important -> All exceptions are catched and the user is informed
         except Exception: #pylint: disable=broad-exception-caught
-            message += "Check with API \"" + url + "\" failed - Maybe there is no internet connection"
+            weaknesses.append("Check with API \"" + self.__pwnedApi + "\" failed - Maybe there is no internet connection")
 
-        message = message[:-1].replace("|", ", ")
-        return (isSecure, message)
+        return (isSecure, ", ".join(weaknesses))
@@ -0,0 +1,384 @@
+#!/bin/python3
+"""
+File: csvStorage.py
+Desc: Implements the storage of the encrypted records in a csv file. Every account has one snapshot
+      row. In journal mode a save only appends a row with the changed records to the end of the file
+      and the journal rows are folded into the snapshot rows by a compaction. An index of the rows
+      (account -> key -> byte offset / length) is built in one pass and kept until the file changes.
+      A rewrite goes to a temporary file that replaces the file at once, so a crash never leaves a
+      half written file. The fsync policy chooses when the data is forced to the disk.
+      Every read-modify-write holds an advisory lock (a lock file next to the vault) and every save
+      raises the version of the account, so a save based on an outdated version is detected.
+"""
+
+import io
+import os
+import re
+import csv
+import json
+import itertools
+from typing import Iterable, Iterator, Optional
+import vaultFile
+import versionConflictException
+
+#Key column of a journal row (a hashed key is never equal to this)
+JOURNAL_KEY = "journal"
+#Record id of an account stored in the old format (one token for the whole document)
+LEGACY_RECORD = "legacy"
+#Compact the file on close if it holds more journal rows
+JOURNAL_LIMIT = 64
+
+FIELDNAMES = ["account", "key", "data"]
+
+#Version at the start of the data column, found without parsing the whole row
+VERSION_PATTERN = re.compile(rb',"\{""version"": (\d+)')
+
+#The data column of a big account is far larger than the default limit of 128 KiB
+csv.field_size_limit(2**31 - 1)
+
+class CsvStorage:
+    """Class for storing records in a csv file"""
+
+    def __init__(self, path: str) -> None:
+        self.__path = path
+        self.__journalMode = False
+        self.__fsyncPolicy = vaultFile.DEFAULT_FSYNC
+        self.__journalRows = 0
+        #account -> (key, offset, length) of the snapshot row
+        self.__rows: dict[str, tuple[str, int, int]] = {}
+        #account -> (offset, length) of its journal rows
+        self.__journal: dict[str, list[tuple[int, int]]] = {}
+        #account -> version of its last row
+        self.__versions: dict[str, int] = {}
+        #End of the last complete row, bytes behind it are the rest of a row cut off by a crash
+        self.__dataEnd = 0
+        #The last complete row has no line break (the next row has to start with one)
+        self.__openLine = False
+        #(inode, mtime, size) of the file when the index was built
+        self.__stamp: tuple[int, int, int] = (-1, -1, -1)
+        with vaultFile.locked(self.__path, False):
+            self.__ensureIndex()
+
+    def __indexRow(self, account: str, key: str, offset: int, line: bytes) -> None:
+        match = VERSION_PATTERN.search(line)
+        version = int(match.group(1)) if match else 0
+        self.__versions[account] = max(version, self.__versions.get(account, 0))
+        if key == JOURNAL_KEY:
+            self.__journal.setdefault(account, []).append((offset, len(line)))
+            self.__journalRows += 1
+        else:
+            self.__rows[account] = (key, offset, len(line))
+
+    def __clearIndex(self) -> None:
+        self.__rows = {}
+        self.__journal = {}
+        self.__versions = {}
+        self.__journalRows = 0
+        self.__dataEnd = 0
+        self.__openLine = False
+
+    @staticmethod
+    def __parseRow(line: bytes) -> list[str]:
+        text = line.decode("utf-8")
+        if not text.startswith('"'):
+            #Account and key are never quoted -> no need to parse the encrypted data
+            return text.rstrip("\r\n").split(",", 2)
+        return next(csv.reader(io.StringIO(text)))
+
+    @classmethod
+    def __isComplete(cls, line: bytes) -> bool:
+        """A row without a line break is complete if all quotes are closed and the data column is not
+        cut off (written rows quote it, as their data contains quotes)"""
+        if line.endswith(b"\n"):
+            return True
+        if line.count(b'"') % 2 == 1:
+            return False
+        row = cls.__parseRow(line)
+        return len(row) == 3 and row[2] != "" and (line.endswith(b'"') or b'"' not in line)
+
+    def __ensureIndex(self) -> None:
+        """Builds the index of the rows in one pass if the file changed since the last time"""
+        stamp = vaultFile.getStamp(self.__path)
+        if stamp == self.__stamp:
+            return
+        self.__clearIndex()
+        with open(self.__path, "rb") as file:
+            offset = len(file.readline())
+            line = file.readline()
+            while line:
+                #Quoted fields can contain line breaks -> read on until all quotes are closed
+                while line.count(b'"') % 2 == 1:
+                    nextLine = file.readline()
+                    if not nextLine:
+                        break
+                    line += nextLine
+                if not self.__isComplete(line):
+                    #Only the last row can be cut off, it is left out and dropped by the next append
+                    break
+                if line.strip():
+                    row = self.__parseRow(line)
+                    self.__indexRow(row[0], row[1], offset, line)
+                offset += len(line)
+                self.__dataEnd = offset
+                self.__openLine = not line.endswith(b"\n")
+                line = file.readline()
+        self.__stamp = stamp
+
+    def __readData(self, file: io.BufferedReader, offset: int, length: int) -> str:
+        file.seek(offset)
+        line = file.read(length)
+        if line.startswith(b'"'):
+            return next(csv.reader(io.StringIO(line.decode("utf-8"))))[2]
+        #Account and key are never quoted -> the data column is unquoted directly, the csv module
+        #needs many times the size of a big column
+        start = line.index(b",", line.index(b",") + 1) + 1
+        end = len(line)
+        while end > start and line[end - 1] in b"\r\n":
+            end -= 1
+        if line[start:start + 1] != b'"':
+            return str(memoryview(line)[start:end], "utf-8")
+        return str(memoryview(line)[start + 1:end - 1], "utf-8").replace('""', '"')
+
+    def __getFileContent(self) -> list[dict [str, str]]:
+        self.__ensureIndex()
+        with open(self.__path, "rb") as file:
+            #Without the rest of a row cut off by a crash
+            reader = csv.DictReader(io.StringIO(file.read(self.__dataEnd).decode("utf-8"), newline=""))
+            data = []
+            for row in reader:
+                data.append(row)
+        return data
+
+    @staticmethod
+    def __encodeRow(row: list[str]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer, delimiter=",").writerow(row)
+        return buffer.getvalue().encode("utf-8")
+
+    def __writeFileContent(self, data: list[dict [str, str]]) -> None:
+        """Writes all rows and builds the index on the way"""
+        self.__clearIndex()
+        lines = [self.__encodeRow(FIELDNAMES)]
+        offset = len(lines[0])
+        for dictonary in data:
+            line = self.__encodeRow([dictonary["account"], dictonary["key"], dictonary["data"]])
+            self.__indexRow(dictonary["account"], dictonary["key"], offset, line)
+            lines.append(line)
+            offset += len(line)
+        self.__dataEnd = offset
+        try:
+            vaultFile.replaceFile(self.__path, lines, self.__fsyncPolicy == "always")
+        except BaseException:
+            #The file is unchanged -> the index is built from it again
+            self.__stamp = (-1, -1, -1)
+            raise
+        self.__stamp = vaultFile.getStamp(self.__path)
+
+    def __appendRow(self, row: list[str]) -> None:
+        self.__ensureIndex()
+        line = self.__encodeRow(row)
+        with open(self.__path, "r+b") as file:
+            #The rest of a row cut off by a crash is dropped, the new row would be glued to it
+            file.seek(self.__dataEnd)
+            file.truncate()
+            if self.__openLine:
+                file.write(b"\r\n")
+            offset = file.tell()
+            file.write(line)
+            if self.__fsyncPolicy == "always":
+                file.flush()
+                os.fsync(file.fileno())
+        self.__indexRow(row[0], row[1], offset, line)
+        self.__dataEnd = offset + len(line)
+        self.__openLine = False
+        self.__stamp = vaultFile.getStamp(self.__path)
+
+    def __streamFile(self, user: str, key: str, version: int, records: Iterable[tuple[str, str]]) -> Iterator[bytes]:
+        """Yields the file with the snapshot row of one account replaced (and its journal rows dropped).
+        The row is encoded while the records are produced, the other rows are copied from the file"""
+        rows = [(offset, length, account) for account, (_, offset, length) in self.__rows.items()]
+        rows += [(offset, length, account) for account, frames in self.__journal.items() if account != user for offset, length in frames]
+        with open(self.__path, "rb") as file:
+            yield file.readline()
+            for offset, length, account in sorted(rows):
+                if account != user:
+                    file.seek(offset)
+                    yield file.read(length)
+                    continue
+                #The same bytes as __encodeRow of the row with __encodeData (the data column is quoted)
+                yield self.__encodeRow([user, key, ""]).rstrip(b"\r\n") + b'"'
+                yield json.dumps({"version":version, "records":{}})[:-2].replace('"', '""').encode("utf-8")
+                separator = ""
+                for recordId, token in records:
+                    yield f"{separator}{json.dumps(recordId)}: {json.dumps(token)}".replace('"', '""').encode("utf-8")
+                    separator = ", "
+                yield b'}}"\r\n'
+
+    @staticmethod
+    def __decodeData(data: str) -> tuple[dict[str, str], int]:
+        """Returns the records and the version of a snapshot row"""
+        if not data.startswith("{"):
+            return ({LEGACY_RECORD: data}, 0)
+        content = json.loads(data)
+        return (content["records"], content.get("version", 0))
+
+    @staticmethod
+    def __encodeData(records: dict[str, str], version: int = 0) -> str:
+        #The version comes first, so the index finds it without parsing the records
+        return json.dumps({"version":version, "records":records})
+
+    @staticmethod
+    def __applyJournal(records: dict[str, str], data: str) -> int:
+        """Applies a journal row to the records and returns its version"""
+        change = json.loads(data)
+        records.update(change["records"])
+        for recordId in change["removed"]:
+            records.pop(recordId, None)
+        version: int = change.get("version", 0)
+        return version
+
+    def __foldRows(self, data: list[dict [str, str]]) -> list[dict [str, str]]:
+        """Folds all journal rows into the snapshot rows of their accounts"""
+        snapshots: dict[str, dict[str, str]] = {}
+        records: dict[str, dict[str, str]] = {}
+        versions: dict[str, int] = {}
+        for dictonary in data:
+            account = dictonary["account"]
+            if dictonary["key"] != JOURNAL_KEY:
+                snapshots[account] = dictonary
+                records[account], versions[account] = self.__decodeData(dictonary["data"])
+            elif account in records:
+                versions[account] = max(versions[account], self.__applyJournal(records[account], dictonary["data"]))
+        for account, dictonary in snapshots.items():
+            dictonary["data"] = self.__encodeData(records[account], versions[account])
+        return list(snapshots.values())
+
+    @staticmethod
+    def createFile(path: str, user: str, key: str, records: dict[str, str], fsyncPolicy: str = vaultFile.DEFAULT_FSYNC) -> None:
+        """Creates a new file with one account"""
+        CsvStorage.createFileWithAccounts(path, [(user, key, records)], fsyncPolicy)
+
+    @staticmethod
+    def createFileWithAccounts(path: str, accounts: Iterable[tuple[str, str, dict[str, str]]],
+                               fsyncPolicy: str = vaultFile.DEFAULT_FSYNC) -> None:
+        """Creates a new file with the accounts (name, stored key, records) in one write, the rows are
+        written while the accounts are produced"""
+        lines = itertools.chain([CsvStorage.__encodeRow(FIELDNAMES)],
+                                (CsvStorage.__encodeRow([user.replace(',',''), key, CsvStorage.__encodeData(records)])
+                                 for user, key, records in accounts))
+        vaultFile.replaceFile(path, lines, fsyncPolicy != "never")
+
+    def getPath(self) -> str:
+        return self.__path
+
+    def setJournalMode(self, enabled: bool) -> None:
+        """In journal mode saves append the changed records instead of rewriting the file"""
+        self.__journalMode = enabled
+
+    def setFsyncPolicy(self, policy: str) -> None:
+        self.__fsyncPolicy = vaultFile.checkFsyncPolicy(policy)
+
+    def sync(self) -> None:
+        """Forces the file to the disk, called when a session is closed"""
+        if self.__fsyncPolicy != "close":
+            return
+        vaultFile.syncFile(self.__path)
+
+    def getUsers(self) -> list[str]:
+        with vaultFile.locked(self.__path, False):
+            self.__ensureIndex()
+        return list(self.__rows.keys())
+
+    def getKey(self, user: str) -> str:
+        """Returns the stored key of an account"""
+        with vaultFile.locked(self.__path, False):
+            self.__ensureIndex()
+        return vaultFile.getStoredKey(self.__rows, user)
+
+    def setKey(self, user: str, key: str) -> None:
+        """Replaces the stored key of an account, its records stay as they are"""
+        with vaultFile.locked(self.__path, True):
+            data = self.__getFileContent()
+            for dictonary in data:
+                if dictonary["account"] == user and dictonary["key"] != JOURNAL_KEY:
+                    dictonary["key"] = key
+            self.__writeFileContent(data)
+
+    def getVersion(self, user: str) -> int:
+        """Returns the version of an account, it is raised by every save"""
+        with vaultFile.locked(self.__path, False):
+            self.__ensureIndex()
+        return self.__versions.get(user, 0)
+
+    def addUser(self, user: str, key: str, records: dict[str, str]) -> None:
+        """Adds an account with its stored key and records"""
+        with vaultFile.locked(self.__path, True):
+            self.__ensureIndex()
+            vaultFile.checkNewUser(self.__rows, user)
+            self.__appendRow([user.replace(',',''), key, self.__encodeData(records)])
+
+    def remUser(self, user: str) -> None:
+        with vaultFile.locked(self.__path, True):
+            data = [dictonary for dictonary in self.__getFileContent() if dictonary["account"] != user]
+            self.__writeFileContent(data)
+
+    def loadRecords(self, user: str) -> tuple[dict[str, str], int]:
+        """Returns the records of an user with all journal rows applied and their version. Only the rows
+        of the user are read"""
+        records: dict[str, str] = {}
+        with vaultFile.locked(self.__path, False):
+            self.__ensureIndex()
+            with open(self.__path, "rb") as file:
+                if user in self.__rows:
+                    records = self.__decodeData(self.__readData(file, self.__rows[user][1], self.__rows[user][2]))[0]
+                for offset, length in self.__journal.get(user, []):
+                    self.__applyJournal(records, self.__readData(file, offset, length))
+            return (records, self.__versions.get(user, 0))
+
+    def saveRecords(self, user: str, changed: dict[str, str], removed: set[str], version: Optional[int] = None) -> int:
+        """Stores the changed records and deletes the removed records of an user. If a version is given
+        and the account has another one (someone else saved it in between) nothing is stored and a
+        VersionConflictException is raised. Returns the new version"""
+        with vaultFile.locked(self.__path, True):
+            self.__ensureIndex()
+            current = self.__versions.get(user, 0)
+            vaultFile.checkVersion(current, version)
+            if not changed and not removed:
+                return current
+            if self.__journalMode:
+                self.__appendRow([user, JOURNAL_KEY, json.dumps({"version":current + 1, "records":changed, "removed":sorted(removed)})])
+                return current + 1
+            data = self.__foldRows(self.__getFileContent())
+            for dictonary in data:
+                if dictonary["account"] == user:
+                    records = self.__decodeData(dictonary["data"])[0]
+                    records.update(changed)
+                    for recordId in removed:
+                        records.pop(recordId, None)
+                    dictonary["data"] = self.__encodeData(records, current + 1)
+                    break
+            self.__writeFileContent(data)
+            return current + 1
+
+    def replaceAccount(self, user: str, key: str, records: Iterable[tuple[str, str]], version: int) -> int:
+        """Replaces the key and all records of an account at once (after a re-encryption), the records
+        are written while they are produced. Raises a VersionConflictException if the account has another
+        version. Returns the new version"""
+        with vaultFile.locked(self.__path, True):
+            self.__ensureIndex()
+            if user not in self.__rows or version != self.__versions.get(user, 0):
+                raise versionConflictException.VersionConflictException
+            try:
+                vaultFile.replaceFile(self.__path, self.__streamFile(user, key, version + 1, records), self.__fsyncPolicy == "always")
+            finally:
+                #The index is built from the new file on the next access
+                self.__stamp = (-1, -1, -1)
+            return version + 1
+
+    def needsCompaction(self) -> bool:
+        return self.__journalRows > JOURNAL_LIMIT
+
+    def compact(self) -> None:
+        """Folds the journal rows into one snapshot row per account"""
+        with vaultFile.locked(self.__path, True):
+            self.__writeFileContent(self.__foldRows(self.__getFileContent()))
@@ -2,24 +2,83 @@
 """
 File: datahandler.py
 Desc: Implements a simple interface for datahandling. Handles files, its content and the processed
-      data.
+      data. Every entry is encrypted as an own record, so a save only re-encrypts the changed records.
 """
 
 import sys
-import csv
 import json
+import time
+import random
+import hashlib
+import threading
+import contextlib
+from typing import Callable, Iterator, Optional
+import secrets
 import cryptor
+import recordCompression
+import vaultFile
+import csvStorage
+import binaryStorage
+import sqliteStorage
+import searchIndex
+import entryCache
 import objectAlreadyExistsException
+import versionConflictException
+
+#Record holding the category / title index and the old passwords
+META_RECORD = "meta"
+#File format -> storage backend
+STORAGES: dict[str, type[csvStorage.CsvStorage] | type[binaryStorage.BinaryStorage] | type[sqliteStorage.SqliteStorage]] = {
+    "csv": csvStorage.CsvStorage,
+    "binary": binaryStorage.BinaryStorage,
+    "sqlite": sqliteStorage.SqliteStorage
+}
+#Saves that are retried after merging the changes of another process
+MERGE_ATTEMPTS = 8
+#Seconds of the first wait before a retry, doubled with every attempt
+MERGE_BACKOFF = 0.005
+#Number of old passwords that are kept
+OLD_PASSWORDS = 10
+#Decrypted entries kept in memory in lazy mode
+CACHE_SIZE = 256
+#Records that are decrypted at once when the master password is changed
+REKEY_CHUNK = 512
+
+def openStorage(path: str) -> vaultFile.Storage:
+    """Opens a vault with the backend of its format, the format is found by the file signature"""
+    return STORAGES[vaultFile.detectFormat(path)](path)
 
 class DataHandler:
     """Class for handling data"""
 
     def __init__(self, otherCryptor: cryptor.Cryptor) -> None:
         self.__cryptor = otherCryptor
-        self.__path: str
+        self.__storage: vaultFile.Storage
         self.__user: str
-        self.__entries: dict[str, dict[str, dict[str, str]]]
+        self.__index: dict[str, dict[str, str]]
+        #recordId -> timestamp of the entry, kept in the meta record so lists need no decryption
+        self.__timestamps: dict[str, str] = {}
+        self.__entries = entryCache.EntryCache(self.__decrypt)
+        #Size of the cache of decrypted entries, None: all entries are decrypted at the start of a session
+        self.__cacheSize: Optional[int] = None
+        #Compression of the records of the session (stored in the meta record) and the one chosen by setCompression
+        self.__compression = "none"
+        self.__newCompression: Optional[str] = None
         self.__oldPasswords: list[str]
+        self.__dirty: set[str]
+        #Version of the records in the file and their index as loaded or last saved (base of a merge)
+        self.__version = 0
+        self.__base: dict[str, dict[str, str]] = {}
+        self.__baseOldPasswords: list[str] = []
+        self.__searchIndex: Optional[searchIndex.SearchIndex] = None
+        #recordId -> entry and stored token before the running transaction (None if it was added), None
+        #outside of a transaction
+        self.__undo: Optional[dict[str, Optional[tuple[dict[str, str], Optional[str]]]]] = None
+        #Changes and the snapshot of a save can happen in different threads (see autoSaver)
+        self.__lock = threading.RLock()
+        self.__saveLock = threading.Lock()
+        self.__journalMode = False
+        self.__fsyncPolicy = vaultFile.DEFAULT_FSYNC
         self.__sessionIsOpen = False
         self.__fileIsOpen = False
         self.__keyIsSet = False
@@ -34,30 +93,226 @@ class DataHandler:
             print(msg)
             sys.exit(1)
 
-    def __getFileContent(self) -> list[dict [str, str]]:
-        with open(self.__path, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            data = []
-            for row in reader:
-                data.append(row)
-        return data
+    def __encrypt(self, text: str, method: str) -> str:
+        return self.__cryptor.encryptBytes(recordCompression.compress(text, method))
+
+    def __decrypt(self, token: str) -> str:
+        return recordCompression.decompress(self.__cryptor.decryptBytes(token))
+
+    def __emptyRecords(self) -> dict[str, str]:
+        method = self.__newCompression or recordCompression.DEFAULT_METHOD
+        return {META_RECORD:self.__encrypt(json.dumps({"index":{}, "timestamps":{}, "oldPasswords":[], "compression":method}), method)}
+
+    def __loadRecords(self, records: dict[str, str]) -> None:
+        self.__index = {}
+        self.__timestamps = {}
+        self.__entries = entryCache.EntryCache(self.__decrypt, self.__cacheSize)
+        self.__oldPasswords = []
+        self.__dirty = set()
+        self.__base = {}
+        self.__baseOldPasswords = []
+        self.__compression = self.__newCompression or "none"
+        if csvStorage.LEGACY_RECORD in records:
+            #Old format: the whole document is one token -> split it up, the next save writes records
+            jsonData = json.loads(self.__decrypt(records[csvStorage.LEGACY_RECORD]))
+            for category, titles in jsonData["entries"].items():
+                self.__index[category] = {}
+                for title, entry in titles.items():
+                    recordId = self.__newRecordId()
+                    self.__index[category][title] = recordId
+                    self.__timestamps[recordId] = entry["timestamp"]
+                    self.__entries.pin(recordId, entry)
+                    self.__dirty.add(recordId)
+            self.__oldPasswords = jsonData["oldPasswords"]
+            self.__dirty.add(META_RECORD)
+            self.__dirty.add(csvStorage.LEGACY_RECORD)
+            return
+        if META_RECORD in records:
+            meta = json.loads(self.__decrypt(records[META_RECORD]))
+            self.__index = meta["index"]
+            self.__oldPasswords = meta["oldPasswords"]
+            #Accounts of older versions have no timestamps in the index, they are read from the entries
+            self.__timestamps = meta.get("timestamps", {})
+            #Accounts of older versions are not compressed
+            self.__compression = meta.get("compression", "none")
+            if self.__newCompression is not None and self.__newCompression != self.__compression:
+                self.__compression = self.__newCompression
+                self.__dirty.add(META_RECORD)
+            self.__setBase(self.__index, self.__oldPasswords)
+        #Only the index is decrypted in lazy mode, the entries when they are used. The tokens are still
+        #read and kept, so the start and the memory of a session stay linear in the number of entries
+        self.__entries.load({recordId: token for recordId, token in records.items() if recordId != META_RECORD})
+
+    def __setBase(self, index: dict[str, dict[str, str]], oldPasswords: list[str]) -> None:
+        self.__base = {category: dict(titles) for category, titles in index.items()}
+        self.__baseOldPasswords = list(oldPasswords)
+
+    def __mergeStored(self) -> None:
+        """Another process has saved the user since the last load -> takes its records over and puts the
+        own changes on top (three-way merge of the index against the base)"""
+        records, version = self.__storage.loadRecords(self.__user)
+        theirs = json.loads(self.__decrypt(records[META_RECORD])) if META_RECORD in records else {"index":{}, "oldPasswords":[]}
+        with self.__lock:
+            ours = set(self.__dirty)
+        #The decryption runs without the lock, the own changed records are not needed
+        entries = entryCache.EntryCache(self.__decrypt, self.__entries.getSize())
+        entries.load({recordId: token for recordId, token in records.items() if recordId != META_RECORD and recordId not in ours})
+        with self.__lock:
+            index = {category: dict(titles) for category, titles in theirs["index"].items()}
+            timestamps = dict(theirs.get("timestamps", {}))
+            for category in self.__base.keys() - self.__index.keys():
+                index.pop(category, None)
+            for category, titles in self.__index.items():
+                baseTitles = self.__base.get(category)
+                if baseTitles is None:
+                    index.setdefault(category, {}).update(titles)
+                    continue
+                added = {title: recordId for title, recordId in titles.items() if baseTitles.get(title) != recordId}
+                if category not in index and not added:
+                    #Removed by the other process and not changed here
+                    continue
+                merged = index.setdefault(category, {})
+                for title in baseTitles.keys() - titles.keys():
+                    merged.pop(title, None)
+                merged.update(added)
+            referenced = {recordId for titles in index.values() for recordId in titles.values()}
+            for recordId in self.__dirty:
+                if recordId in referenced and recordId in self.__entries:
+                    entries.pin(recordId, self.__entries.get(recordId))
+                    if recordId in self.__timestamps:
+                        timestamps[recordId] = self.__timestamps[recordId]
+                else:
+                    #Removed here or by the other process
+                    entries.remove(recordId)
+            newPasswords = [password for password in self.__oldPasswords if password not in self.__baseOldPasswords]
+            self.__oldPasswords = (theirs["oldPasswords"] + newPasswords)[-OLD_PASSWORDS:]
+            self.__index = index
+            self.__timestamps = {recordId: timestamp for recordId, timestamp in timestamps.items() if recordId in referenced}
+            self.__entries = entries
+            self.__setBase(theirs["index"], theirs["oldPasswords"])
+            self.__version = version
+            self.__dirty.add(META_RECORD)
+            self.__searchIndex = None
+
+    def __getSearchIndex(self) -> searchIndex.SearchIndex:
+        """Builds the search index on the first search, afterwards it is kept up to date by every change"""
+        if self.__searchIndex is None:
+            self.__searchIndex = searchIndex.SearchIndex()
+            for category, titles in self.__index.items():
+                for title, recordId in titles.items():
+                    self.__searchIndex.add(recordId, category, title, self.__entries.peek(recordId))
+        return self.__searchIndex
+
+    def __dumpRecords(self) -> tuple[dict[str, str], set[str]]:
+        """Serializes the changed records and returns them together with the removed records"""
+        changed: dict[str, str] = {}
+        removed: set[str] = set()
+        for recordId in self.__dirty:
+            if recordId == META_RECORD:
+                record: object = {"index":self.__index, "timestamps":self.__timestamps, "oldPasswords":self.__oldPasswords,
+                                  "compression":self.__compression}
+            elif recordId in self.__entries:
+                record = self.__entries.get(recordId)
+            else:
+                removed.add(recordId)
+                continue
+            changed[recordId] = json.dumps(record)
+        self.__dirty = set()
+        return (changed, removed)
+
+    def __reencrypt(self, records: dict[str, str], newCryptor: cryptor.Cryptor,
+                    progress: Optional[Callable[[int, int], None]]) -> Iterator[tuple[str, str]]:
+        """Yields the records encrypted with the new master key, compressed payloads stay as they are.
+        Only one chunk is decrypted at a time and the old tokens are dropped from records on the way"""
+        recordIds = list(records.keys())
+        for start in range(0, len(recordIds), REKEY_CHUNK):
+            chunk = [(recordId, records.pop(recordId)) for recordId in recordIds[start:start + REKEY_CHUNK]]
+            yield from ((recordId, newCryptor.encryptBytes(self.__cryptor.decryptBytes(token))) for recordId, token in chunk)
+            if progress is not None:
+                progress(min(start + REKEY_CHUNK, len(recordIds)), len(recordIds))
+
+    def __markDirty(self, recordId: str) -> None:
+        """Has to be called before a record is changed, so a transaction can undo the change. The entry
+        stays in memory until it is saved"""
+        entry = self.__entries.pin(recordId) if recordId != META_RECORD and recordId in self.__entries else None
+        if self.__undo is not None and recordId != META_RECORD and recordId not in self.__undo:
+            self.__undo[recordId] = (dict(entry), self.__entries.getToken(recordId)) if entry is not None else None
+        self.__dirty.add(recordId)
+
+    def __newRecordId(self) -> str:
+        recordId = secrets.token_hex(8)
+        while recordId in self.__entries:
+            recordId = secrets.token_hex(8)
+        return recordId
+
+    def __reset(self) -> None:
+        #The derived keys are not kept after a logout
+        self.__cryptor.clearKeyCache()
+        self.__user = ""
+        self.__index = {}
+        self.__timestamps = {}
+        self.__entries = entryCache.EntryCache(self.__decrypt)
+        self.__oldPasswords = []
+        self.__dirty = set()
+        self.__searchIndex = None
+        self.__undo = None
+        self.__sessionIsOpen = False
+        self.__fileIsOpen = False
+        self.__keyIsSet = False
 
     def getCryptor(self) -> cryptor.Cryptor:
         return self.__cryptor
 
     def getPath(self) -> str:
-        return self.__path
+        return self.__storage.getPath()
+
+    def setJournalMode(self, enabled: bool) -> None:
+        """In journal mode a save appends the changed records to the file instead of rewriting it"""
+        self.__journalMode = enabled
+        if self.__fileIsOpen:
+            self.__storage.setJournalMode(enabled)
+
+    def setLazyMode(self, enabled: bool, cacheSize: int = CACHE_SIZE) -> None:
+        """In lazy mode a session starts with the index only, an entry is decrypted when it is used and
+        at most cacheSize decrypted entries are kept (changed entries until they are saved). The encrypted
+        tokens of all entries are still read at the start and kept, so the start and the memory stay
+        linear in the number of entries, only the decryption is saved. Used from the next session on"""
+        self.__cacheSize = cacheSize if enabled else None
 
-    def createFile(self, path: str, user: str, key: str) -> None:
-        """0th step: create file"""
-        with open(path, "w", encoding="utf-8") as file:
-            writer = csv.writer(file, delimiter=",")
-            writer.writerow(["account", "key", "data"])
-            writer.writerow([user.replace(',',''), key, self.__cryptor.encryptText("{\"entries\":{},\"oldPasswords\":[]}")])
+    def setCompression(self, method: str) -> None:
+        """Chooses the compression of the records: "none", "zlib" or "lzma". It is stored in the meta record
+        of the user and used for the records saved from then on (older records stay readable). Used for the
+        open session, the next ones and new users"""
+        recordCompression.checkMethod(method)
+        with self.__lock:
+            self.__newCompression = method
+            if self.__sessionIsOpen and method != self.__compression:
+                self.__compression = method
+                self.__markDirty(META_RECORD)
+
+    def getCompression(self) -> str:
+        """Returns the compression of the open session"""
+        return self.__compression
+
+    def setFsyncPolicy(self, policy: str) -> None:
+        """Chooses when writes are forced to the disk: "always", on "close" of a session or "never" """
+        if policy not in vaultFile.FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {policy}")
+        self.__fsyncPolicy = policy
+        if self.__fileIsOpen:
+            self.__storage.setFsyncPolicy(policy)
+
+    def createFile(self, path: str, user: str, key: str, fileFormat: str = "csv") -> None:
+        """0th step: create file, fileFormat is one of STORAGES"""
+        if fileFormat not in STORAGES:
+            raise ValueError(f"Unknown file format {fileFormat}")
+        STORAGES[fileFormat].createFile(path, user, key, self.__emptyRecords(), self.__fsyncPolicy)
 
     def openFile(self, path: str,) -> None:
         """1st step: open a file"""
-        self.__path = path
+        self.__storage = openStorage(path)
+        self.__storage.setJournalMode(self.__journalMode)
+        self.__storage.setFsyncPolicy(self.__fsyncPolicy)
         self.__fileIsOpen = True
 
     def startSession(self) -> None:
@@ -65,164 +320,298 @@ class DataHandler:
         if self.__keyIsSet is False:
             print("Key is not set! Wrong order of calls!")
             sys.exit(1)
-        data = self.__getFileContent()
-        for dictonary in data:
-            if dictonary["account"] == self.__user:
-                encryptedData = dictonary["data"]
-                break
-        jsonData = json.loads(self.__cryptor.decryptText(encryptedData))
-        self.__entries = jsonData["entries"]
-        self.__oldPasswords = jsonData["oldPasswords"]
+        records, self.__version = self.__storage.loadRecords(self.__user)
+        self.__loadRecords(records)
+        self.__searchIndex = None
         self.__sessionIsOpen = True
 
     def closeSession(self) -> None:
         """last step: write the encrypted data and close the file"""
         self.__ifSessionIsNotOpen("No session to close! Wrong order of calls!")
-        data = self.__getFileContent()
-        for dictonary in data:
-            if dictonary["account"] == self.__user:
-                dictonary["data"] = self.__cryptor.encryptText(json.dumps({"entries":self.__entries, "oldPasswords":self.__oldPasswords}))
-                break
-        with open(self.__path, "w", encoding="utf-8") as file:
-            fieldnames = ["account", "key", "data"]
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            for dictonary in data:
-                writer.writerow(dictonary)
-        self.__path = ""
-        self.__user = ""
-        self.__entries = {}
-        self.__oldPasswords = []
-        self.__sessionIsOpen = False
-        self.__fileIsOpen = False
-        self.__keyIsSet = False
+        self.saveEntries()
+        if self.__storage.needsCompaction():
+            self.__storage.compact()
+        self.__storage.sync()
+        self.__reset()
 
     def saveEntries(self) -> None:
-        data = self.__getFileContent()
-        for dictonary in data:
-            if dictonary["account"] == self.__user:
-                dictonary["data"] = self.__cryptor.encryptText(json.dumps({"entries":self.__entries, "oldPasswords":self.__oldPasswords}))
-                break
-        with open(self.__path, "w", encoding="utf-8") as file:
-            fieldnames = ["account", "key", "data"]
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            for dictonary in data:
-                writer.writerow(dictonary)
+        """Writes the changed entries to the file. Inside of a transaction the save is done by the transaction.
+        Only taking the snapshot blocks changes, the encryption and the file access run without the lock.
+        If another process has saved the user in between, its changes are merged and the save is retried"""
+        with self.__saveLock:
+            for attempt in range(MERGE_ATTEMPTS):
+                with self.__lock:
+                    if self.__undo is not None or not self.__dirty:
+                        return
+                    records, removed = self.__dumpRecords()
+                    version = self.__version
+                    method = self.__compression
+                try:
+                    changed = {recordId: self.__encrypt(text, method) for recordId, text in records.items()}
+                    version = self.__storage.saveRecords(self.__user, changed, removed, version)
+                except versionConflictException.VersionConflictException:
+                    with self.__lock:
+                        self.__dirty.update(records.keys(), removed)
+                    #A random wait, so processes saving the same user at the same time do not collide again
+                    time.sleep(random.uniform(0, MERGE_BACKOFF * 2 ** attempt))
+                    self.__mergeStored()
+                    continue
+                except BaseException:
+                    with self.__lock:
+                        self.__dirty.update(records.keys(), removed)
+                    raise
+                with self.__lock:
+                    self.__version = version
+                    #Saved entries can be evicted again, unless they were changed during the save
+                    for recordId, token in changed.items():
+                        if recordId != META_RECORD and recordId not in self.__dirty:
+                            self.__entries.release(recordId, token)
+                    if META_RECORD in records:
+                        meta = json.loads(records[META_RECORD])
+                        self.__setBase(meta["index"], meta["oldPasswords"])
+                return
+            raise versionConflictException.VersionConflictException(f"{self.__user} is changed by other processes all the time")
+
+    @contextlib.contextmanager
+    def transaction(self, save: bool = True) -> Iterator[None]:
+        """6th step: groups changes, they are saved at once at the end (or later by the caller if save is
+        False). If an exception is raised the changes are undone. A nested transaction is part of the outer one"""
+        self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
+        if self.__undo is not None:
+            yield
+            return
+        with self.__lock:
+            index = {category: dict(titles) for category, titles in self.__index.items()}
+            timestamps = dict(self.__timestamps)
+            oldPasswords = list(self.__oldPasswords)
+            dirty = set(self.__dirty)
+            undo: dict[str, Optional[tuple[dict[str, str], Optional[str]]]] = {}
+            self.__undo = undo
+        try:
+            yield
+            with self.__lock:
+                self.__undo = None
+            if save:
+                self.saveEntries()
+        except BaseException:
+            with self.__lock:
+                for recordId, before in undo.items():
+                    if before is None:
+                        self.__entries.remove(recordId)
+                        continue
+                    entry, token = before
+                    self.__entries.pin(recordId, entry)
+                    if recordId not in dirty:
+                        #Unchanged since the last save -> the stored token is valid again (a removed
+                        #entry gets it back, so it can be evicted)
+                        self.__entries.release(recordId, token)
+                self.__index = index
+                self.__timestamps = timestamps
+                self.__oldPasswords = oldPasswords
+                self.__dirty = dirty
+                #Rebuilt on the next search
+                self.__searchIndex = None
+                self.__undo = None
+            raise
+
+    def compact(self) -> None:
+        """Folds all journal rows of the file into the snapshot rows"""
+        self.__ifFileIsNotOpen("No file opened! Wrong order of calls!")
+        self.__storage.compact()
 
     def getUsers(self) -> list[str]:
         """2nd step: get all users"""
         self.__ifFileIsNotOpen("No file opened! Wrong order of calls!")
-        with open(self.__path, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            data = []
-            for row in reader:
-                data.append(row["account"])
-        return data
+        return self.__storage.getUsers()
 
     def addUser(self, user: str, key: str) -> None:
         """3rd step: add a user"""
         self.__ifFileIsNotOpen("No file opened! Wrong order of calls!")
-        if user in self.getUsers():
-            raise objectAlreadyExistsException.ObjectAlreadyExistsException
-        with open(self.__path, "a", encoding="utf-8") as file:
-            writer = csv.writer(file, delimiter=",")
-            writer.writerow([user.replace(',',''), key, self.__cryptor.encryptText("{\"entries\":{},\"oldPasswords\":[]}")])
+        self.__storage.addUser(user, key, self.__emptyRecords())
 
     def remUser(self) -> None:
         """6th step: remove the choosen user"""
         self.__ifFileIsNotOpen("No file opened! Wrong order of calls!")
-        data = self.__getFileContent()
-        dataCopy = data
-        for dictonary in dataCopy:
-            if dictonary["account"] == self.__user:
-                data.remove(dictonary)
-                break
-        with open(self.__path, "w", encoding="utf-8") as file:
-            fieldnames = ["account", "key", "data"]
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            for dictonary in data:
-                writer.writerow(dictonary)
-        self.__path = ""
-        self.__user = ""
-        self.__entries = {}
-        self.__oldPasswords = []
-        self.__sessionIsOpen = False
-        self.__fileIsOpen = False
-        self.__keyIsSet = False
+        self.__storage.remUser(self.__user)
+        self.__reset()
 
     def getKey(self, user:str) -> str:
         """3rd step: get the key of the user"""
         self.__ifFileIsNotOpen("No file opened! Wrong order of calls!")
         self.__user = user
-        data = self.__getFileContent()
-        for dictonary in data:
-            if dictonary["account"] == user:
-                key = dictonary["key"]
-                break
+        key = self.__storage.getKey(user)
         self.__keyIsSet = True
         return key
 
+    def upgradeKey(self, key: str, progress: Optional[Callable[[int, int], None]] = None) -> bool:
+        """4th step (optional): after a correct password the stored key of the user is moved to the
+        current key derivation parameters of the cryptor. A stored key with other parameters only wraps
+        the master key again. The master key of an old hash is derived with the same salt in every vault,
+        so these accounts get a new random master key and all records are encrypted again (see
+        changeKey). Returns True if it was changed"""
+        if self.__keyIsSet is False:
+            print("Key is not set! Wrong order of calls!")
+            sys.exit(1)
+        storedKey = self.__storage.getKey(self.__user)
+        if not self.__cryptor.needsUpgrade(storedKey):
+            return False
+        if storedKey.startswith(cryptor.KEY_PREFIX):
+            self.__storage.setKey(self.__user, self.__cryptor.upgradeKey(key))
+        else:
+            self.changeKey(key, progress)
+        return True
+
+    def checkKey(self, key: str) -> bool:
+        """Checks the password of the user again, e.g. before it is changed"""
+        if self.__keyIsSet is False:
+            print("Key is not set! Wrong order of calls!")
+            sys.exit(1)
+        return cryptor.Cryptor().isCorrectKey(key, self.__storage.getKey(self.__user))
+
+    def changeKey(self, key: str, progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """4th step or during a session (optional): sets a new password. A new random master key is
+        wrapped with it (the only key derivation) and all records are encrypted with the new master key
+        chunk by chunk and streamed to the file, then the stored key and the records are swapped at once.
+        Memory: the encrypted tokens of the account are loaded at once (a csv account is one JSON column,
+        that can not be read in parts), they are dropped while they are re-encrypted. Only REKEY_CHUNK
+        records are decrypted at a time and the new tokens are not kept, so the peak is about the size of
+        the account plus one chunk. progress gets the number of done and of all records. Nobody else may
+        use the account meanwhile. Returns the number of records"""
+        if self.__keyIsSet is False:
+            print("Key is not set! Wrong order of calls!")
+            sys.exit(1)
+        if self.__sessionIsOpen:
+            self.saveEntries()
+        hashedKey, newCryptor = self.__cryptor.rekey(key)
+        with self.__saveLock:
+            for _ in range(MERGE_ATTEMPTS):
+                records, version = self.__storage.loadRecords(self.__user)
+                count = len(records)
+                try:
+                    version = self.__storage.replaceAccount(self.__user, hashedKey, self.__reencrypt(records, newCryptor, progress), version)
+                except versionConflictException.VersionConflictException:
+                    #Saved in between -> encrypt the new records
+                    continue
+                with self.__lock:
+                    self.__cryptor.adoptKey(newCryptor)
+                    self.__version = version
+                if self.__sessionIsOpen and self.__entries.getSize() is not None:
+                    #The tokens of the lazy cache are outdated, changed entries stay pinned
+                    records = self.__storage.loadRecords(self.__user)[0]
+                    with self.__lock:
+                        entries = entryCache.EntryCache(self.__decrypt, self.__entries.getSize())
+                        entries.load({recordId: token for recordId, token in records.items() if recordId != META_RECORD})
+                        for recordId in self.__dirty:
+                            if recordId in self.__entries:
+                                entries.pin(recordId, self.__entries.get(recordId))
+                        self.__entries = entries
+                return count
+        raise versionConflictException.VersionConflictException(f"{self.__user} is changed by other processes all the time")
+
     def getCategories(self) -> list[str]:
+        """6th step: get all categories"""
         self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
-        return list(self.__entries.keys())
+        return list(self.__index.keys())
 
     def addCategory(self, category: str) -> None:
+        """6th step: add an empty category"""
         self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
-        if category in self.__entries.keys():
-            raise objectAlreadyExistsException.ObjectAlreadyExistsException
-        self.__entries[category] = {}
+        with self.__lock:
+            if category in self.__index.keys():
+                raise objectAlreadyExistsException.ObjectAlreadyExistsException
+            self.__index[category] = {}
+            self.__markDirty(META_RECORD)
 
     def remCategory(self, category: str) -> None:
+        """6th step: remove a category with all its entries"""
         self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
-        del self.__entries[category]
+        with self.__lock:
+            for recordId in self.__index[category].values():
+                self.__markDirty(recordId)
+                self.__entries.remove(recordId)
+                self.__timestamps.pop(recordId, None)
+                if self.__searchIndex is not None:
+                    self.__searchIndex.remove(recordId)
+            del self.__index[category]
+            self.__markDirty(META_RECORD)
 
     def getEntries(self, category: str) -> list[str]:
         """6th step: get all entries of one category"""
         self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
-        return list(self.__entries[category].keys())
+        return list(self.__index[category].keys())
 
     def getEntry(self, category: str, title: str) -> dict[str, str]:
         self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
-        return self.__entries[category][title]
+        return self.__entries.get(self.__index[category][title])
+
+    def getTimestamp(self, category: str, title: str) -> str:
+        """6th step: get the timestamp of an entry from the index, the entry is not decrypted"""
+        self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
+        recordId = self.__index[category][title]
+        if recordId in self.__timestamps:
+            return self.__timestamps[recordId]
+        return self.__entries.get(recordId).get("timestamp", "")
 
     def addEntry(self, category: str, title: str, name: str, password: str, url: str, notices: str, timestamp: str) -> None:
         """6th step add an entry"""
         self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
-        if title in self.__entries[category].keys():
-            raise objectAlreadyExistsException.ObjectAlreadyExistsException
-        self.__entries[category][title] = {
-            "name": name,
-            "password": password,
-            "url": url,
-            "notices": notices,
-            "timestamp": timestamp
-        }
+        with self.__lock:
+            if title in self.__index[category].keys():
+                raise objectAlreadyExistsException.ObjectAlreadyExistsException
+            recordId = self.__newRecordId()
+            self.__markDirty(recordId)
+            self.__markDirty(META_RECORD)
+            self.__index[category][title] = recordId
+            self.__timestamps[recordId] = timestamp
+            entry = self.__entries.pin(recordId, {
+                "name": name,
+                "password": password,
+                "url": url,
+                "notices": notices,
+                "timestamp": timestamp
+            })
+            if self.__searchIndex is not None:
+                self.__searchIndex.add(recordId, category, title, entry)
 
     def changeEntry(self, category: str, title: str, prop: str, value: str) -> None:
         """6th step: change and entry"""
         self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
-        self.__entries[category][title][prop] = value
+        with self.__lock:
+            recordId = self.__index[category][title]
+            self.__markDirty(recordId)
+            entry = self.__entries.get(recordId)
+            entry[prop] = value
+            if prop == "timestamp":
+                self.__timestamps[recordId] = value
+                self.__markDirty(META_RECORD)
+            if self.__searchIndex is not None and prop in searchIndex.INDEXED_FIELDS:
+                self.__searchIndex.add(recordId, category, title, entry)
+
+    def iterEntries(self) -> Iterator[tuple[str, str, dict[str, str]]]:
+        """6th step: yields (category, title, entry) of all entries one by one"""
+        self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
+        for category in list(self.__index.keys()):
+            for title, recordId in list(self.__index.get(category, {}).items()):
+                if recordId in self.__entries:
+                    yield (category, title, self.__entries.peek(recordId))
 
     def searchEntry(self, keyWord: str) -> dict[str, list[str]]:
-        """6th step: Search an entry with a given keyword and returns the found entry"""
-        result: dict[str, list[str]] = {}
+        """6th step: Search an entry with a given keyword and returns the found entry. Passwords are not searched"""
         self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
-        for category in self.__entries.keys():
-            for title in self.__entries[category].keys():
-                for prop in self.__entries[category][title].keys():
-                    if keyWord in self.__entries[category][title][prop] or keyWord in title or keyWord in category:
-                        #Have to check keys, not values
-                        if not category in result.keys(): #pylint: disable=consider-iterating-dictionary
-                            result[category] = []
-                        if not title in result[category]:
-                            result[category].append(title)
-        return result
+        return self.__getSearchIndex().search(keyWord)
 
     def remEntry(self, category: str, title: str) -> None:
+        """6th step: remove an entry"""
         self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
-        del self.__entries[category][title]
+        with self.__lock:
+            recordId = self.__index[category][title]
+            self.__markDirty(recordId)
+            self.__markDirty(META_RECORD)
+            del self.__index[category][title]
+            self.__entries.remove(recordId)
+            self.__timestamps.pop(recordId, None)
+            if self.__searchIndex is not None:
+                self.__searchIndex.remove(recordId)
 
     def getOldPasswords(self) -> list[str]:
         """6th step: get all old password"""
@@ -232,6 +621,34 @@ class DataHandler:
     def addOldPassword(self, oldPassword: str) -> None:
         """6th step: add an old password"""
         self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
-        self.__oldPasswords.append(oldPassword)
-        if len(self.__oldPasswords) > 10:
-            del self.__oldPasswords[0]
+        with self.__lock:
+            self.__oldPasswords.append(oldPassword)
+            if len(self.__oldPasswords) > OLD_PASSWORDS:
+                del self.__oldPasswords[0]
+            self.__markDirty(META_RECORD)
+
+    def auditEntries(self, workers: int = 8) -> dict[str, list[tuple[str, str]]]:
+        """6th step: checks the passwords of all entries. Returns the (category, title) of weak,
+        breached (well known), reused and not checked entries"""
+        self.__ifSessionIsNotOpen("No session opened! Wrong order of calls!")
+        report: dict[str, list[tuple[str, str]]] = {"weak": [], "breached": [], "reused": [], "unchecked": []}
+        hashes: dict[str, list[tuple[str, str]]] = {}
+        for category, titles in self.__index.items():
+            for title, recordId in titles.items():
+                password = self.__entries.peek(recordId)["password"]
+                if self.__cryptor.getWeaknesses(password):
+                    report["weak"].append((category, title))
+                if password:
+                    hashes.setdefault(hashlib.sha1(password.encode("utf-8")).hexdigest().upper(), []).append((category, title))
+        oldHashes = {hashlib.sha1(password.encode("utf-8")).hexdigest().upper() for password in self.__oldPasswords}
+        pwned, failed = self.__cryptor.findPwned(set(hashes.keys()), workers)
+        for sha1, entries in hashes.items():
+            if sha1 in pwned:
+                report["breached"].extend(entries)
+            if sha1 in failed:
+                report["unchecked"].extend(entries)
+            if len(entries) > 1 or sha1 in oldHashes:
+                report["reused"].extend(entries)
+        for entries in report.values():
+            entries.sort()
+        return report
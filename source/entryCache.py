@@ -0,0 +1,101 @@
+#!/bin/python3
+"""
+File: entryCache.py
+Desc: Implements the entries of a session. The encrypted tokens of all entries are kept and an entry
+      is decrypted when it is used first. Decrypted entries are held in a least recently used cache
+      of a bounded size. Changed entries are pinned (never evicted) until they are saved, because
+      their token is outdated. Without a size limit every entry is decrypted when the tokens are
+      loaded and the tokens are dropped. With a limit the tokens of all entries stay in memory, so the
+      memory of a session is still linear in the number of entries (the tokens are smaller than the
+      decrypted entries and nothing is decrypted at the start).
+"""
+
+import json
+from collections import OrderedDict
+from typing import Callable, Optional
+
+class EntryCache:
+    """Class for holding encrypted and decrypted entries by record id"""
+
+    def __init__(self, decrypt: Callable[[str], str], size: Optional[int] = None) -> None:
+        self.__decrypt = decrypt
+        self.__size = size
+        self.__tokens: dict[str, str] = {}
+        self.__cache: OrderedDict[str, dict[str, str]] = OrderedDict()
+        self.__pinned: dict[str, dict[str, str]] = {}
+
+    def __contains__(self, recordId: str) -> bool:
+        return recordId in self.__pinned or recordId in self.__cache or recordId in self.__tokens
+
+    def __evict(self) -> None:
+        while self.__size is not None and len(self.__cache) > self.__size:
+            self.__cache.popitem(last=False)
+
+    def getSize(self) -> Optional[int]:
+        return self.__size
+
+    def getCachedCount(self) -> int:
+        """Returns the number of decrypted entries in memory"""
+        return len(self.__cache) + sum(1 for recordId in self.__pinned if recordId not in self.__cache)
+
+    def load(self, tokens: dict[str, str]) -> None:
+        """Replaces all entries by the given tokens, pinned entries are dropped"""
+        self.__cache = OrderedDict()
+        self.__pinned = {}
+        if self.__size is None:
+            self.__tokens = {}
+            for recordId, token in tokens.items():
+                self.__cache[recordId] = json.loads(self.__decrypt(token))
+        else:
+            self.__tokens = dict(tokens)
+
+    def get(self, recordId: str) -> dict[str, str]:
+        """Returns an entry, it is decrypted and cached if it is not in memory. Raises KeyError"""
+        if recordId in self.__pinned:
+            return self.__pinned[recordId]
+        entry = self.__cache.get(recordId)
+        if entry is not None:
+            self.__cache.move_to_end(recordId)
+            return entry
+        decrypted: dict[str, str] = json.loads(self.__decrypt(self.__tokens[recordId]))
+        self.__cache[recordId] = decrypted
+        self.__evict()
+        return decrypted
+
+    def peek(self, recordId: str) -> dict[str, str]:
+        """Returns an entry without caching it, for walking through all entries"""
+        if recordId in self.__pinned:
+            return self.__pinned[recordId]
+        if recordId in self.__cache:
+            return self.__cache[recordId]
+        decrypted: dict[str, str] = json.loads(self.__decrypt(self.__tokens[recordId]))
+        return decrypted
+
+    def getToken(self, recordId: str) -> Optional[str]:
+        """Returns the stored token of an entry, None if it has none or all entries are decrypted"""
+        return self.__tokens.get(recordId)
+
+    def pin(self, recordId: str, entry: Optional[dict[str, str]] = None) -> dict[str, str]:
+        """Keeps an entry in memory until it is released (the given entry or the current one). Returns it"""
+        if entry is None:
+            entry = self.get(recordId)
+        self.__pinned[recordId] = entry
+        return entry
+
+    def release(self, recordId: str, token: Optional[str] = None) -> None:
+        """Unpins an entry after it was saved as token. Without a token the stored token must still be valid"""
+        if token is not None and self.__size is not None:
+            self.__tokens[recordId] = token
+        if recordId not in self.__tokens and self.__size is not None:
+            #Nothing to decrypt it from again -> it stays pinned
+            return
+        entry = self.__pinned.pop(recordId, None)
+        if entry is not None:
+            self.__cache[recordId] = entry
+            self.__cache.move_to_end(recordId)
+            self.__evict()
+
+    def remove(self, recordId: str) -> None:
+        self.__tokens.pop(recordId, None)
+        self.__cache.pop(recordId, None)
+        self.__pinned.pop(recordId, None)
@@ -0,0 +1,204 @@
+#!/bin/python3
+"""
+File: exporter.py
+Desc: Implements the export of the entries of one or more users as csv, json, json lines or as an
+      encrypted backup. The entries are written one by one (the backup in chunks of entries), so the
+      plain text of the whole vault is never held in one string.
+      A backup starts with a json header line (format, key derivation, salt), every further line is
+      a Fernet token of a numbered chunk of entries. The last chunk holds the number of entries, so a
+      truncated backup or one with dropped or reordered lines is rejected.
+      Run it with: python3 exporter.py <vault> <out.csv|.json|.jsonl|.kwvb> --user USER [--user USER2]
+"""
+
+import os
+import sys
+import csv
+import json
+import base64
+import getpass
+import secrets
+import argparse
+from types import TracebackType
+from typing import Iterator, Optional, TextIO
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import cryptor
+import dataHandler
+
+FORMATS = ("csv", "json", "jsonl", "kwvb")
+#Columns of the csv export (the importer detects all of them)
+FIELDNAMES = ["account", "category", "title", "name", "password", "url", "notices", "timestamp"]
+#Entries per encrypted chunk of a backup
+CHUNK_SIZE = 256
+#Format name in the header line of a backup
+BACKUP_FORMAT = "kwv-backup"
+BACKUP_VERSION = 2
+BACKUP_ITERATIONS = 480000
+
+def deriveBackupKey(password: str, salt: bytes, iterations: int) -> bytes:
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=iterations)
+    return base64.urlsafe_b64encode(kdf.derive(password.encode("utf-8")))
+
+class Exporter:
+    """Class for writing entries to an export file, use it as a context manager"""
+
+    def __init__(self, path: str, fileFormat: Optional[str] = None, backupPassword: Optional[str] = None,
+                 chunkSize: int = CHUNK_SIZE) -> None:
+        if fileFormat is None:
+            fileFormat = path.rsplit(".", 1)[-1].lower()
+        if fileFormat not in FORMATS:
+            raise ValueError(f"Unknown export format {fileFormat}")
+        if fileFormat == "kwvb" and not backupPassword:
+            raise ValueError("A backup needs a password")
+        self.__format = fileFormat
+        self.__chunkSize = chunkSize
+        self.__chunk: list[dict[str, str]] = []
+        self.__chunks = 0
+        self.__count = 0
+        #Exports hold the passwords in plain text -> only the owner may read them, also if the file existed
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(descriptor, 0o600)
+        self.__file: TextIO = os.fdopen(descriptor, "w", encoding="utf-8", newline="")
+        self.__writer = csv.DictWriter(self.__file, fieldnames=FIELDNAMES)
+        self.__fernet: Optional[Fernet] = None
+        if fileFormat == "csv":
+            self.__writer.writeheader()
+        elif fileFormat == "json":
+            self.__file.write("[")
+        elif fileFormat == "kwvb":
+            salt = secrets.token_bytes(16)
+            header = {"format": BACKUP_FORMAT, "version": BACKUP_VERSION, "kdf": "pbkdf2-sha256",
+                      "iterations": BACKUP_ITERATIONS, "salt": base64.b64encode(salt).decode("utf-8")}
+            self.__file.write(json.dumps(header) + "\n")
+            self.__fernet = Fernet(deriveBackupKey(str(backupPassword), salt, BACKUP_ITERATIONS))
+
+    def __enter__(self) -> "Exporter":
+        return self
+
+    def __exit__(self, excType: Optional[type[BaseException]], excValue: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.close()
+
+    def __writeChunk(self, end: bool = False) -> None:
+        """Encrypts the collected entries as the next chunk of a backup. The end chunk holds the number of entries"""
+        if self.__fernet is None or (not self.__chunk and not end):
+            return
+        chunk: dict[str, object] = {"chunk": self.__chunks, "count": self.__count} if end else {"chunk": self.__chunks, "rows": self.__chunk}
+        token = self.__fernet.encrypt(json.dumps(chunk).encode("utf-8"))
+        self.__file.write(token.decode("utf-8") + "\n")
+        self.__chunks += 1
+        self.__chunk = []
+
+    def getCount(self) -> int:
+        return self.__count
+
+    def write(self, user: str, category: str, title: str, entry: dict[str, str]) -> None:
+        """Writes one entry in the format of the file"""
+        row = {"account": user, "category": category, "title": title}
+        row.update({field: entry.get(field, "") for field in FIELDNAMES[3:]})
+        if self.__format == "csv":
+            self.__writer.writerow(row)
+        elif self.__format == "json":
+            self.__file.write(("," if self.__count else "") + "\n" + json.dumps(row))
+        elif self.__format == "jsonl":
+            self.__file.write(json.dumps(row) + "\n")
+        else:
+            self.__chunk.append(row)
+            if len(self.__chunk) >= self.__chunkSize:
+                self.__writeChunk()
+        self.__count += 1
+
+    def writeSession(self, handler: dataHandler.DataHandler, user: str) -> int:
+        """Writes all entries of the open session of a DataHandler. Returns their number"""
+        count = 0
+        for category, title, entry in handler.iterEntries():
+            self.write(user, category, title, entry)
+            count += 1
+        return count
+
+    def close(self) -> None:
+        """Finishes and closes the file, a backup writes its last chunk and the end chunk"""
+        if self.__file.closed:
+            return
+        if self.__format == "json":
+            self.__file.write("\n]\n")
+        self.__writeChunk()
+        self.__writeChunk(end=True)
+        self.__file.close()
+
+def exportUsers(vaultPath: str, keys: dict[str, str], path: str, fileFormat: Optional[str] = None,
+                backupPassword: Optional[str] = None) -> int:
+    """Exports the entries of the given users (user -> master password) of a vault. Returns their number"""
+    exporter = Exporter(path, fileFormat, backupPassword)
+    try:
+        with exporter:
+            for user, key in keys.items():
+                handler = dataHandler.DataHandler(cryptor.Cryptor())
+                handler.openFile(vaultPath)
+                if not handler.getCryptor().isCorrectKey(key, handler.getKey(user)):
+                    raise ValueError(f"Wrong password for {user}")
+                handler.startSession()
+                exporter.writeSession(handler, user)
+                handler.closeSession()
+            return exporter.getCount()
+    except BaseException:
+        #No half written plain text export is left behind
+        os.remove(path)
+        raise
+
+def readBackup(path: str, password: str) -> Iterator[dict[str, object]]:
+    """Yields the entries of a backup chunk by chunk. A wrong password raises cryptography.fernet.InvalidToken,
+    missing, reordered or cut off chunks raise ValueError when they are reached"""
+    with open(path, "r", encoding="utf-8") as file:
+        header = json.loads(file.readline())
+        if header.get("format") != BACKUP_FORMAT or header.get("kdf") != "pbkdf2-sha256":
+            raise ValueError(f"{path} is not a backup")
+        if header.get("version") != BACKUP_VERSION:
+            raise ValueError(f"{path} has the unknown backup version {header.get('version')}")
+        fernet = Fernet(deriveBackupKey(password, base64.b64decode(header["salt"]), header["iterations"]))
+        chunks = 0
+        count = 0
+        end = False
+        for line in file:
+            if not line.strip():
+                continue
+            chunk = json.loads(fernet.decrypt(line.strip().encode("utf-8")))
+            if end or chunk["chunk"] != chunks:
+                raise ValueError(f"{path} has missing or reordered chunks")
+            chunks += 1
+            if "rows" not in chunk:
+                if chunk["count"] != count:
+                    raise ValueError(f"{path} has missing entries")
+                end = True
+                continue
+            count += len(chunk["rows"])
+            yield from chunk["rows"]
+        if not end:
+            raise ValueError(f"{path} is cut off")
+
+def main() -> None:
+    """Exports the users of the command line"""
+    parser = argparse.ArgumentParser(description="Exports the entries of a vault")
+    parser.add_argument("vault")
+    parser.add_argument("out", help="csv, json, jsonl or kwvb (encrypted backup) file")
+    parser.add_argument("--user", action="append", required=True, help="user to export, can be given more than once")
+    parser.add_argument("--format", choices=FORMATS)
+    args = parser.parse_args()
+
+    keys = {user: getpass.getpass(f"Password for {user}: ") for user in args.user}
+    backupPassword = None
+    if (args.format or args.out.rsplit(".", 1)[-1].lower()) == "kwvb":
+        backupPassword = getpass.getpass("Password for the backup: ")
+        if backupPassword != getpass.getpass("Repeat the password for the backup: "):
+            print("The passwords are not equal!")
+            sys.exit(1)
+    try:
+        count = exportUsers(args.vault, keys, args.out, args.format, backupPassword)
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
+    print(f"Exported {count} entries to {args.out}")
+
+if __name__ == "__main__":
+    main()
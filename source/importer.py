@@ -0,0 +1,239 @@
+#!/bin/python3
+"""
+File: importer.py
+Desc: Implements the import of entries from csv, json and json lines exports (e.g. of other password
+      managers) and from encrypted backups of the exporter. The rows are read one by one and added in batches, every batch is one transaction
+      of the DataHandler and therefore one save.
+      Run it with: python3 importer.py <vault> <user> <export> [--category-column COLUMN]
+"""
+
+import sys
+import csv
+import json
+import getpass
+import argparse
+import itertools
+import datetime
+from typing import Callable, Iterator, Optional
+import cryptor
+import dataHandler
+import exporter
+import objectAlreadyExistsException
+
+#Policies for titles that already exist in the category
+DUPLICATE_POLICIES = ("skip", "rename", "replace", "fail")
+#Entries added per transaction
+BATCH_SIZE = 500
+#Characters read at once from a json file
+READ_SIZE = 65536
+
+#Column names (lower case) of the fields in the exports of common password managers, the first found is used
+COLUMNS = {
+    "title": ["title", "name"],
+    "name": ["username", "login_username", "user", "login", "email", "name"],
+    "password": ["password", "login_password", "pass"],
+    "url": ["url", "login_uri", "login_uris_uri", "website", "uri"],
+    "notices": ["notices", "notes", "note", "extra", "comment", "comments"],
+    "timestamp": ["timestamp", "modified", "revisiondate", "lastmodified"],
+    "category": ["category", "group", "grouping", "folder"]
+}
+
+class Importer:
+    """Class for importing entries into an open session of a DataHandler"""
+
+    def __init__(self, handler: dataHandler.DataHandler, categoryColumn: Optional[str] = None, defaultCategory: str = "default",
+                 categoryMap: Optional[dict[str, str]] = None, duplicates: str = "skip", batchSize: int = BATCH_SIZE) -> None:
+        """categoryColumn: column with the category (found by COLUMNS if None)
+        categoryMap: renames categories of the export, duplicates: one of DUPLICATE_POLICIES"""
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate policy {duplicates}")
+        self.__handler = handler
+        self.__categoryColumn = categoryColumn.lower() if categoryColumn is not None else None
+        self.__defaultCategory = defaultCategory
+        self.__categoryMap = categoryMap or {}
+        self.__duplicates = duplicates
+        self.__batchSize = batchSize
+        #column names of a row -> field -> column
+        self.__layouts: dict[tuple[str, ...], dict[str, str]] = {}
+        self.__categories: set[str] = set()
+        #category -> titles, only filled for categories with renamed duplicates
+        self.__titles: dict[str, set[str]] = {}
+
+    def __getLayout(self, columns: tuple[str, ...]) -> dict[str, str]:
+        """Maps the fields to the columns of a row, the mapping is cached per set of columns"""
+        if columns in self.__layouts:
+            return self.__layouts[columns]
+        #Extra fields of a csv row without a column name are put under None by the csv reader
+        lowered = {column.lower().strip(): column for column in columns if isinstance(column, str)}
+        layout: dict[str, str] = {}
+        for field, names in COLUMNS.items():
+            if field == "category" and self.__categoryColumn is not None:
+                names = [self.__categoryColumn]
+            for name in names:
+                #A column is used for one field only ("name" is the title in some exports and the user name in others)
+                if name in lowered and lowered[name] not in layout.values():
+                    layout[field] = lowered[name]
+                    break
+        self.__layouts[columns] = layout
+        return layout
+
+    def __addEntry(self, category: str, title: str, entry: dict[str, str]) -> str:
+        """Adds an entry according to the duplicate policy. Returns what happened"""
+        try:
+            self.__handler.addEntry(category, title, entry["name"], entry["password"], entry["url"], entry["notices"], entry["timestamp"])
+            if category in self.__titles:
+                self.__titles[category].add(title)
+            return "added"
+        except objectAlreadyExistsException.ObjectAlreadyExistsException:
+            if self.__duplicates == "fail":
+                raise
+            if self.__duplicates == "skip":
+                return "skipped"
+        if self.__duplicates == "replace":
+            self.__handler.remEntry(category, title)
+            self.__addEntry(category, title, entry)
+            return "replaced"
+        number = 2
+        existing = self.__titles.get(category)
+        if existing is None:
+            existing = self.__titles[category] = set(self.__handler.getEntries(category))
+        while f"{title} ({number})" in existing:
+            number += 1
+        self.__addEntry(category, f"{title} ({number})", entry)
+        return "renamed"
+
+    def importRow(self, row: dict[str, object]) -> str:
+        """Adds one row of an export. Returns "added", "renamed", "replaced", "skipped" or "invalid" """
+        layout = self.__getLayout(tuple(row.keys()))
+        values = {field: str(row[column]) if row[column] is not None else "" for field, column in layout.items()}
+        title = values.get("title", "").strip()
+        if not title:
+            return "invalid"
+        category = values.get("category", "").strip() or self.__defaultCategory
+        category = self.__categoryMap.get(category, category)
+        if category not in self.__categories:
+            if category not in self.__handler.getCategories():
+                self.__handler.addCategory(category)
+            self.__categories.add(category)
+        entry = {field: values.get(field, "") for field in ("name", "password", "url", "notices")}
+        entry["timestamp"] = values.get("timestamp", "") or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return self.__addEntry(category, title, entry)
+
+    def importRows(self, rows: Iterator[dict[str, object]],
+                   progress: Optional[Callable[[dict[str, int]], None]] = None) -> dict[str, int]:
+        """Adds all rows in batches. progress gets the counts after every batch. If a row fails, its batch
+        is undone and the former batches stay saved"""
+        counts = {"added": 0, "renamed": 0, "replaced": 0, "skipped": 0, "invalid": 0}
+        try:
+            while True:
+                batch = list(itertools.islice(rows, self.__batchSize))
+                if not batch:
+                    break
+                with self.__handler.transaction():
+                    for row in batch:
+                        counts[self.importRow(row)] += 1
+                if progress is not None:
+                    progress(counts)
+        except BaseException:
+            #The failed batch is undone, it may have created categories and entries
+            self.__categories = set()
+            self.__titles = {}
+            raise
+        return counts
+
+    def importFile(self, path: str, fileFormat: Optional[str] = None,
+                   progress: Optional[Callable[[dict[str, int]], None]] = None, backupPassword: Optional[str] = None) -> dict[str, int]:
+        """Imports a csv, json (array of objects), jsonl or backup file. The format is taken from the extension if None"""
+        return self.importRows(readFile(path, fileFormat, backupPassword), progress)
+
+def flatten(value: dict[str, object], prefix: str = "") -> dict[str, object]:
+    """Flattens nested objects of json exports, e.g. {"login": {"username": ...}} -> login_username"""
+    flat: dict[str, object] = {}
+    for key, item in value.items():
+        if isinstance(item, list):
+            item = item[0] if item else ""
+        if isinstance(item, dict):
+            flat.update(flatten(item, f"{prefix}{key}_"))
+        else:
+            flat[prefix + key] = item
+    return flat
+
+def readCsv(path: str) -> Iterator[dict[str, object]]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as file:
+        yield from csv.DictReader(file)
+
+def readJsonLines(path: str) -> Iterator[dict[str, object]]:
+    with open(path, "r", encoding="utf-8-sig") as file:
+        for line in file:
+            if line.strip():
+                yield flatten(json.loads(line))
+
+def readJson(path: str) -> Iterator[dict[str, object]]:
+    """Reads the objects of a json array one by one, so the file does not have to fit in memory"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8-sig") as file:
+        buffer = file.read(READ_SIZE).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} is not a json array")
+        buffer = buffer[1:]
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                #The object is cut off at the end of the buffer -> read on
+                chunk = file.read(READ_SIZE)
+                if not chunk:
+                    raise
+                buffer += chunk
+                continue
+            yield flatten(value)
+            buffer = buffer[end:]
+
+def readFile(path: str, fileFormat: Optional[str] = None, backupPassword: Optional[str] = None) -> Iterator[dict[str, object]]:
+    """Returns the rows of an export one by one. The format is taken from the extension if it is not given"""
+    if fileFormat is None:
+        fileFormat = path.rsplit(".", 1)[-1].lower()
+    if fileFormat == "csv":
+        return readCsv(path)
+    if fileFormat == "json":
+        return readJson(path)
+    if fileFormat in ("jsonl", "ndjson"):
+        return readJsonLines(path)
+    if fileFormat == "kwvb":
+        if backupPassword is None:
+            raise ValueError("A backup needs a password")
+        return exporter.readBackup(path, backupPassword)
+    raise ValueError(f"Unknown import format {fileFormat}")
+
+def main() -> None:
+    """Imports the file of the command line into the account of a user"""
+    parser = argparse.ArgumentParser(description="Imports entries into a vault")
+    parser.add_argument("vault")
+    parser.add_argument("user")
+    parser.add_argument("export", help="csv, json, jsonl or kwvb (encrypted backup) file")
+    parser.add_argument("--format", choices=["csv", "json", "jsonl", "kwvb"])
+    parser.add_argument("--category-column", help="column with the category")
+    parser.add_argument("--category", default="default", help="category of rows without one")
+    parser.add_argument("--duplicates", choices=DUPLICATE_POLICIES, default="skip")
+    args = parser.parse_args()
+
+    handler = dataHandler.DataHandler(cryptor.Cryptor())
+    handler.openFile(args.vault)
+    if not handler.getCryptor().isCorrectKey(getpass.getpass(f"Password for {args.user}: "), handler.getKey(args.user)):
+        print("Wrong password!")
+        sys.exit(1)
+    backupPassword = None
+    if (args.format or args.export.rsplit(".", 1)[-1].lower()) == "kwvb":
+        backupPassword = getpass.getpass("Password for the backup: ")
+    handler.startSession()
+    importer = Importer(handler, args.category_column, args.category, duplicates=args.duplicates)
+    counts = importer.importFile(args.export, args.format,
+                                 lambda counts: print(f"\r{sum(counts.values())} rows processed", end="", flush=True), backupPassword)
+    handler.closeSession()
+    print("\n" + ", ".join(f"{count} {kind}" for kind, count in counts.items()))
+
+if __name__ == "__main__":
+    main()
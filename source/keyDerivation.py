@@ -0,0 +1,96 @@
+#!/bin/python3
+"""
+File: keyDerivation.py
+Desc: Derives keys from passwords with configurable parameters. A parameter string names the
+      algorithm and its cost, e.g. "pbkdf2-sha256$i=600000" or "scrypt$n=131072;r=8;p=1". The
+      parameters can be calibrated on a host, so the key derivation takes about a target time there.
+      Run it with: python3 keyDerivation.py [--target 0.5] [--algorithm scrypt|pbkdf2-sha256]
+"""
+
+import time
+import argparse
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+ALGORITHMS = ("pbkdf2-sha256", "scrypt")
+DEFAULT_PARAMS = "scrypt$n=131072;r=8;p=1"
+#Bytes of a derived key and of a salt
+KEY_LENGTH = 32
+SALT_LENGTH = 16
+#A calibration never goes below the lower or above the upper bound
+MIN_COST = {"pbkdf2-sha256": 600000, "scrypt": 2**15}
+MAX_COST = {"pbkdf2-sha256": 100000000, "scrypt": 2**20}
+#Cost of the test runs of a calibration
+PROBE_COST = {"pbkdf2-sha256": 100000, "scrypt": 2**14}
+
+def formatParams(algorithm: str, cost: int) -> str:
+    """Returns the parameter string of an algorithm with a cost (iterations or the scrypt n)"""
+    if algorithm == "pbkdf2-sha256":
+        return f"pbkdf2-sha256$i={cost}"
+    if algorithm == "scrypt":
+        return f"scrypt$n={cost};r=8;p=1"
+    raise ValueError(f"Unknown key derivation {algorithm}")
+
+def parseParams(params: str) -> tuple[str, dict[str, int]]:
+    """Returns the algorithm and the values of a parameter string. Raises ValueError"""
+    algorithm, _, text = params.partition("$")
+    try:
+        values = {name: int(value) for name, _, value in (pair.partition("=") for pair in text.split(";"))}
+    except ValueError as error:
+        raise ValueError(f"Invalid key derivation parameters {params}") from error
+    required = {"pbkdf2-sha256": {"i"}, "scrypt": {"n", "r", "p"}}.get(algorithm)
+    if required is None:
+        raise ValueError(f"Unknown key derivation {algorithm}")
+    if set(values) != required or min(values.values()) < 1:
+        raise ValueError(f"Invalid key derivation parameters {params}")
+    if algorithm == "scrypt" and values["n"] & (values["n"] - 1):
+        raise ValueError(f"The scrypt n must be a power of two: {params}")
+    return (algorithm, values)
+
+def deriveKey(password: str, params: str, salt: bytes) -> bytes:
+    """Derives a key of KEY_LENGTH bytes from a password"""
+    algorithm, values = parseParams(params)
+    if algorithm == "scrypt":
+        return Scrypt(salt=salt, length=KEY_LENGTH, n=values["n"], r=values["r"], p=values["p"]).derive(password.encode("utf-8"))
+    return PBKDF2HMAC(algorithm=hashes.SHA256(), length=KEY_LENGTH, salt=salt, iterations=values["i"]).derive(password.encode("utf-8"))
+
+def measure(params: str, repeat: int = 3) -> float:
+    """Returns the fastest time of a key derivation in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        deriveKey("calibration", params, bytes(SALT_LENGTH))
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def calibrate(target: float, algorithm: str = "scrypt") -> str:
+    """Returns the parameters of an algorithm for a key derivation of about target seconds on this host.
+    The time grows linear with the cost, so it is measured once with a small cost"""
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown key derivation {algorithm}")
+    probe = PROBE_COST[algorithm]
+    cost = probe * target / measure(formatParams(algorithm, probe))
+    if algorithm == "scrypt":
+        #n must be a power of two -> the nearest one
+        power = 1
+        while power * 2 <= cost:
+            power *= 2
+        cost = power * 2 if cost / power > 1.5 else power
+    else:
+        cost = round(cost, -4)
+    return formatParams(algorithm, int(min(max(cost, MIN_COST[algorithm]), MAX_COST[algorithm])))
+
+def main() -> None:
+    """Prints the calibrated parameters for the target time of the command line"""
+    parser = argparse.ArgumentParser(description="Finds the key derivation parameters for an unlock time on this host")
+    parser.add_argument("--target", type=float, default=0.5, help="seconds of an unlock")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default="scrypt")
+    args = parser.parse_args()
+
+    params = calibrate(args.target, args.algorithm)
+    print(f"Unlock takes {measure(params, 1):.2f} s with these parameters, use them with:")
+    print(f"KWV_KDF='{params}'")
+
+if __name__ == "__main__":
+    main()
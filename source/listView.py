@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+File: listView.py
+Desc: Implements a scrollable list for the TUI. Only the visible items are drawn, moving the cursor
+      redraws just the old and the new item and the output is batched with noutrefresh / doupdate.
+"""
+
+import curses
+from typing import List, Tuple
+
+# Keys that select the current item
+ENTER_KEYS = (curses.KEY_ENTER, 10, 13)
+# Keys that leave the list without a selection
+CANCEL_KEYS = (27, curses.KEY_EXIT)
+
+class ListView:
+    """Class for choosing an item of a vertical or horizontal list"""
+    __window: curses.window
+    __items: List[str]
+    __top: int
+    __horizontal: bool
+    __centered: bool
+    __selectedAttr: int
+    __position: int
+    __first: int
+    __cells: List[Tuple[int, int, int, str]]
+
+    def __init__(self, window: curses.window, items: List[str], *, top: int = 2, horizontal: bool = False,
+                 centered: bool = True, selectedAttr: int = curses.A_REVERSE) -> None:
+        self.__window = window
+        self.__items = items
+        self.__top = top
+        self.__horizontal = horizontal
+        self.__centered = centered
+        self.__selectedAttr = selectedAttr
+        self.__position = 0
+        self.__first = 0
+        # (index, y, x, text) of the visible items
+        self.__cells = []
+
+    def __layout(self) -> List[Tuple[int, int, int, str]]:
+        height, width = self.__window.getmaxyx()
+        cells: List[Tuple[int, int, int, str]] = []
+        if self.__horizontal:
+            x = 0
+            for idx in range(self.__first, len(self.__items)):
+                text = f"[ {self.__items[idx]} ]"[:width - 1]
+                if cells and x + len(text) > width - 1:
+                    break
+                cells.append((idx, self.__top, x, text))
+                x += len(text) + 1
+            shift = max(0, (width - x) // 2) if self.__centered else 0
+            return [(idx, y, cellX + shift, text) for idx, y, cellX, text in cells]
+        rows = max(1, height - self.__top - 1)
+        for idx in range(self.__first, min(len(self.__items), self.__first + rows)):
+            text = self.__items[idx][:width - 1]
+            x = max(0, width // 2 - len(text) // 2) if self.__centered else 1
+            cells.append((idx, self.__top + idx - self.__first, x, text))
+        return cells
+
+    def __pageSize(self) -> int:
+        if self.__horizontal:
+            return max(1, len(self.__cells))
+        return max(1, self.__window.getmaxyx()[0] - self.__top - 1)
+
+    def __drawCell(self, cell: Tuple[int, int, int, str]) -> None:
+        idx, y, x, text = cell
+        mode = self.__selectedAttr if idx == self.__position else curses.A_NORMAL
+        try:
+            self.__window.addstr(y, x, text, mode)
+        except curses.error:
+            # Writing the bottom right corner moves the cursor out of the window
+            pass
+
+    def __findCell(self, idx: int) -> int:
+        for number, cell in enumerate(self.__cells):
+            if cell[0] == idx:
+                return number
+        return -1
+
+    def draw(self) -> None:
+        """Redraws all visible items, e.g. after another screen was shown"""
+        self.__cells = self.__layout()
+        self.__window.move(min(self.__top, self.__window.getmaxyx()[0] - 1), 0)
+        self.__window.clrtobot()
+        for cell in self.__cells:
+            self.__drawCell(cell)
+        self.__window.noutrefresh()
+        curses.doupdate()
+
+    def move(self, step: int) -> None:
+        """Moves the cursor by step items and scrolls if the new item is not visible"""
+        old = self.__position
+        self.__position = max(0, min(len(self.__items) - 1, self.__position + step))
+        if self.__position == old:
+            return
+        oldCell = self.__findCell(old)
+        newCell = self.__findCell(self.__position)
+        if oldCell >= 0 and newCell >= 0:
+            self.__drawCell(self.__cells[oldCell])
+            self.__drawCell(self.__cells[newCell])
+            self.__window.noutrefresh()
+            curses.doupdate()
+            return
+        # The new item is not visible -> scroll so that it becomes the first or last visible item
+        if self.__position < self.__first or not self.__horizontal:
+            self.__first = self.__position if self.__position < self.__first else self.__position - self.__pageSize() + 1
+        else:
+            self.__first = self.__position
+            width = self.__window.getmaxyx()[1]
+            used = len(f"[ {self.__items[self.__position]} ]") + 1
+            while self.__first > 0 and used + len(f"[ {self.__items[self.__first - 1]} ]") + 1 <= width - 1:
+                self.__first -= 1
+                used += len(f"[ {self.__items[self.__first]} ]") + 1
+        self.__first = max(0, self.__first)
+        self.draw()
+
+    def getPosition(self) -> int:
+        return self.__position
+
+    def select(self, cancelable: bool = False) -> int:
+        """Lets the user choose an item. Returns its index or -1 if the list was left with escape"""
+        previousKey, nextKey = (curses.KEY_LEFT, curses.KEY_RIGHT) if self.__horizontal else (curses.KEY_UP, curses.KEY_DOWN)
+        self.draw()
+        while True:
+            key = self.__window.getch()
+            if key in ENTER_KEYS:
+                return self.__position
+            if cancelable and key in CANCEL_KEYS:
+                return -1
+            if key == previousKey:
+                self.move(-1)
+            elif key == nextKey:
+                self.move(1)
+            elif key == curses.KEY_PPAGE:
+                self.move(-self.__pageSize())
+            elif key == curses.KEY_NPAGE:
+                self.move(self.__pageSize())
+            elif key == curses.KEY_HOME:
+                self.move(-len(self.__items))
+            elif key == curses.KEY_END:
+                self.move(len(self.__items))
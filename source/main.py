@@ -15,7 +15,13 @@ import json
 import csv
 from dataHandler import DataHandler
 from search import SearchBar
+from listView import ListView
 from cryptor import Cryptor
+from unlockAgent import AgentClient, SOCKET_ENV
+from pwnedDatabase import PwnedDatabase
+from rangeCache import RangeCache
+from autoSaver import AutoSaver
+from importer import Importer, DUPLICATE_POLICIES
 
 import curses
 import datetime
@@ -25,9 +31,12 @@ from typing import List, Optional, Union
 class Frontend:
     __screen: curses.window
     __dataHandler: DataHandler
+    __autosave: AutoSaver
 
     def __init__(self, dataHandler: DataHandler) -> None:
         self.__dataHandler = dataHandler
+        # Änderungen werden im Hintergrund gespeichert, die Oberfläche wartet nie auf die Datei
+        self.__autosave = AutoSaver(dataHandler.saveEntries)
 
     def __initTerm(self) -> None:
         self.__screen = curses.initscr()
@@ -120,7 +129,7 @@ class Frontend:
     
                     try:
                         # Versuch, einen neuen Nutzer hinzuzufügen
-                        self.__dataHandler.addUser(new_user, self.__dataHandler.getCryptor().hashKey(new_pass, True))
+                        self.__dataHandler.addUser(new_user, self.__dataHandler.getCryptor().newKey(new_pass))
                         self.__screen.addstr(new_pass_y + 2, curses.COLS // 2 - 10, f"User {new_user} created.", curses.A_BOLD)
                         self.__screen.refresh()
                         self.__screen.getch()
@@ -148,6 +157,8 @@ class Frontend:
     
             # Authentication
             if self.__dataHandler.getCryptor().isCorrectKey(entered_password, self.__dataHandler.getKey(selected_user)):
+                # Alte oder anders parametrisierte Schlüssel werden beim Login umgestellt
+                self.__dataHandler.upgradeKey(entered_password)
                 self.__dataHandler.startSession()
                 self.__screen.addstr(pass_y + 2, pass_x, "Login successful! Press any key to continue.", curses.A_BOLD)
                 self.__screen.refresh()
@@ -168,58 +179,49 @@ class Frontend:
         self.__screen.clear()
         self.__screen.refresh()
 
-        current_row: int = 0
         menu: List[str] = [
             'Add Entry', 'View Entries', 'Edit Entry', 'Delete Category', 'Delete Entry', 'Generate Password',
-            'Check Password Security', 'Delete Current User', 'Logout and Return to Login Screen', 'Exit'
+            'Check Password Security', 'Audit Vault', 'Import Entries', 'Change Master Password', 'Delete Current User',
+            'Logout and Return to Login Screen', 'Exit'
         ]
+        h, w = self.__screen.getmaxyx()
+        menu_view = ListView(self.__screen, menu, top=max(0, h // 2 - len(menu) // 2), selectedAttr=curses.color_pair(1))
 
         while True:
             self.__screen.clear()
-            h, w = self.__screen.getmaxyx()
-
-            for idx, row in enumerate(menu):
-                x: int = w // 2 - len(row) // 2
-                y: int = h // 2 - len(menu) // 2 + idx
-                if idx == current_row:
-                    self.__screen.attron(curses.color_pair(1))
-                    self.__screen.addstr(y, x, row)
-                    self.__screen.attroff(curses.color_pair(1))
-                else:
-                    self.__screen.addstr(y, x, row)
-
-            key: int = self.__screen.getch()
-
-            if key == curses.KEY_UP and current_row > 0:
-                current_row -= 1
-            elif key == curses.KEY_DOWN and current_row < len(menu) - 1:
-                current_row += 1
-            elif key in (curses.KEY_ENTER, 10, 13):
-                if current_row == 0:
-                    self.add_entry()
-                elif current_row == 1:
-                    self.view_categories()
-                elif current_row == 2:
-                    self.edit_entry()
-                elif current_row == 3:
-                    self.delete_category() 
-                elif current_row == 4:
-                    self.delete_entry()
-                elif current_row == 5:
-                    self.generate_password()
-                elif current_row == 6:
-                    self.check_password_security()
-                elif current_row == 7:
-                    self.delete_current_user()
-                elif current_row == 8:
-                    self.back_to_login()
-                elif current_row == 9:
+            current_row: int = menu_view.select()
+
+            if current_row == 0:
+                self.add_entry()
+            elif current_row == 1:
+                self.view_categories()
+            elif current_row == 2:
+                self.edit_entry()
+            elif current_row == 3:
+                self.delete_category() 
+            elif current_row == 4:
+                self.delete_entry()
+            elif current_row == 5:
+                self.generate_password()
+            elif current_row == 6:
+                self.check_password_security()
+            elif current_row == 7:
+                self.audit_vault()
+            elif current_row == 8:
+                self.import_entries()
+            elif current_row == 9:
+                self.change_master_password()
+            elif current_row == 10:
+                self.delete_current_user()
+            elif current_row == 11:
+                self.back_to_login()
+            elif current_row == 12:
+                # Ohne gespeicherte Änderungen geht es zurück ins Menü
+                if self.close_session():
                     self.resetTerm()
-                    break
+                    exit()
 
             self.__screen.refresh()
-    
-        exit()
 
     def delete_category(self) -> None:
         curses.curs_set(0)
@@ -234,34 +236,10 @@ class Frontend:
             self.__screen.getch()
             return
 
-        current_selection: int = 0
-
         # Category selection menu
-        while True:
-            self.__screen.clear()
-            self.__screen.addstr(0, 0, "Select a category to delete:")
-            
-            for idx, category in enumerate(categories):
-                x: int = curses.COLS // 2 - len(category) // 2
-                y: int = 2 + idx
-                if idx == current_selection:
-                    self.__screen.attron(curses.A_REVERSE)
-                    self.__screen.addstr(y, x, category)
-                    self.__screen.attroff(curses.A_REVERSE)
-                else:
-                    self.__screen.addstr(y, x, category)
-            
-            key: int = self.__screen.getch()
-            
-            if key == curses.KEY_UP and current_selection > 0:
-                current_selection -= 1
-            elif key == curses.KEY_DOWN and current_selection < len(categories) - 1:
-                current_selection += 1
-            elif key in (curses.KEY_ENTER, 10, 13):
-                selected_category: str = categories[current_selection]
-                break
-
-            self.__screen.refresh()
+        self.__screen.clear()
+        self.__screen.addstr(0, 0, "Select a category to delete:")
+        selected_category: str = categories[ListView(self.__screen, categories).select()]
 
         # Bestätigungsabfrage zur Löschung der ausgewählten Kategorie
         self.__screen.clear()
@@ -273,6 +251,7 @@ class Frontend:
         # Bestätigen, ob gelöscht werden soll
         if choice in ('y', 'Y'):
             self.__dataHandler.remCategory(selected_category)
+            self.__autosave.schedule()
             self.__screen.clear()
             self.__screen.addstr(0, 0, "Category deleted! Press any key to return to the main menu.")
         else:
@@ -296,48 +275,32 @@ class Frontend:
             self.__screen.addstr(0, 0, "Select a category or create a new one:")
             categories = self.__dataHandler.getCategories()
             categories.append("Create New Category")
-            current_selection = 0
+            category_view = ListView(self.__screen, categories)
     
             while True:
                 self.__screen.clear()
                 self.__screen.addstr(0, 0, "Select a category or create a new one:")
                 
                 # Kategorienliste anzeigen
-                for idx, category in enumerate(categories):
-                    x = curses.COLS // 2 - len(category) // 2
-                    y = 2 + idx
-                    if idx == current_selection:
-                        self.__screen.attron(curses.A_REVERSE)
-                        self.__screen.addstr(y, x, category)
-                        self.__screen.attroff(curses.A_REVERSE)
-                    else:
-                        self.__screen.addstr(y, x, category)
-                
-                key = self.__screen.getch()
+                current_selection = category_view.select()
                 
-                if key == curses.KEY_UP and current_selection > 0:
-                    current_selection -= 1
-                elif key == curses.KEY_DOWN and current_selection < len(categories) - 1:
-                    current_selection += 1
-                elif key in (curses.KEY_ENTER, 10, 13):
-                    if current_selection == len(categories) - 1:  # "Create New Category" ausgewählt
-                        self.__screen.clear()
-                        self.__screen.refresh()
-                        self.__screen.addstr(0, 0, "Enter new category name: ")
-                        self.__screen.refresh()
-                        new_category = self.get_input(0, len("Enter new category name: "))
-                        if new_category:
-                            self.__dataHandler.addCategory(new_category)
-                            selected_category = new_category
-                        else:
-                            self.__screen.addstr(2, 0, "Invalid category name! Press any key to try again.")
-                            self.__screen.getch()
-                            continue
-                    else:  # Existierende Kategorie ausgewählt
-                        selected_category = categories[current_selection]
-                    break
-    
-                self.__screen.refresh()
+                if current_selection == len(categories) - 1:  # "Create New Category" ausgewählt
+                    self.__screen.clear()
+                    self.__screen.refresh()
+                    self.__screen.addstr(0, 0, "Enter new category name: ")
+                    self.__screen.refresh()
+                    new_category = self.get_input(0, len("Enter new category name: "))
+                    if new_category:
+                        self.__dataHandler.addCategory(new_category)
+                        self.__autosave.schedule()
+                        selected_category = new_category
+                    else:
+                        self.__screen.addstr(2, 0, "Invalid category name! Press any key to try again.")
+                        self.__screen.getch()
+                        continue
+                else:  # Existierende Kategorie ausgewählt
+                    selected_category = categories[current_selection]
+                break
     
             # Bildschirm für die Eintragsdetails bereinigen und vorbereiten
             self.__screen.clear()
@@ -364,8 +327,9 @@ class Frontend:
     
             # Eintrag zur ausgewählten Kategorie hinzufügen
             try:
-                self.__dataHandler.addEntry(selected_category, title, username, password, url, notes, timestamp)
-                self.__dataHandler.saveEntries()
+                with self.__dataHandler.transaction(save=False):
+                    self.__dataHandler.addEntry(selected_category, title, username, password, url, notes, timestamp)
+                self.__autosave.schedule()
                 self.__screen.addstr(8, 0, "Entry added successfully! Press any key to return to the main menu.")
             except Exception as e:
                 self.__screen.addstr(8, 0, f"Failed to add entry: {str(e)}. Press any key to return.")
@@ -414,76 +378,35 @@ class Frontend:
         self.__screen.addstr(1, curses.COLS // 2 - len(title) // 2, title, curses.A_BOLD | curses.A_UNDERLINE)
         
         menu_items = users + ["Create New User"]
-        current_row = 0
 
-        while True:
-            self.__screen.clear()
-            h, w = self.__screen.getmaxyx()
-
-            # Display the user selection menu
-            for idx, user in enumerate(menu_items):
-                x = w // 2 - len(user) // 2
-                y = h // 2 - len(menu_items) // 2 + idx
-                if idx == current_row:
-                    self.__screen.attron(curses.color_pair(1))
-                    self.__screen.addstr(y, x, user)
-                    self.__screen.attroff(curses.color_pair(1))
-                else:
-                    self.__screen.addstr(y, x, user)
+        self.__screen.clear()
+        h, w = self.__screen.getmaxyx()
 
-            self.__screen.refresh()
-            key = self.__screen.getch()
+        # Display the user selection menu
+        current_row = ListView(self.__screen, menu_items, top=max(0, h // 2 - len(menu_items) // 2),
+                               selectedAttr=curses.color_pair(1)).select()
 
-            # Navigate the menu
-            if key == curses.KEY_UP and current_row > 0:
-                current_row -= 1
-            elif key == curses.KEY_DOWN and current_row < len(menu_items) - 1:
-                current_row += 1
-            elif key in (curses.KEY_ENTER, 10, 13):
-                # If "Create New User" is selected, return a special string
-                if current_row == len(menu_items) - 1:
-                    return "create_new"
-                else:
-                    return menu_items[current_row]
+        # If "Create New User" is selected, return a special string
+        if current_row == len(menu_items) - 1:
+            return "create_new"
+        else:
+            return menu_items[current_row]
 
     def view_categories(self) -> None:
         curses.curs_set(0)
-        current_selection = 0
         
         self.ensure_default_category()
         items = self.__dataHandler.getCategories()
+        category_view = ListView(self.__screen, items, top=0, horizontal=True)
 
         while True:
             self.__screen.clear()
     
-            max_height, max_width = self.__screen.getmaxyx()
-    
-            total_width = sum(len(item) + 4 for item in items) - 1
-            start_x = (max_width // 2) - (total_width // 2)
-            y_position = 0
-            
-            current_x = start_x
-            
-            for idx, item in enumerate(items):
-                item_with_padding = f"[ {item} ]"
-                if idx == current_selection:
-                    self.__screen.attron(curses.A_REVERSE)
-                    self.__screen.addstr(y_position, current_x, item_with_padding)
-                    self.__screen.attroff(curses.A_REVERSE)
-                else:
-                    self.__screen.addstr(y_position, current_x, item_with_padding)
-                current_x += len(item_with_padding) + 1
-    
-            key = self.__screen.getch()
+            current_selection = category_view.select(cancelable=True)
     
-            if key in (curses.KEY_ENTER, 10, 13):
-                self.view_entries(items[current_selection])
-            elif key == curses.KEY_LEFT and current_selection > 0:
-                current_selection -= 1
-            elif key == curses.KEY_RIGHT and current_selection < len(items) - 1:
-                current_selection += 1
-            elif key in (27, curses.KEY_EXIT):
+            if current_selection < 0:
                 break
+            self.view_entries(items[current_selection])
     
             self.__screen.refresh()
 
@@ -599,10 +522,13 @@ class Frontend:
                 self.__screen.getch()
                 break
 
-        self.__dataHandler.changeEntry(category, title, "name", name)
-        self.__dataHandler.changeEntry(category, title, "url", url)
-        self.__dataHandler.changeEntry(category, title, "notices", notices)
-        self.__dataHandler.changeEntry(category, title, "timestamp", str(datetime.datetime.now()))
+        # Alle Änderungen werden gemeinsam in einem Schreibvorgang gespeichert
+        with self.__dataHandler.transaction(save=False):
+            self.__dataHandler.changeEntry(category, title, "name", name)
+            self.__dataHandler.changeEntry(category, title, "url", url)
+            self.__dataHandler.changeEntry(category, title, "notices", notices)
+            self.__dataHandler.changeEntry(category, title, "timestamp", str(datetime.datetime.now()))
+        self.__autosave.schedule()
 
     def delete_entry(self) -> None:
             curses.curs_set(0)
@@ -617,34 +543,10 @@ class Frontend:
                 self.__screen.getch()
                 return
     
-            current_selection = 0
-    
             # Kategorie-Auswahlmenü
-            while True:
-                self.__screen.clear()
-                self.__screen.addstr(0, 0, "Select a category:")
-                
-                for idx, category in enumerate(categories):
-                    x = curses.COLS // 2 - len(category) // 2
-                    y = 2 + idx
-                    if idx == current_selection:
-                        self.__screen.attron(curses.A_REVERSE)
-                        self.__screen.addstr(y, x, category)
-                        self.__screen.attroff(curses.A_REVERSE)
-                    else:
-                        self.__screen.addstr(y, x, category)
-                
-                key = self.__screen.getch()
-                
-                if key == curses.KEY_UP and current_selection > 0:
-                    current_selection -= 1
-                elif key == curses.KEY_DOWN and current_selection < len(categories) - 1:
-                    current_selection += 1
-                elif key in (curses.KEY_ENTER, 10, 13):
-                    selected_category = categories[current_selection]
-                    break
-    
-                self.__screen.refresh()
+            self.__screen.clear()
+            self.__screen.addstr(0, 0, "Select a category:")
+            selected_category = categories[ListView(self.__screen, categories).select()]
     
             # Einträge der ausgewählten Kategorie anzeigen
             self.__screen.clear()
@@ -656,34 +558,10 @@ class Frontend:
                 self.__screen.getch()
                 return
     
-            current_entry_selection = 0
-    
             # Eintrag-Auswahlmenü
-            while True:
-                self.__screen.clear()
-                self.__screen.addstr(0, 0, f"Entries in '{selected_category}':")
-                
-                for idx, entry in enumerate(entries):
-                    x = curses.COLS // 2 - len(entry) // 2
-                    y = 2 + idx
-                    if idx == current_entry_selection:
-                        self.__screen.attron(curses.A_REVERSE)
-                        self.__screen.addstr(y, x, entry)
-                        self.__screen.attroff(curses.A_REVERSE)
-                    else:
-                        self.__screen.addstr(y, x, entry)
-                
-                key = self.__screen.getch()
-                
-                if key == curses.KEY_UP and current_entry_selection > 0:
-                    current_entry_selection -= 1
-                elif key == curses.KEY_DOWN and current_entry_selection < len(entries) - 1:
-                    current_entry_selection += 1
-                elif key in (curses.KEY_ENTER, 10, 13):
-                    selected_entry = entries[current_entry_selection]
-                    break
-    
-                self.__screen.refresh()
+            self.__screen.clear()
+            self.__screen.addstr(0, 0, f"Entries in '{selected_category}':")
+            selected_entry = entries[ListView(self.__screen, entries).select()]
     
             # Bestätigungsabfrage zur Löschung des ausgewählten Eintrags
             self.__screen.clear()
@@ -695,6 +573,7 @@ class Frontend:
             # Bestätigen, ob gelöscht werden soll
             if choice in ('y', 'Y'):
                 self.__dataHandler.remEntry(selected_category, selected_entry)
+                self.__autosave.schedule()
                 self.__screen.clear()
                 self.__screen.addstr(0, 0, "Entry deleted! Press any key to return to the main menu.")
             else:
@@ -794,6 +673,115 @@ class Frontend:
         self.__screen.getch()
 
 
+    def audit_vault(self) -> None:
+        curses.curs_set(0)
+        self.__screen.clear()
+        self.__screen.addstr(0, 0, "Vault Audit")
+        self.__screen.addstr(2, 0, "Checking all passwords...")
+        self.__screen.refresh()
+
+        report = self.__dataHandler.auditEntries()
+
+        # Ergebnisanzeige, nur so viele Zeilen wie auf den Bildschirm passen
+        h, w = self.__screen.getmaxyx()
+        lines: List[str] = []
+        for kind, label in (("weak", "Weak"), ("breached", "Well known"), ("reused", "Reused"), ("unchecked", "Not checked")):
+            lines.append(f"{label}: {len(report[kind])}")
+            lines.extend(f"    {category} / {title}" for category, title in report[kind])
+        self.__screen.clear()
+        self.__screen.addstr(0, 0, "Vault Audit")
+        for idx, line in enumerate(lines[:max(0, h - 4)]):
+            self.__screen.addstr(2 + idx, 0, line[:w - 1])
+        self.__screen.addstr(h - 1, 0, "Press any key to return to the main menu."[:w - 1])
+        self.__screen.refresh()
+        self.__screen.getch()
+
+    def import_entries(self) -> None:
+        curses.curs_set(1)
+        self.__screen.clear()
+        self.__screen.addstr(0, 0, "Import Entries")
+        self.__screen.addstr(2, 0, "Path of the export (csv, json or jsonl): ")
+        self.__screen.refresh()
+        path = self.get_input(2, len("Path of the export (csv, json or jsonl): "))
+        if not os.path.isfile(path):
+            self.__screen.addstr(4, 0, "File not found! Press any key to return to the main menu.")
+            self.__screen.getch()
+            return
+
+        self.__screen.addstr(3, 0, "Column with the category (leave blank to detect it): ")
+        self.__screen.refresh()
+        category_column = self.get_input(3, len("Column with the category (leave blank to detect it): "))
+
+        # Umgang mit bereits vorhandenen Titeln auswählen
+        self.__screen.addstr(5, 0, "Existing titles:")
+        policy = DUPLICATE_POLICIES[ListView(self.__screen, list(DUPLICATE_POLICIES), top=6, horizontal=True,
+                                             centered=False).select()]
+
+        def show_progress(counts: dict[str, int]) -> None:
+            self.__screen.move(8, 0)
+            self.__screen.clrtoeol()
+            self.__screen.addstr(8, 0, f"{sum(counts.values())} rows processed...")
+            self.__screen.refresh()
+
+        # Jeder Stapel wird in einer Transaktion gespeichert
+        if not self.save_changes(8):
+            return
+        importer = Importer(self.__dataHandler, category_column or None, duplicates=policy)
+        try:
+            counts = importer.importFile(path, progress=show_progress)
+            message = ", ".join(f"{count} {kind}" for kind, count in counts.items())
+        except Exception as e:
+            message = f"Import failed: {type(e).__name__} {str(e)}"
+        self.__screen.addstr(9, 0, message[:self.__screen.getmaxyx()[1] - 1])
+        self.__screen.addstr(11, 0, "Press any key to return to the main menu.")
+        self.__screen.refresh()
+        self.__screen.getch()
+
+    def change_master_password(self) -> None:
+        curses.curs_set(1)
+        self.__screen.clear()
+        self.__screen.addstr(0, 0, "Change Master Password")
+        prompts = ["Current password: ", "New password: ", "Repeat new password: "]
+        passwords: List[str] = []
+        for idx, prompt in enumerate(prompts):
+            self.__screen.addstr(2 + idx, 0, prompt)
+            self.__screen.refresh()
+            passwords.append(self.get_input(2 + idx, len(prompt), password=True))
+        current, new_password, repeated = passwords
+
+        if not self.__dataHandler.checkKey(current):
+            self.__screen.addstr(6, 0, "Wrong password! Press any key to return to the main menu.")
+            self.__screen.getch()
+            return
+        if not new_password or new_password != repeated:
+            self.__screen.addstr(6, 0, "The new passwords are empty or not equal! Press any key to return to the main menu.")
+            self.__screen.getch()
+            return
+
+        # Ausstehende Änderungen werden vorher geschrieben, danach wird in Blöcken neu verschlüsselt
+        if not self.save_changes(6):
+            return
+        curses.curs_set(0)
+
+        def show_progress(done: int, total: int) -> None:
+            self.__screen.addstr(6, 0, f"Re-encrypting records: {done} / {total}")
+            self.__screen.clrtoeol()
+            self.__screen.refresh()
+
+        # Bei einem Fehler (anderer Prozess, Datei, Token) bleibt das alte Passwort gültig
+        try:
+            self.__dataHandler.changeKey(new_password, show_progress)
+        except Exception as e:
+            message = f"Changing the password failed: {type(e).__name__} {str(e)}"
+            self.__screen.addstr(8, 0, message[:self.__screen.getmaxyx()[1] - 1])
+            self.__screen.addstr(9, 0, "The old password is still valid. Press any key to return to the main menu.")
+            self.__screen.refresh()
+            self.__screen.getch()
+            return
+        self.__screen.addstr(8, 0, "Master password changed! Press any key to return to the main menu.")
+        self.__screen.refresh()
+        self.__screen.getch()
+
     def delete_current_user(self) -> None:
         self.__screen.clear()
         self.__screen.addstr(0, 0, "Delete Current User")
@@ -801,7 +789,12 @@ class Frontend:
         choice = self.__screen.get_wch()
 
         if choice in ('y', 'Y'):
+            # Ein ausstehendes Speichern darf nicht nach dem Löschen laufen
+            if not self.save_changes(4):
+                return
             self.__dataHandler.remUser()
+            self.__dataHandler.getCryptor().lockAgent()
+            self.__dataHandler.getCryptor().clearRangeCache()
             self.__screen.addstr(4, 0, "User deleted! Press any key to exit.")
             self.__screen.getch()
             self.loginScreen()
@@ -809,9 +802,44 @@ class Frontend:
             self.__screen.addstr(4, 0, "Cancelled. Press any key to return to the main menu.")
             self.__screen.getch()
 
+    def save_changes(self, y: int) -> bool:
+        # Ausstehende Änderungen schreiben, ein Fehler des Speicherns im Hintergrund wird angezeigt.
+        # False: der Nutzer hat abgebrochen, die Änderungen sind noch nicht gespeichert
+        try:
+            self.__autosave.flush()
+            return True
+        except Exception as e:
+            error = e
+        while True:
+            self.__screen.move(y, 0)
+            self.__screen.clrtobot()
+            message = f"Saving failed: {type(error).__name__} {str(error)}"
+            self.__screen.addstr(y, 0, message[:self.__screen.getmaxyx()[1] - 1])
+            self.__screen.addstr(y + 1, 0, "Retry? (y/n, n returns to the main menu): ")
+            self.__screen.refresh()
+            if self.__screen.get_wch() not in ('y', 'Y'):
+                return False
+            # Die nicht gespeicherten Einträge sind weiterhin markiert
+            try:
+                self.__dataHandler.saveEntries()
+                return True
+            except Exception as e:
+                error = e
+
+    def close_session(self) -> bool:
+        # Ausstehende Änderungen werden vor dem Schließen geschrieben
+        self.__screen.clear()
+        if not self.save_changes(0):
+            return False
+        self.__dataHandler.closeSession()
+        # Nach dem Abmelden gibt auch der Unlock-Agent keine Schlüssel mehr heraus
+        self.__dataHandler.getCryptor().lockAgent()
+        return True
+
     def back_to_login(self) -> None:
         # Close the current session if open
-        self.__dataHandler.closeSession()
+        if not self.close_session():
+            return
         # Clear the screen and reinitialize the login process
         self.__screen.clear()
         self.__screen.refresh()
@@ -819,8 +847,34 @@ class Frontend:
 
 def main() -> None:
     cryptor = Cryptor()
+    # Ein laufender Unlock-Agent erspart die erneute Schlüsselableitung
+    if os.environ.get(SOCKET_ENV, ""):
+        cryptor.setAgent(AgentClient(os.environ[SOCKET_ENV]))
+    # Ohne Internet werden Passwörter gegen eine lokale Kopie der Datenbank geprüft
+    if os.environ.get("KWV_PWNED_DB", ""):
+        cryptor.setPwnedDatabase(PwnedDatabase(os.environ["KWV_PWNED_DB"]))
+    if os.environ.get("KWV_PWNED_API", ""):
+        cryptor.setPwnedApi(os.environ["KWV_PWNED_API"])
+    # Parameter der Schlüsselableitung, z.B. von "python3 keyDerivation.py --target 0.5"
+    if os.environ.get("KWV_KDF", ""):
+        cryptor.setKdfParams(os.environ["KWV_KDF"])
+    # Antworten der API werden nur auf Wunsch zwischengespeichert, z.B. mit
+    # KWV_RANGE_CACHE=~/.cache/kennwortverwalter/ranges.sqlite. Die Datei verrät die Hash-Präfixe
+    # der geprüften Passwörter und wird beim Löschen eines Nutzers geleert
+    if os.environ.get("KWV_RANGE_CACHE", ""):
+        cryptor.setRangeCache(RangeCache(os.path.expanduser(os.environ["KWV_RANGE_CACHE"])))
     
     dataHandler = DataHandler(cryptor)
+    # Im Journal-Modus werden Änderungen an die Datei angehängt statt sie neu zu schreiben
+    dataHandler.setJournalMode(os.environ.get("KWV_JOURNAL", "") == "1")
+    # Im Lazy-Modus werden nur die Titel beim Login entschlüsselt, die Einträge erst beim Öffnen
+    dataHandler.setLazyMode(os.environ.get("KWV_LAZY", "") == "1")
+    # Wann auf die Platte synchronisiert wird: always, close (Standard) oder never
+    if os.environ.get("KWV_FSYNC", ""):
+        dataHandler.setFsyncPolicy(os.environ["KWV_FSYNC"])
+    # Komprimierung der Einträge: none, zlib oder lzma (wird im Konto gespeichert)
+    if os.environ.get("KWV_COMPRESSION", ""):
+        dataHandler.setCompression(os.environ["KWV_COMPRESSION"])
     
     frontend = Frontend(dataHandler)
     
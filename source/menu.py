@@ -2,6 +2,7 @@
 
 import curses
 from curses import panel
+from listView import ListView
 
 class Menu:
     def __init__(self, items, screen):
@@ -11,15 +12,12 @@ class Menu:
         self.__panel.hide()
         panel.update_panels()
 
-        self.__position = 0
         self.__items = items
+        self.__view = ListView(self.__window, ["%d. %s" % (index, item[0]) for index, item in enumerate(items)],
+                               top=1, centered=False)
 
     def navigate(self, n: int) -> None:
-        self.__position += n
-        if self.__position < 0:
-            self.__position = 0
-        elif self.__position >= len(self.__items):
-            self.__position = len(self.__items) - 1
+        self.__view.move(n)
 
     def display(self) -> None:
         self.__panel.top()
@@ -27,30 +25,10 @@ class Menu:
         self.__window.clear()
 
         while True:
-            self.__window.refresh()
-            curses.doupdate()
-            for index, item in enumerate(self.__items):
-                if index == self.__position:
-                    mode = curses.A_REVERSE
-                else:
-                    mode = curses.A_NORMAL
-
-                msg = "%d. %s" % (index, item[0])
-                self.__window.addstr(1 + index, 1, msg, mode)
-
-            key = self.__window.getch()
-
-            if key in [curses.KEY_ENTER, ord("\n")]:
-                if self.__position == len(self.__items) - 1:
-                    break
-                else:
-                    self.__items[self.__position][1]()
-
-            elif key == curses.KEY_UP:
-                self.navigate(-1)
-
-            elif key == curses.KEY_DOWN:
-                self.navigate(1)
+            position = self.__view.select()
+            if position == len(self.__items) - 1:
+                break
+            self.__items[position][1]()
 
         self.__window.clear()
         self.__panel.hide()
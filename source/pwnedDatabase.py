@@ -0,0 +1,141 @@
+#!/bin/python3
+"""
+File: pwnedDatabase.py
+Desc: Implements an offline check of passwords against a local copy of the haveibeenpwned database.
+      The database is a sorted binary file of raw SHA-1 hashes (20 bytes each). It is memory mapped
+      and searched binary, so a check needs only a few page reads.
+      Build it from the text dump with: python3 pwnedDatabase.py <pwned-passwords-sha1.txt> <out.bin>
+"""
+
+import os
+import sys
+import mmap
+import heapq
+import hashlib
+import tempfile
+import itertools
+from typing import Iterator
+
+#Length of a raw SHA-1 hash in bytes
+HASH_SIZE = 20
+#Number of hashes sorted in memory at once while building a database
+CHUNK_SIZE = 1000000
+#Number of sorted chunks merged at once, every one is an open file (the full dump has hundreds of chunks)
+MERGE_FAN_IN = 64
+
+class PwnedDatabase:
+    """Class for searching SHA-1 hashes in a local sorted hash file"""
+
+    def __init__(self, path: str) -> None:
+        self.__path = path
+        self.__size = os.path.getsize(path) // HASH_SIZE
+        self.__file = open(path, "rb") #pylint: disable=consider-using-with
+        if self.__size > 0:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.__map = mmap.mmap(-1, 1)
+
+    def getPath(self) -> str:
+        return self.__path
+
+    def getSize(self) -> int:
+        return self.__size
+
+    def close(self) -> None:
+        self.__map.close()
+        self.__file.close()
+
+    def containsHash(self, sha1: str) -> bool:
+        """Checks if a hex SHA-1 hash is in the database"""
+        key = bytes.fromhex(sha1)
+        low = 0
+        high = self.__size
+        while low < high:
+            middle = (low + high) // 2
+            current = self.__map[middle * HASH_SIZE:(middle + 1) * HASH_SIZE]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                return True
+        return False
+
+    def containsPassword(self, password: str) -> bool:
+        return self.containsHash(hashlib.sha1(password.encode("utf-8")).hexdigest())
+
+    @staticmethod
+    def __readHashes(path: str) -> Iterator[bytes]:
+        """Reads the hashes of a text dump with lines like "<SHA-1>:<count>" or "<SHA-1>" """
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                sha1 = line.split(":", 1)[0].strip()
+                if len(sha1) == 2 * HASH_SIZE:
+                    yield bytes.fromhex(sha1)
+
+    @staticmethod
+    def __readChunk(path: str) -> Iterator[bytes]:
+        with open(path, "rb") as file:
+            while True:
+                sha1 = file.read(HASH_SIZE)
+                if len(sha1) < HASH_SIZE:
+                    break
+                yield sha1
+
+    @staticmethod
+    def __mergeChunks(chunks: list[str], outPath: str) -> int:
+        """Merges sorted chunks into one sorted file without duplicates. Returns the number of hashes"""
+        count = 0
+        previous = b""
+        with open(outPath, "wb") as file:
+            for sha1 in heapq.merge(*[PwnedDatabase.__readChunk(chunkPath) for chunkPath in chunks]):
+                if sha1 != previous:
+                    file.write(sha1)
+                    previous = sha1
+                    count += 1
+        return count
+
+    @staticmethod
+    def build(dumpPath: str, outPath: str) -> int:
+        """Builds a database from a text dump. Sorts in chunks, so the dump does not have to fit in memory.
+        The chunks are merged in passes of at most MERGE_FAN_IN files, so the open files stay bounded"""
+        directory = os.path.dirname(os.path.abspath(outPath))
+        chunks: list[str] = []
+
+        def newChunk() -> str:
+            descriptor, chunkPath = tempfile.mkstemp(prefix="pwned-", dir=directory)
+            os.close(descriptor)
+            chunks.append(chunkPath)
+            return chunkPath
+
+        try:
+            hashes = PwnedDatabase.__readHashes(dumpPath)
+            while True:
+                chunk = sorted(itertools.islice(hashes, CHUNK_SIZE))
+                if not chunk:
+                    break
+                with open(newChunk(), "wb") as file:
+                    file.write(b"".join(chunk))
+
+            while len(chunks) > MERGE_FAN_IN:
+                group = chunks[:MERGE_FAN_IN]
+                PwnedDatabase.__mergeChunks(group, newChunk())
+                for chunkPath in group:
+                    chunks.remove(chunkPath)
+                    os.remove(chunkPath)
+            count = PwnedDatabase.__mergeChunks(chunks, outPath)
+        finally:
+            for chunkPath in chunks:
+                os.remove(chunkPath)
+        return count
+
+def main() -> None:
+    """Builds the database from a dump of the command line"""
+    if len(sys.argv) != 3:
+        print("Usage: python3 pwnedDatabase.py <pwned-passwords-sha1.txt> <out.bin>")
+        sys.exit(1)
+    count = PwnedDatabase.build(sys.argv[1], sys.argv[2])
+    print(f"Wrote {count} hashes to {sys.argv[2]}")
+
+if __name__ == "__main__":
+    main()
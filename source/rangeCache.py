@@ -0,0 +1,108 @@
+#!/bin/python3
+"""
+File: rangeCache.py
+Desc: Implements a persistent cache for the range responses of the haveibeenpwned API. A response is
+      stored per 5 character prefix as the set of its hash suffixes. Entries expire after a time to
+      live and the least recently used ones are evicted when the cache grows over its size limit.
+      A hit only reads, the access times are written in batches (with the next put, after
+      TOUCH_BATCH hits or on close), so a check of many passwords is not bound by commits.
+      The cached prefixes are those of checked passwords, so the TUI only uses a cache if the user
+      sets KWV_RANGE_CACHE to its path, and clears it when a user is deleted.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional
+
+#Default time to live of a response in seconds (one week)
+DEFAULT_TTL = 7 * 24 * 3600.0
+#Default size limit of all stored responses in bytes
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+#Hits whose access times are kept in memory before they are written
+TOUCH_BATCH = 256
+
+class RangeCache:
+    """Class for caching range responses in a sqlite file"""
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, maxBytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.__ttl = ttl
+        self.__maxBytes = maxBytes
+        self.__lock = threading.Lock()
+        #prefix -> access time of a hit that is not written yet
+        self.__touched: dict[str, float] = {}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        #The cached prefixes tell something about the checked passwords -> only the owner may read them
+        oldUmask = os.umask(0o077)
+        try:
+            self.__connection = sqlite3.connect(path, check_same_thread=False)
+        finally:
+            os.umask(oldUmask)
+        with self.__lock, self.__connection:
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS ranges ("
+                                      "prefix TEXT PRIMARY KEY, fetched REAL, used REAL, size INTEGER, suffixes TEXT)")
+            self.__connection.execute("CREATE INDEX IF NOT EXISTS rangesUsed ON ranges (used)")
+
+    def __writeTouched(self) -> None:
+        """Writes the access times of the hits since the last write, the caller holds the lock and commits"""
+        if self.__touched:
+            self.__connection.executemany("UPDATE ranges SET used = ? WHERE prefix = ?",
+                                          [(used, prefix) for prefix, used in self.__touched.items()])
+            self.__touched = {}
+
+    def get(self, prefix: str) -> Optional[set[str]]:
+        """Returns the cached suffixes of a prefix or None if they are missing or expired"""
+        now = time.time()
+        with self.__lock:
+            row = self.__connection.execute("SELECT fetched, suffixes FROM ranges WHERE prefix = ?", (prefix,)).fetchone()
+            if row is None:
+                return None
+            if row[0] + self.__ttl <= now:
+                self.__touched.pop(prefix, None)
+                with self.__connection:
+                    self.__connection.execute("DELETE FROM ranges WHERE prefix = ?", (prefix,))
+                return None
+            self.__touched[prefix] = now
+            if len(self.__touched) >= TOUCH_BATCH:
+                with self.__connection:
+                    self.__writeTouched()
+        return set(row[1].split("\n")) if row[1] else set()
+
+    def put(self, prefix: str, suffixes: set[str]) -> None:
+        """Stores the suffixes of a prefix and evicts the least recently used prefixes if needed"""
+        now = time.time()
+        text = "\n".join(sorted(suffixes))
+        with self.__lock, self.__connection:
+            #The eviction needs the current access times
+            self.__touched.pop(prefix, None)
+            self.__writeTouched()
+            self.__connection.execute("INSERT OR REPLACE INTO ranges VALUES (?, ?, ?, ?, ?)", (prefix, now, now, len(text), text))
+            total = self.__connection.execute("SELECT COALESCE(SUM(size), 0) FROM ranges").fetchone()[0]
+            if total <= self.__maxBytes:
+                return
+            for oldPrefix, size in self.__connection.execute("SELECT prefix, size FROM ranges ORDER BY used").fetchall():
+                if total <= self.__maxBytes or oldPrefix == prefix:
+                    break
+                self.__connection.execute("DELETE FROM ranges WHERE prefix = ?", (oldPrefix,))
+                total -= size
+
+    def clear(self) -> None:
+        """Deletes all cached responses"""
+        with self.__lock, self.__connection:
+            self.__touched = {}
+            self.__connection.execute("DELETE FROM ranges")
+
+    def getSize(self) -> int:
+        """Returns the number of cached prefixes"""
+        with self.__lock:
+            count: int = self.__connection.execute("SELECT COUNT(*) FROM ranges").fetchone()[0]
+        return count
+
+    def close(self) -> None:
+        """Writes the pending access times and closes the file"""
+        with self.__lock:
+            with self.__connection:
+                self.__writeTouched()
+            self.__connection.close()
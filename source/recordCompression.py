@@ -0,0 +1,46 @@
+#!/bin/python3
+"""
+File: recordCompression.py
+Desc: Compresses the serialized records before they are encrypted. A compressed payload starts with
+      a tag byte of its method, a plain one is the JSON text itself (it starts with "{"), so records
+      of all methods and of older versions can be read without knowing the method of the vault.
+"""
+
+import zlib
+import lzma
+
+METHODS = ("none", "zlib", "lzma")
+#Method of new accounts (see benchmarks/benchCompression.py)
+DEFAULT_METHOD = "zlib"
+#Tag byte -> method, the tags can not start a JSON text
+TAGS = {b"\x01": "zlib", b"\x02": "lzma"}
+ZLIB_LEVEL = 6
+#Raw streams without headers and checksums: the records are small and Fernet authenticates them.
+#The dictionary of a preset (8 MiB) would be allocated for every record, a record fits into 64 KiB
+LZMA_FILTERS = [{"id": lzma.FILTER_LZMA2, "preset": 6, "dict_size": 2**16}]
+
+def checkMethod(method: str) -> None:
+    """Raises ValueError for an unknown method"""
+    if method not in METHODS:
+        raise ValueError(f"Unknown compression {method}")
+
+def compress(text: str, method: str) -> bytes:
+    """Returns the payload of a text. A text that does not get smaller is stored plain"""
+    checkMethod(method)
+    data = text.encode("utf-8")
+    if method == "zlib":
+        packed = b"\x01" + zlib.compress(data, ZLIB_LEVEL, wbits=-15)
+    elif method == "lzma":
+        packed = b"\x02" + lzma.compress(data, format=lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+    else:
+        return data
+    return packed if len(packed) < len(data) else data
+
+def decompress(payload: bytes) -> str:
+    """Returns the text of a payload of any method"""
+    method = TAGS.get(payload[:1])
+    if method == "zlib":
+        return zlib.decompress(payload[1:], wbits=-15).decode("utf-8")
+    if method == "lzma":
+        return lzma.decompress(payload[1:], format=lzma.FORMAT_RAW, filters=LZMA_FILTERS).decode("utf-8")
+    return payload.decode("utf-8")
@@ -6,13 +6,18 @@ from typing import List, Optional
 class SearchBar:
     __screen: curses.window
     __items: list[str]
-    __filtered_items: list[str]
+    __lowered_items: list[str]
+    __filtered_items: list[int]
+    __results: list[tuple[str, list[int]]]
     __query: str
 
     def __init__(self, screen: curses.window, items: List[str]):
         self.__screen: curses.window = screen
         self.__items: List[str] = items
-        self.__filtered_items: List[str] = items
+        self.__lowered_items: List[str] = [item.lower() for item in items]
+        self.__filtered_items: List[int] = list(range(len(items)))
+        # Stack of (query, matching indices), every query extends the one below it
+        self.__results: List[tuple[str, List[int]]] = [("", self.__filtered_items)]
         self.__query: str = ""
 
     def display(self) -> str:
@@ -47,18 +52,27 @@ class SearchBar:
         self.__screen.refresh()
 
     def filter_items(self) -> None:
-        self.__filtered_items = [item for item in self.__items if self.__query.lower() in item.lower()]
+        query = self.__query.lower()
+        # Backspace: drop the results of queries that are no longer a prefix
+        while not query.startswith(self.__results[-1][0]):
+            self.__results.pop()
+        last_query, last_result = self.__results[-1]
+        if last_query != query:
+            # Appended characters can only narrow the previous result
+            last_result = [idx for idx in last_result if query in self.__lowered_items[idx]]
+            self.__results.append((query, last_result))
+        self.__filtered_items = last_result
 
     def display_results(self) -> None:
         max_height, max_width = self.__screen.getmaxyx()
-        for idx, item in enumerate(self.__filtered_items[:max_height - 2]):
-            self.__screen.addstr(idx + 2, 0, item[:max_width - 1])
+        for row, idx in enumerate(self.__filtered_items[:max_height - 2]):
+            self.__screen.addstr(row + 2, 0, self.__items[idx][:max_width - 1])
         self.__screen.refresh()
 
     def handle_selection(self) -> str:
         selected_item: str = ""
         if self.__filtered_items:
-            selected_item = self.__filtered_items[0]
+            selected_item = self.__items[self.__filtered_items[0]]
             self.__screen.clear()
             self.__screen.addstr(0, 0, f"Selected: {selected_item}")
             self.__screen.refresh()
@@ -0,0 +1,77 @@
+#!/bin/python3
+"""
+File: searchIndex.py
+Desc: Implements an inverted index for the search of entries. Every trigram of the indexed texts
+      points to the entries containing it, so a keyword is answered by intersecting the entries of
+      its trigrams. Keywords shorter than a trigram are checked against all texts. Passwords are
+      never indexed.
+"""
+
+#Fields of an entry that can be found by the search
+INDEXED_FIELDS = ("name", "url", "notices", "timestamp")
+#Length of the indexed substrings
+GRAM_LENGTH = 3
+#Separates the texts of an entry, so a keyword can not match across two texts
+SEPARATOR = "\0"
+
+class SearchIndex:
+    """Class for searching entries by substrings of their category, title and fields"""
+
+    def __init__(self) -> None:
+        self.__postings: dict[str, set[str]] = {}
+        #docId -> (category, title, all texts joined by SEPARATOR)
+        self.__documents: dict[str, tuple[str, str, str]] = {}
+
+    @staticmethod
+    def __getGrams(texts: list[str]) -> set[str]:
+        return {text[start:start + GRAM_LENGTH] for text in texts for start in range(len(text) - GRAM_LENGTH + 1)}
+
+    def add(self, docId: str, category: str, title: str, entry: dict[str, str]) -> None:
+        """Indexes an entry or updates an already indexed entry"""
+        if docId in self.__documents:
+            self.remove(docId)
+        texts = [category, title] + [entry[field] for field in INDEXED_FIELDS if field in entry]
+        self.__documents[docId] = (category, title, SEPARATOR.join(texts))
+        postings = self.__postings
+        for gram in self.__getGrams(texts):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = set()
+            posting.add(docId)
+
+    def remove(self, docId: str) -> None:
+        """Drops an entry from the index, unknown entries are ignored"""
+        if docId not in self.__documents:
+            return
+        document = self.__documents.pop(docId)
+        for gram in self.__getGrams(document[2].split(SEPARATOR)):
+            posting = self.__postings[gram]
+            posting.discard(docId)
+            if not posting:
+                del self.__postings[gram]
+
+    def clear(self) -> None:
+        self.__postings = {}
+        self.__documents = {}
+
+    def search(self, keyWord: str) -> dict[str, list[str]]:
+        """Returns the titles of all entries containing the keyword sorted by category"""
+        if len(keyWord) < GRAM_LENGTH:
+            found = [docId for docId, document in self.__documents.items() if keyWord in document[2]]
+        else:
+            postings = []
+            for start in range(len(keyWord) - GRAM_LENGTH + 1):
+                postings.append(self.__postings.get(keyWord[start:start + GRAM_LENGTH], set()))
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates &= posting
+            #The trigrams can be spread over the texts -> check the candidates
+            found = [docId for docId in candidates if keyWord in self.__documents[docId][2]]
+
+        result: dict[str, list[str]] = {}
+        for category, title in sorted(self.__documents[docId][:2] for docId in found):
+            result.setdefault(category, []).append(title)
+        return result
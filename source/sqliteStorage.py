@@ -0,0 +1,193 @@
+#!/bin/python3
+"""
+File: sqliteStorage.py
+Desc: Implements the storage of the encrypted records in a SQLite database. Every record is a row of
+      its own (the raw bytes of its Fernet token), so a save writes only the changed and removed rows
+      in one transaction instead of rewriting the file. SQLite locks the file itself, the version of
+      an account is checked in the same transaction as the save.
+"""
+
+import os
+import base64
+import sqlite3
+import tempfile
+import threading
+import contextlib
+from typing import Iterable, Iterator, Optional
+import vaultFile
+import objectAlreadyExistsException
+import versionConflictException
+
+SCHEMA = [
+    "CREATE TABLE accounts (name TEXT PRIMARY KEY, key TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0)",
+    "CREATE TABLE records (account TEXT NOT NULL, id TEXT NOT NULL, token BLOB NOT NULL, PRIMARY KEY (account, id)) WITHOUT ROWID"
+]
+#fsync policy -> synchronous mode of SQLite (in WAL mode NORMAL syncs on checkpoints only)
+SYNCHRONOUS = {"always": "FULL", "close": "NORMAL", "never": "OFF"}
+#Seconds to wait for the lock of another process
+BUSY_TIMEOUT = 30.0
+
+class SqliteStorage:
+    """Class for storing records in a SQLite database"""
+
+    def __init__(self, path: str) -> None:
+        self.__path = path
+        self.__fsyncPolicy = vaultFile.DEFAULT_FSYNC
+        #Transactions are started by hand, the autosave uses the connection from its worker thread
+        self.__connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self.__lock = threading.Lock()
+        self.setFsyncPolicy(self.__fsyncPolicy)
+
+    def __del__(self) -> None:
+        self.__connection.close()
+
+    @contextlib.contextmanager
+    def __transaction(self, mode: str = "DEFERRED") -> Iterator[sqlite3.Connection]:
+        """IMMEDIATE takes the write lock at the start, so the version can not change until the commit"""
+        with self.__lock:
+            self.__connection.execute(f"BEGIN {mode}")
+            try:
+                yield self.__connection
+            except BaseException:
+                self.__connection.execute("ROLLBACK")
+                raise
+            self.__connection.execute("COMMIT")
+
+    @staticmethod
+    def __encodeTokens(user: str, records: Iterable[tuple[str, str]]) -> Iterator[tuple[str, str, bytes]]:
+        for recordId, token in records:
+            yield (user, recordId, base64.urlsafe_b64decode(token))
+
+    @staticmethod
+    def createFile(path: str, user: str, key: str, records: dict[str, str], fsyncPolicy: str = vaultFile.DEFAULT_FSYNC) -> None:
+        """Creates a new file with one account"""
+        SqliteStorage.createFileWithAccounts(path, [(user, key, records)], fsyncPolicy)
+
+    @staticmethod
+    def createFileWithAccounts(path: str, accounts: Iterable[tuple[str, str, dict[str, str]]],
+                               fsyncPolicy: str = vaultFile.DEFAULT_FSYNC) -> None:
+        """Creates a new file with the accounts (name, stored key, records) in one transaction, the
+        database is built next to the file and replaces it"""
+        descriptor, tempPath = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp",
+                                                dir=os.path.dirname(os.path.abspath(path)))
+        os.close(descriptor)
+        try:
+            connection = sqlite3.connect(tempPath, isolation_level=None)
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("BEGIN")
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                for user, key, records in accounts:
+                    connection.execute("INSERT INTO accounts (name, key) VALUES (?, ?)", (user, key))
+                    connection.executemany("INSERT INTO records (account, id, token) VALUES (?, ?, ?)",
+                                           SqliteStorage.__encodeTokens(user, records.items()))
+                connection.execute("COMMIT")
+            finally:
+                connection.close()
+            #The log of a former database must not be applied to the new one
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            os.replace(tempPath, path)
+        except BaseException:
+            os.remove(tempPath)
+            raise
+        if fsyncPolicy != "never":
+            vaultFile.syncFile(path)
+
+    def getPath(self) -> str:
+        return self.__path
+
+    def setJournalMode(self, enabled: bool) -> None:
+        """Every save writes single rows anyway, SQLite keeps its own log (WAL)"""
+
+    def setFsyncPolicy(self, policy: str) -> None:
+        """Chooses when SQLite syncs its log to the disk"""
+        self.__fsyncPolicy = vaultFile.checkFsyncPolicy(policy)
+        with self.__lock:
+            self.__connection.execute(f"PRAGMA synchronous={SYNCHRONOUS[policy]}")
+
+    def sync(self) -> None:
+        """Forces the file to the disk, called when a session is closed"""
+        if self.__fsyncPolicy == "close":
+            with self.__lock:
+                self.__connection.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def getUsers(self) -> list[str]:
+        with self.__lock:
+            return [row[0] for row in self.__connection.execute("SELECT name FROM accounts ORDER BY rowid")]
+
+    def getKey(self, user: str) -> str:
+        with self.__lock:
+            row = self.__connection.execute("SELECT key FROM accounts WHERE name = ?", (user,)).fetchone()
+        return row[0] if row is not None else ""
+
+    def setKey(self, user: str, key: str) -> None:
+        """Replaces the stored key of an account, its records stay as they are"""
+        with self.__transaction("IMMEDIATE") as connection:
+            connection.execute("UPDATE accounts SET key = ? WHERE name = ?", (key, user))
+
+    def getVersion(self, user: str) -> int:
+        """Returns the version of an account, it is raised by every save"""
+        with self.__lock:
+            row = self.__connection.execute("SELECT version FROM accounts WHERE name = ?", (user,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def addUser(self, user: str, key: str, records: dict[str, str]) -> None:
+        """Adds an account with its stored key and records"""
+        try:
+            with self.__transaction("IMMEDIATE") as connection:
+                connection.execute("INSERT INTO accounts (name, key) VALUES (?, ?)", (user, key))
+                connection.executemany("INSERT INTO records (account, id, token) VALUES (?, ?, ?)", self.__encodeTokens(user, records.items()))
+        except sqlite3.IntegrityError as error:
+            raise objectAlreadyExistsException.ObjectAlreadyExistsException from error
+
+    def remUser(self, user: str) -> None:
+        with self.__transaction("IMMEDIATE") as connection:
+            connection.execute("DELETE FROM records WHERE account = ?", (user,))
+            connection.execute("DELETE FROM accounts WHERE name = ?", (user,))
+
+    def loadRecords(self, user: str) -> tuple[dict[str, str], int]:
+        """Returns the records of an user and their version (read in one transaction)"""
+        with self.__transaction() as connection:
+            row = connection.execute("SELECT version FROM accounts WHERE name = ?", (user,)).fetchone()
+            records = {recordId: base64.urlsafe_b64encode(token).decode("ascii")
+                       for recordId, token in connection.execute("SELECT id, token FROM records WHERE account = ?", (user,))}
+        return (records, row[0] if row is not None else 0)
+
+    def saveRecords(self, user: str, changed: dict[str, str], removed: set[str], version: Optional[int] = None) -> int:
+        """Stores the changed records and deletes the removed records of an user. If a version is given
+        and the account has another one (someone else saved it in between) nothing is stored and a
+        VersionConflictException is raised. Returns the new version"""
+        with self.__transaction("IMMEDIATE") as connection:
+            row = connection.execute("SELECT version FROM accounts WHERE name = ?", (user,)).fetchone()
+            current: int = row[0] if row is not None else 0
+            vaultFile.checkVersion(current, version)
+            if row is None or (not changed and not removed):
+                return current
+            connection.executemany("INSERT OR REPLACE INTO records (account, id, token) VALUES (?, ?, ?)", self.__encodeTokens(user, changed.items()))
+            connection.executemany("DELETE FROM records WHERE account = ? AND id = ?", ((user, recordId) for recordId in removed))
+            connection.execute("UPDATE accounts SET version = ? WHERE name = ?", (current + 1, user))
+        return current + 1
+
+    def replaceAccount(self, user: str, key: str, records: Iterable[tuple[str, str]], version: int) -> int:
+        """Replaces the key and all records of an account at once (after a re-encryption), the records
+        are inserted while they are produced. Raises a VersionConflictException if the account has another
+        version. Returns the new version"""
+        with self.__transaction("IMMEDIATE") as connection:
+            row = connection.execute("SELECT version FROM accounts WHERE name = ?", (user,)).fetchone()
+            if row is None or row[0] != version:
+                raise versionConflictException.VersionConflictException
+            connection.execute("DELETE FROM records WHERE account = ?", (user,))
+            connection.executemany("INSERT INTO records (account, id, token) VALUES (?, ?, ?)", self.__encodeTokens(user, records))
+            connection.execute("UPDATE accounts SET key = ?, version = ? WHERE name = ?", (key, version + 1, user))
+        return version + 1
+
+    def needsCompaction(self) -> bool:
+        return False
+
+    def compact(self) -> None:
+        """Gives the space of deleted rows back to the file system"""
+        with self.__lock:
+            self.__connection.execute("VACUUM")
@@ -0,0 +1,184 @@
+#!/bin/python3
+"""
+File: unlockAgent.py
+Desc: Implements a local agent (like the ssh-agent) that holds derived master keys for a limited
+      time. The keys are handed out over a unix socket, so repeated sessions skip the key derivation.
+      A key is only handed out with the proof of the password it was added with, after MAX_FAILURES
+      wrong proofs it is forgotten, so the socket can not be used to probe passwords. The default socket
+      lies in a new private directory and clients only talk to an agent of their own user.
+      Start it with: python3 unlockAgent.py [--socket PATH] [--ttl SECONDS]
+"""
+
+import os
+import sys
+import hmac
+import stat
+import json
+import time
+import socket
+import struct
+import argparse
+import tempfile
+import threading
+import socketserver
+from typing import Optional
+
+#Default lifetime of a key in the agent in seconds
+DEFAULT_TTL = 900.0
+#Environment variable with the socket path of a running agent
+SOCKET_ENV = "KWV_AGENT_SOCK"
+#Wrong proofs after which a key is forgotten
+MAX_FAILURES = 3
+
+class UnlockAgent:
+    """Class for holding derived keys and serving them over a unix socket"""
+
+    def __init__(self, socketPath: str, ttl: float) -> None:
+        self.__socketPath = socketPath
+        self.__ttl = ttl
+        #id -> key, proof, expiry time and number of wrong proofs
+        self.__keys: dict[str, tuple[str, str, float, int]] = {}
+        self.__lock = threading.Lock()
+        agent = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            """Answers one request per connection"""
+            def handle(self) -> None:
+                try:
+                    request = json.loads(self.rfile.readline())
+                    response = agent.handleRequest(request)
+                except (ValueError, KeyError, TypeError):
+                    response = {"error": "invalid request"}
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+        if os.path.exists(socketPath):
+            os.remove(socketPath)
+        #Only the owner may talk to the agent
+        oldUmask = os.umask(0o177)
+        try:
+            self.__server = socketserver.ThreadingUnixStreamServer(socketPath, Handler)
+        finally:
+            os.umask(oldUmask)
+        self.__server.daemon_threads = True
+
+    def handleRequest(self, request: dict[str, str]) -> dict[str, Optional[str]]:
+        """Processes a request of a client: get, add, remove or lock"""
+        now = time.monotonic()
+        with self.__lock:
+            for keyId in [keyId for keyId, (_, _, expires, _) in self.__keys.items() if expires <= now]:
+                del self.__keys[keyId]
+            operation = request["op"]
+            if operation == "get":
+                if request["id"] not in self.__keys:
+                    return {"key": None}
+                key, proof, expires, failures = self.__keys[request["id"]]
+                if hmac.compare_digest(proof, request["proof"]):
+                    return {"key": key}
+                if failures + 1 >= MAX_FAILURES:
+                    del self.__keys[request["id"]]
+                else:
+                    self.__keys[request["id"]] = (key, proof, expires, failures + 1)
+                return {"key": None}
+            if operation == "add":
+                #Adding a key again must not reset the wrong proofs
+                failures = self.__keys[request["id"]][3] if request["id"] in self.__keys else 0
+                self.__keys[request["id"]] = (request["key"], request["proof"], now + self.__ttl, failures)
+                return {"key": None}
+            if operation == "remove":
+                self.__keys.pop(request["id"], None)
+                return {"key": None}
+            if operation == "lock":
+                self.__keys = {}
+                return {"key": None}
+        return {"error": "unknown operation"}
+
+    def serveForever(self) -> None:
+        self.__server.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stops serving, forgets all keys and removes the socket"""
+        self.__server.shutdown()
+        self.__server.server_close()
+        with self.__lock:
+            self.__keys = {}
+        if os.path.exists(self.__socketPath):
+            os.remove(self.__socketPath)
+
+class AgentClient:
+    """Class for talking to a running unlock agent"""
+
+    def __init__(self, socketPath: str, timeout: float = 1.0) -> None:
+        self.__socketPath = socketPath
+        self.__timeout = timeout
+
+    def __isTrusted(self, connection: socket.socket) -> bool:
+        """Checks that the agent runs as the own user. Anyone can bind a free path in a shared directory,
+        such an agent would get the keys and could hand out wrong ones"""
+        uid = os.getuid()
+        if hasattr(socket, "SO_PEERCRED"):
+            credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+            return bool(struct.unpack("3i", credentials)[1] == uid)
+        #No peer credentials (e.g. macOS) -> the socket and its directory must belong to the user
+        status = os.lstat(self.__socketPath)
+        directory = os.stat(os.path.dirname(os.path.abspath(self.__socketPath)))
+        return stat.S_ISSOCK(status.st_mode) and status.st_uid == uid and directory.st_uid == uid
+
+    def __request(self, request: dict[str, str]) -> Optional[str]:
+        """Sends a request to the agent. A not reachable or foreign agent is treated like an empty agent"""
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.settimeout(self.__timeout)
+                connection.connect(self.__socketPath)
+                if not self.__isTrusted(connection):
+                    return None
+                connection.sendall(json.dumps(request).encode("utf-8") + b"\n")
+                with connection.makefile("rb") as file:
+                    response = json.loads(file.readline())
+        except (OSError, ValueError):
+            return None
+        key = response.get("key")
+        return str(key) if key is not None else None
+
+    def getKey(self, keyId: str, proof: str) -> Optional[str]:
+        """Returns the key of an id if the proof is the one it was added with"""
+        return self.__request({"op": "get", "id": keyId, "proof": proof})
+
+    def addKey(self, keyId: str, key: str, proof: str) -> None:
+        self.__request({"op": "add", "id": keyId, "key": key, "proof": proof})
+
+    def removeKey(self, keyId: str) -> None:
+        self.__request({"op": "remove", "id": keyId})
+
+    def lock(self) -> None:
+        """Lets the agent forget all keys"""
+        self.__request({"op": "lock"})
+
+def newSocketDirectory() -> str:
+    """Creates a private directory (mode 0700) for the socket, in $XDG_RUNTIME_DIR if it is set"""
+    return tempfile.mkdtemp(prefix="kwv-agent-", dir=os.environ.get("XDG_RUNTIME_DIR") or None)
+
+def main() -> None:
+    """Runs the agent on the socket of the command line until it is stopped"""
+    parser = argparse.ArgumentParser(description="Holds derived master keys of KennwortVerwalter")
+    parser.add_argument("--socket", help="path of the socket (default: in a new private directory)")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL, help="lifetime of a key in seconds")
+    args = parser.parse_args()
+
+    directory = None
+    if args.socket is None:
+        directory = newSocketDirectory()
+        args.socket = os.path.join(directory, "agent.sock")
+    agent = UnlockAgent(args.socket, args.ttl)
+    print(f"{SOCKET_ENV}={args.socket}; export {SOCKET_ENV};")
+    sys.stdout.flush()
+    try:
+        agent.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent.shutdown()
+        if directory is not None:
+            os.rmdir(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/bin/python3
+"""
+File: vaultAdmin.py
+Desc: Runs an operation on many accounts of one vault at once: re-encrypt, audit or export them.
+      Every account is handled in an own process of a pool, so the key derivations and the en- and
+      decryption of the accounts run on all cores. Writes to the vault still happen one after the
+      other (every write holds the lock of the vault). Run it while nobody uses the accounts.
+      Run it with: python3 vaultAdmin.py <vault> reencrypt|audit|export --user USER [--user USER2]
+                   [--workers 4] [--out DIR] [--format jsonl]
+"""
+
+import os
+import sys
+import getpass
+import argparse
+import concurrent.futures
+from typing import Callable, Optional, TypeVar
+import cryptor
+import dataHandler
+import exporter
+import keyDerivation
+import pwnedDatabase
+
+OPERATIONS = ("reencrypt", "audit", "export")
+
+Result = TypeVar("Result")
+
+def openAccount(path: str, user: str, key: str) -> dataHandler.DataHandler:
+    """Returns a DataHandler with the key of the user set. Raises ValueError for a wrong password"""
+    handler = dataHandler.DataHandler(cryptor.Cryptor())
+    handler.openFile(path)
+    if user not in handler.getUsers():
+        raise ValueError(f"Unknown user {user}")
+    if not handler.getCryptor().isCorrectKey(key, handler.getKey(user)):
+        raise ValueError(f"Wrong password for {user}")
+    return handler
+
+def reencryptAccount(path: str, user: str, key: str, kdfParams: str) -> int:
+    """Encrypts the records of one account with a new master key. Returns the number of records"""
+    handler = openAccount(path, user, key)
+    handler.getCryptor().setKdfParams(kdfParams)
+    return handler.changeKey(key)
+
+def auditAccount(path: str, user: str, key: str, pwnedPath: Optional[str]) -> dict[str, list[tuple[str, str]]]:
+    """Checks the passwords of one account (see DataHandler.auditEntries)"""
+    handler = openAccount(path, user, key)
+    database = pwnedDatabase.PwnedDatabase(pwnedPath) if pwnedPath is not None else None
+    handler.getCryptor().setPwnedDatabase(database)
+    handler.startSession()
+    report = handler.auditEntries()
+    handler.closeSession()
+    if database is not None:
+        database.close()
+    return report
+
+def exportPath(directory: str, user: str, fileFormat: str) -> str:
+    """Returns <directory>/<user>.<fileFormat>. Raises ValueError for a name that is no plain file name,
+    so no export is written outside of the directory"""
+    if user in ("", ".", "..") or os.path.basename(user) != user or (os.altsep is not None and os.altsep in user):
+        raise ValueError(f"Account name {user!r} can not be used as a file name")
+    return os.path.join(directory, f"{user}.{fileFormat}")
+
+def exportAccount(path: str, user: str, key: str, directory: str, fileFormat: str, backupPassword: Optional[str]) -> int:
+    """Exports the entries of one account to an own file in the directory. Returns their number"""
+    out = exportPath(directory, user, fileFormat)
+    handler = openAccount(path, user, key)
+    handler.startSession()
+    accountExporter = exporter.Exporter(out, fileFormat, backupPassword)
+    try:
+        with accountExporter:
+            count = accountExporter.writeSession(handler, user)
+    except BaseException:
+        os.remove(out)
+        raise
+    handler.closeSession()
+    return count
+
+def describeError(user: str, error: Exception) -> str:
+    """Returns the message of a failed account, a ValueError of this module already names it"""
+    if isinstance(error, ValueError):
+        return str(error)
+    return f"{user}: {type(error).__name__} {error}".rstrip()
+
+def runAccounts(function: Callable[..., Result], jobs: dict[str, tuple[object, ...]], workers: Optional[int] = None) -> dict[str, Result]:
+    """Calls the function with the arguments of every user, in a pool of processes (one worker: in this
+    process). All jobs are run, the failed accounts (e.g. a wrong password or a broken record) are
+    reported by one ValueError at the end. Returns the results by user"""
+    results: dict[str, Result] = {}
+    errors: dict[str, str] = {}
+    if workers == 1 or len(jobs) < 2:
+        for user, args in jobs.items():
+            try:
+                results[user] = function(*args)
+            except Exception as error: #pylint: disable=broad-exception-caught
+                errors[user] = describeError(user, error)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(jobs))) as executor:
+            futures = {executor.submit(function, *args): user for user, args in jobs.items()}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as error: #pylint: disable=broad-exception-caught
+                    errors[futures[future]] = describeError(futures[future], error)
+    if errors:
+        raise ValueError("Failed: " + ", ".join(errors[user] for user in sorted(errors)))
+    return results
+
+def reencryptAccounts(path: str, keys: dict[str, str], workers: Optional[int] = None,
+                      kdfParams: str = keyDerivation.DEFAULT_PARAMS) -> dict[str, int]:
+    """Encrypts the records of the given users (user -> master password) with new master keys, wrapped
+    with the given key derivation parameters. Returns the number of records by user"""
+    return runAccounts(reencryptAccount, {user: (path, user, key, kdfParams) for user, key in keys.items()}, workers)
+
+def auditAccounts(path: str, keys: dict[str, str], workers: Optional[int] = None,
+                  pwnedPath: Optional[str] = None) -> dict[str, dict[str, list[tuple[str, str]]]]:
+    """Checks the passwords of the given users, against a local database if pwnedPath is given.
+    Returns the report of every user"""
+    return runAccounts(auditAccount, {user: (path, user, key, pwnedPath) for user, key in keys.items()}, workers)
+
+def exportAccounts(path: str, keys: dict[str, str], directory: str, fileFormat: str = "jsonl",
+                   backupPassword: Optional[str] = None, workers: Optional[int] = None) -> dict[str, int]:
+    """Exports the entries of every given user to <directory>/<user>.<fileFormat>. Returns their number by user"""
+    jobs: dict[str, tuple[object, ...]] = {user: (path, user, key, directory, fileFormat, backupPassword) for user, key in keys.items()}
+    return runAccounts(exportAccount, jobs, workers)
+
+def main() -> None:
+    """Runs an operation on the users of the command line"""
+    parser = argparse.ArgumentParser(description="Re-encrypts, audits or exports many accounts of a vault in parallel")
+    parser.add_argument("vault")
+    parser.add_argument("operation", choices=OPERATIONS)
+    parser.add_argument("--user", action="append", required=True, help="user to handle, can be given more than once")
+    parser.add_argument("--workers", type=int, help="number of processes (default: one per core)")
+    parser.add_argument("--kdf", default=keyDerivation.DEFAULT_PARAMS, help="key derivation parameters of a re-encryption")
+    parser.add_argument("--pwned-db", help="local haveibeenpwned database of an audit")
+    parser.add_argument("--out", default=".", help="directory of the exported files")
+    parser.add_argument("--format", choices=exporter.FORMATS, default="jsonl")
+    args = parser.parse_args()
+
+    keys = {user: getpass.getpass(f"Password for {user}: ") for user in args.user}
+    try:
+        if args.operation == "reencrypt":
+            for user, count in sorted(reencryptAccounts(args.vault, keys, args.workers, args.kdf).items()):
+                print(f"{user}: {count} records re-encrypted")
+        elif args.operation == "audit":
+            for user, report in sorted(auditAccounts(args.vault, keys, args.workers, args.pwned_db).items()):
+                print(f"{user}: " + ", ".join(f"{len(entries)} {kind}" for kind, entries in report.items()))
+                for kind, entries in report.items():
+                    for category, title in entries:
+                        print(f"  {kind}: {category} / {title}")
+        else:
+            backupPassword = getpass.getpass("Password for the backups: ") if args.format == "kwvb" else None
+            for user, count in sorted(exportAccounts(args.vault, keys, args.out, args.format, backupPassword, args.workers).items()):
+                print(f"{user}: {count} entries exported")
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/bin/python3
+"""
+File: vaultConverter.py
+Desc: Converts a vault between the csv, the binary and the SQLite format. The records are copied as
+      they are, nothing is decrypted, so no master password is needed. Convert a vault while nobody
+      uses it.
+      Run it with: python3 vaultConverter.py <vault> <out> --format csv|binary|sqlite
+"""
+
+import os
+import sys
+import argparse
+import dataHandler
+import vaultFile
+
+def convertVault(source: str, target: str, fileFormat: str, fsyncPolicy: str = vaultFile.DEFAULT_FSYNC) -> int:
+    """Writes all accounts of a vault to a new file of the given format. Returns the number of accounts"""
+    if fileFormat not in dataHandler.STORAGES:
+        raise ValueError(f"Unknown file format {fileFormat}")
+    if os.path.exists(target):
+        raise ValueError(f"{target} already exists")
+    storage = dataHandler.openStorage(source)
+    users = storage.getUsers()
+    if not users:
+        raise ValueError(f"{source} has no accounts")
+    #One write for all accounts, adding them one by one rewrites the binary file every time
+    accounts = ((user, storage.getKey(user), storage.loadRecords(user)[0]) for user in users)
+    dataHandler.STORAGES[fileFormat].createFileWithAccounts(target, accounts, fsyncPolicy)
+    return len(users)
+
+def main() -> None:
+    """Converts the vault of the command line"""
+    parser = argparse.ArgumentParser(description="Converts a vault to another file format")
+    parser.add_argument("vault")
+    parser.add_argument("out", help="the converted vault (must not exist)")
+    parser.add_argument("--format", choices=list(dataHandler.STORAGES), required=True)
+    args = parser.parse_args()
+
+    try:
+        count = convertVault(args.vault, args.out, args.format)
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
+    print(f"Converted {count} accounts from {os.path.getsize(args.vault)} to {os.path.getsize(args.out)} bytes")
+
+if __name__ == "__main__":
+    main()
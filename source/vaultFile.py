@@ -0,0 +1,132 @@
+#!/bin/python3
+"""
+File: vaultFile.py
+Desc: Implements the file handling shared by the storage backends: the advisory lock file next to a
+      vault, the atomic replace of a file, the detection of the format by the file signature and the
+      checks shared by the file backends. Storage describes the interface every backend implements.
+"""
+
+import os
+import tempfile
+import contextlib
+from typing import Container, Iterable, Iterator, Mapping, Optional, Protocol
+import objectAlreadyExistsException
+import versionConflictException
+
+try:
+    import fcntl
+except ImportError:
+    #No advisory locks on this system (e.g. Windows)
+    fcntl = None #type: ignore
+
+#always: every write is synced, close: the file is synced when the session is closed, never: left to the OS
+FSYNC_POLICIES = ("always", "close", "never")
+DEFAULT_FSYNC = "close"
+
+#First bytes of a file -> format, a file without a known signature is a csv file
+SIGNATURES = {b"KWVB": "binary", b"SQLite format 3\x00": "sqlite"}
+SIGNATURE_SIZE = max(len(signature) for signature in SIGNATURES)
+
+class Storage(Protocol):
+    """Interface of the storage backends, the records are Fernet tokens by record id"""
+
+    def getPath(self) -> str: ...
+    def setJournalMode(self, enabled: bool) -> None: ...
+    def setFsyncPolicy(self, policy: str) -> None: ...
+    def sync(self) -> None: ...
+    def getUsers(self) -> list[str]: ...
+    def getKey(self, user: str) -> str: ...
+    def setKey(self, user: str, key: str) -> None: ...
+    def getVersion(self, user: str) -> int: ...
+    def addUser(self, user: str, key: str, records: dict[str, str]) -> None: ...
+    def remUser(self, user: str) -> None: ...
+    def loadRecords(self, user: str) -> tuple[dict[str, str], int]: ...
+    def saveRecords(self, user: str, changed: dict[str, str], removed: set[str], version: Optional[int] = None) -> int: ...
+    def replaceAccount(self, user: str, key: str, records: Iterable[tuple[str, str]], version: int) -> int: ...
+    def needsCompaction(self) -> bool: ...
+    def compact(self) -> None: ...
+
+def detectFormat(path: str) -> str:
+    """Returns the file format of a vault by its signature, files without one are csv"""
+    with open(path, "rb") as file:
+        start = file.read(SIGNATURE_SIZE)
+    for signature, fileFormat in SIGNATURES.items():
+        if start.startswith(signature):
+            return fileFormat
+    return "csv"
+
+def checkFsyncPolicy(policy: str) -> str:
+    """Returns the policy if it is one of FSYNC_POLICIES, raises ValueError otherwise"""
+    if policy not in FSYNC_POLICIES:
+        raise ValueError(f"Unknown fsync policy {policy}")
+    return policy
+
+def checkNewUser(users: Container[str], user: str) -> None:
+    """Raises ObjectAlreadyExistsException if the account is already stored"""
+    if user in users:
+        raise objectAlreadyExistsException.ObjectAlreadyExistsException
+
+def checkVersion(current: int, version: Optional[int]) -> None:
+    """Raises VersionConflictException if a save is based on another version than the stored one"""
+    if version is not None and version != current:
+        raise versionConflictException.VersionConflictException
+
+def getStoredKey(accounts: Mapping[str, tuple[object, ...]], user: str) -> str:
+    """Returns the stored key of an account from an index with the key first, "" for an unknown account"""
+    if user not in accounts:
+        return ""
+    return str(accounts[user][0])
+
+def getStamp(path: str) -> tuple[int, int, int]:
+    """Returns (inode, mtime, size) of a file, the index of a backend is built again if it changed"""
+    status = os.stat(path)
+    return (status.st_ino, status.st_mtime_ns, status.st_size)
+
+@contextlib.contextmanager
+def locked(path: str, exclusive: bool) -> Iterator[None]:
+    """Holds the lock file of a vault. Must not be nested, a second lock of the same process blocks"""
+    if fcntl is None:
+        yield
+        return
+    descriptor = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(descriptor, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(descriptor)
+
+def syncDirectory(path: str) -> None:
+    """Makes the rename of a file durable"""
+    try:
+        descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        #Directories can not be opened on every system
+        return
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+def syncFile(path: str) -> None:
+    with open(path, "rb") as file:
+        os.fsync(file.fileno())
+    syncDirectory(path)
+
+def replaceFile(path: str, chunks: Iterable[bytes], sync: bool) -> None:
+    """Writes the chunks to a temporary file next to the file and replaces the file with it"""
+    descriptor, tempPath = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp",
+                                            dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.writelines(chunks)
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+        if os.path.exists(path):
+            os.chmod(tempPath, os.stat(path).st_mode & 0o777)
+        os.replace(tempPath, path)
+    except BaseException:
+        os.remove(tempPath)
+        raise
+    if sync:
+        syncDirectory(path)
@@ -0,0 +1,9 @@
+#!/bin/python3
+"""
+File: versionConflictException.py
+Desc: Exception for saves that are based on an outdated version of an account
+"""
+
+
+class VersionConflictException(Exception):
+    """This exception is raised when the records of an account were saved by someone else since they were loaded"""
@@ -0,0 +1,74 @@
+#pylint: disable=C
+import unittest
+import os
+import time
+import cryptor
+import dataHandler
+import autoSaver
+
+class TestAutoSaver(unittest.TestCase):
+
+	def setUp(self):
+		self.calls = []
+		self.saver = autoSaver.AutoSaver(lambda: self.calls.append(time.monotonic()), delay=0.1)
+
+	def tearDown(self):
+		self.saver.stop()
+
+	def test_debounce(self):
+		for _ in range(5):
+			self.saver.schedule()
+			time.sleep(0.02)
+		self.assertEqual([], self.calls)
+		time.sleep(0.3)
+		self.assertEqual(1, len(self.calls))
+		self.assertFalse(self.saver.isPending())
+
+	def test_flush(self):
+		self.saver.schedule()
+		self.saver.flush()
+		self.assertEqual(1, len(self.calls))
+		time.sleep(0.2)
+		self.assertEqual(1, len(self.calls))
+		self.saver.flush()
+		self.assertEqual(1, len(self.calls))
+
+	def test_error(self):
+		def fail():
+			raise OSError("disk full")
+		self.saver.stop()
+		self.saver = autoSaver.AutoSaver(fail, delay=0.01)
+		self.saver.schedule()
+		time.sleep(0.1)
+		with self.assertRaises(OSError):
+			self.saver.flush()
+		self.saver.flush()
+
+	def test_saveWhileChanging(self):
+		FILE = "tests/test_autoSaver_file.csv"
+		handler = dataHandler.DataHandler(cryptor.Cryptor())
+		handler.createFile(FILE, "user", handler.getCryptor().hashKey("key", True))
+		try:
+			handler.openFile(FILE)
+			handler.getKey("user")
+			handler.startSession()
+			handler.addCategory("category")
+			self.saver.stop()
+			self.saver = autoSaver.AutoSaver(handler.saveEntries, delay=0)
+			for number in range(300):
+				handler.addEntry("category", str(number), "name", "password", "url", "notices", "timestamp")
+				self.saver.schedule()
+			self.saver.flush()
+			handler.closeSession()
+
+			handler.openFile(FILE)
+			handler.getKey("user")
+			handler.startSession()
+			self.assertEqual([str(number) for number in range(300)], handler.getEntries("category"))
+			handler.closeSession()
+		finally:
+			os.remove(FILE)
+			os.remove(FILE + ".lock")
+
+if __name__ == "__main__":
+	unittest.main()
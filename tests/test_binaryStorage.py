@@ -0,0 +1,113 @@
+#pylint: disable=C
+import unittest
+import os
+from unittest import mock
+import cryptor
+import dataHandler
+import binaryStorage
+import vaultConverter
+import vaultFile
+
+class TestBinaryStorage(unittest.TestCase):
+
+	FILE = "tests/test_binaryStorage_file.kwv"
+	CONVERTED = "tests/test_binaryStorage_converted"
+	KEY = "testKey"
+
+	def setUp(self):
+		self.handler = dataHandler.DataHandler(cryptor.Cryptor())
+		hashedKey = self.handler.getCryptor().hashKey(self.KEY, True)
+		self.handler.createFile(self.FILE, "user1", hashedKey, "binary")
+		self.handler.openFile(self.FILE)
+		self.handler.addUser("user2", hashedKey)
+		for user in ("user1", "user2"):
+			self.open(user)
+			self.handler.addCategory("category")
+			for number in range(20):
+				self.handler.addEntry("category", f"{user}-{number}", "name", "password", "url", "notices", "timestamp")
+			self.handler.closeSession()
+
+	def tearDown(self):
+		for path in (self.FILE, self.CONVERTED + ".csv", self.CONVERTED + ".kwv"):
+			for name in (path, path + ".lock"):
+				if os.path.exists(name):
+					os.remove(name)
+
+	def open(self, user, path=None):
+		self.handler.openFile(path or self.FILE)
+		self.handler.getKey(user)
+		self.handler.startSession()
+
+	def test_format(self):
+		self.assertEqual("binary", vaultFile.detectFormat(self.FILE))
+		with open(self.FILE, "rb") as file:
+			self.assertEqual(binaryStorage.MAGIC, file.read(4))
+		self.handler.openFile(self.FILE)
+		self.assertEqual(["user1", "user2"], self.handler.getUsers())
+		self.open("user2")
+		self.assertEqual([f"user2-{number}" for number in range(20)], self.handler.getEntries("category"))
+		self.handler.closeSession()
+
+	def test_journal(self):
+		self.handler.setJournalMode(True)
+		self.open("user1")
+		self.handler.changeEntry("category", "user1-0", "notices", "changed")
+		self.handler.remEntry("category", "user1-1")
+		self.handler.saveEntries()
+		storage = binaryStorage.BinaryStorage(self.FILE)
+		self.assertEqual(2, storage.getVersion("user1"))
+		self.handler.closeSession()
+		self.handler.openFile(self.FILE)
+		self.handler.compact()
+		#A frame cut off by a crash is ignored
+		with open(self.FILE, "ab") as file:
+			file.write(binaryStorage.FRAME.pack(binaryStorage.FRAME_MARKER, 1000) + b"cut")
+		self.handler.setJournalMode(False)
+		self.open("user1")
+		self.assertEqual("changed", self.handler.getEntry("category", "user1-0")["notices"])
+		self.assertNotIn("user1-1", self.handler.getEntries("category"))
+		self.handler.closeSession()
+		self.open("user2")
+		self.assertEqual(20, len(self.handler.getEntries("category")))
+		self.handler.remUser()
+		self.handler.openFile(self.FILE)
+		self.assertEqual(["user1"], self.handler.getUsers())
+
+	def test_appendAfterCrash(self):
+		self.handler.setJournalMode(True)
+		self.open("user1")
+		self.handler.changeEntry("category", "user1-0", "notices", "beforeCrash")
+		self.handler.saveEntries()
+		with open(self.FILE, "ab") as file:
+			file.write(binaryStorage.FRAME.pack(binaryStorage.FRAME_MARKER, 1000) + b"cut")
+		#The next frame replaces the cut off one
+		self.handler.changeEntry("category", "user1-1", "notices", "afterCrash")
+		self.handler.saveEntries()
+		self.handler.closeSession()
+		self.handler.setJournalMode(False)
+		self.open("user1")
+		self.assertEqual("beforeCrash", self.handler.getEntry("category", "user1-0")["notices"])
+		self.assertEqual("afterCrash", self.handler.getEntry("category", "user1-1")["notices"])
+		self.handler.closeSession()
+
+	def test_convert(self):
+		self.assertEqual(2, vaultConverter.convertVault(self.FILE, self.CONVERTED + ".csv", "csv"))
+		self.assertEqual("csv", vaultFile.detectFormat(self.CONVERTED + ".csv"))
+		#All accounts are written at once
+		with mock.patch.object(vaultFile, "replaceFile", wraps=vaultFile.replaceFile) as replaceFile:
+			vaultConverter.convertVault(self.CONVERTED + ".csv", self.CONVERTED + ".kwv", "binary")
+		self.assertEqual(1, replaceFile.call_count)
+		original = binaryStorage.BinaryStorage(self.FILE)
+		converted = binaryStorage.BinaryStorage(self.CONVERTED + ".kwv")
+		for user in ("user1", "user2"):
+			self.assertEqual(original.getKey(user), converted.getKey(user))
+			self.assertEqual(original.loadRecords(user)[0], converted.loadRecords(user)[0])
+		self.assertLess(os.path.getsize(self.FILE), os.path.getsize(self.CONVERTED + ".csv") * 0.8)
+		self.open("user2", self.CONVERTED + ".csv")
+		self.assertEqual([f"user2-{number}" for number in range(20)], self.handler.getEntries("category"))
+		self.handler.closeSession()
+		with self.assertRaises(ValueError):
+			vaultConverter.convertVault(self.FILE, self.CONVERTED + ".csv", "binary")
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,122 @@
+#pylint: disable=C
+import unittest
+import os
+import multiprocessing
+import cryptor
+import dataHandler
+import versionConflictException
+
+KEY = "key"
+USERS = ["user0", "user1", "user2", "user3"]
+ENTRIES = 40
+
+def openHandler(path, user, journal=False, lazy=False):
+	handler = dataHandler.DataHandler(cryptor.Cryptor())
+	handler.getCryptor().hashKey(KEY, True)
+	handler.setJournalMode(journal)
+	handler.setLazyMode(lazy, 4)
+	handler.openFile(path)
+	handler.getKey(user)
+	handler.startSession()
+	return handler
+
+def hammer(path, user, worker, lazy):
+	"""Adds entries one by one with a save after each, half of the workers write in journal mode"""
+	handler = openHandler(path, user, worker % 2 == 1, lazy)
+	for number in range(ENTRIES):
+		if "shared" not in handler.getCategories():
+			handler.addCategory("shared")
+		handler.addEntry("shared", f"{worker}-{number}", "name", "password", "url", "notices", "timestamp")
+		handler.saveEntries()
+	handler.closeSession()
+
+class TestConcurrency(unittest.TestCase):
+
+	FILE = "tests/test_concurrency_file.csv"
+	FORMAT = "csv"
+	LAZY = False
+
+	def setUp(self):
+		handler = dataHandler.DataHandler(cryptor.Cryptor())
+		hashedKey = handler.getCryptor().hashKey(KEY, True)
+		handler.createFile(self.FILE, USERS[0], hashedKey, self.FORMAT)
+		handler.openFile(self.FILE)
+		for user in USERS[1:]:
+			handler.addUser(user, hashedKey)
+
+	def tearDown(self):
+		for path in (self.FILE, self.FILE + ".lock", self.FILE + "-wal", self.FILE + "-shm"):
+			if os.path.exists(path):
+				os.remove(path)
+
+	def test_staleVersion(self):
+		storage = dataHandler.openStorage(self.FILE)
+		records, version = storage.loadRecords(USERS[0])
+		self.assertEqual(version + 1, storage.saveRecords(USERS[0], records, set(), version))
+		with self.assertRaises(versionConflictException.VersionConflictException):
+			storage.saveRecords(USERS[0], records, set(), version)
+		self.assertEqual(version + 1, storage.getVersion(USERS[0]))
+
+	def test_merge(self):
+		handler = openHandler(self.FILE, USERS[0], lazy=self.LAZY)
+		handler.addCategory("a")
+		handler.addCategory("b")
+		handler.addEntry("a", "kept", "name", "password", "url", "notices", "timestamp")
+		handler.addEntry("a", "removed", "name", "password", "url", "notices", "timestamp")
+		handler.addEntry("b", "entry", "name", "password", "url", "notices", "timestamp")
+		handler.closeSession()
+
+		first = openHandler(self.FILE, USERS[0], lazy=self.LAZY)
+		second = openHandler(self.FILE, USERS[0], lazy=self.LAZY)
+		first.remEntry("a", "removed")
+		first.remCategory("b")
+		first.changeEntry("a", "kept", "notices", "changed by first")
+		first.addOldPassword("old1")
+		first.closeSession()
+		second.addEntry("a", "new", "name", "password", "url", "notices", "timestamp")
+		second.addCategory("c")
+		second.addOldPassword("old2")
+		second.closeSession()
+
+		handler = openHandler(self.FILE, USERS[0], lazy=self.LAZY)
+		self.assertEqual(["a", "c"], sorted(handler.getCategories()))
+		self.assertEqual(["kept", "new"], sorted(handler.getEntries("a")))
+		self.assertEqual("changed by first", handler.getEntry("a", "kept")["notices"])
+		self.assertEqual(["old1", "old2"], handler.getOldPasswords())
+		handler.closeSession()
+
+	def test_processes(self):
+		context = multiprocessing.get_context("fork")
+		#One process per user and two more on the first user
+		jobs = [(self.FILE, user, worker, self.LAZY) for worker, user in enumerate(USERS + USERS[:2])]
+		processes = [context.Process(target=hammer, args=job) for job in jobs]
+		for process in processes:
+			process.start()
+		for process in processes:
+			process.join()
+			self.assertEqual(0, process.exitcode)
+		for user in USERS:
+			handler = openHandler(self.FILE, user)
+			expected = sorted(f"{worker}-{number}" for worker, owner in enumerate(USERS + USERS[:2]) if owner == user
+			                  for number in range(ENTRIES))
+			self.assertEqual(expected, sorted(handler.getEntries("shared")))
+			handler.closeSession()
+		self.assertEqual(sorted(USERS), sorted(dataHandler.openStorage(self.FILE).getUsers()))
+
+class TestConcurrencyBinary(TestConcurrency):
+
+	FILE = "tests/test_concurrency_file.kwv"
+	FORMAT = "binary"
+
+class TestConcurrencySqlite(TestConcurrency):
+
+	FILE = "tests/test_concurrency_file.sqlite"
+	FORMAT = "sqlite"
+
+class TestConcurrencyLazy(TestConcurrency):
+
+	FILE = "tests/test_concurrency_file_lazy.csv"
+	LAZY = True
+
+if __name__ == "__main__":
+	unittest.main()
@@ -27,6 +27,31 @@ class TestCryptor(unittest.TestCase):
 			decryptedText = self.cryptor.decryptText(encryptedText)
 			self.assertEqual(text, decryptedText)
 
+	def test_newKey(self):
+		otherCryptor = cryptor.Cryptor()
+		otherCryptor.setKdfParams("pbkdf2-sha256$i=1000")
+		hashedKey = otherCryptor.newKey("Test123")
+		token = otherCryptor.encryptText(self.TEXTS[0])
+		#Random salt and master key
+		self.assertNotEqual(hashedKey, otherCryptor.newKey("Test123"))
+		self.assertFalse(otherCryptor.needsUpgrade(hashedKey))
+		self.assertTrue(otherCryptor.needsUpgrade(self.HASHES["Test123"]))
+
+		otherCryptor = cryptor.Cryptor()
+		self.assertFalse(otherCryptor.isCorrectKey("Test1234", hashedKey))
+		self.assertTrue(otherCryptor.isCorrectKey("Test123", hashedKey))
+		self.assertEqual(self.TEXTS[0], otherCryptor.decryptText(token))
+		self.assertTrue(otherCryptor.needsUpgrade(hashedKey))
+		upgradedKey = otherCryptor.upgradeKey("Test123")
+		self.assertTrue(upgradedKey.startswith("$" + otherCryptor.getKdfParams() + "$"))
+		self.assertTrue(cryptor.Cryptor().isCorrectKey("Test123", upgradedKey))
+		with self.assertRaises(ValueError):
+			otherCryptor.setKdfParams("scrypt$n=1000;r=8;p=1")
+		#The master key of an old hash must not be kept
+		otherCryptor.isCorrectKey("Test123", self.HASHES["Test123"])
+		with self.assertRaises(ValueError):
+			otherCryptor.upgradeKey("Test123")
+
 	def test_genPassword(self):
 		def passwordContainsCorrect(length: int, digits: bool, others: bool, upper: bool, lower: bool, forbidden: str, password: str) -> bool:
 			isCorrect = True
@@ -0,0 +1,67 @@
+#pylint: disable=C
+import unittest
+import os
+import cryptor
+import dataHandler
+import csvStorage
+
+class TestCsvStorage(unittest.TestCase):
+
+	FILE = "tests/test_csvStorage_file.csv"
+	KEY = "testKey"
+
+	def setUp(self):
+		self.handler = dataHandler.DataHandler(cryptor.Cryptor())
+		self.handler.createFile(self.FILE, "user1", self.handler.getCryptor().hashKey(self.KEY, True))
+		self.open()
+		self.handler.addCategory("category")
+		for number in range(5):
+			self.handler.addEntry("category", str(number), "name", "password", "url", "notices", "timestamp")
+		self.handler.closeSession()
+		self.handler.setJournalMode(True)
+
+	def tearDown(self):
+		for path in (self.FILE, self.FILE + ".lock"):
+			if os.path.exists(path):
+				os.remove(path)
+
+	def open(self):
+		self.handler.openFile(self.FILE)
+		self.handler.getKey("user1")
+		self.handler.startSession()
+
+	def test_appendAfterCrash(self):
+		self.open()
+		self.handler.changeEntry("category", "0", "notices", "beforeCrash")
+		self.handler.saveEntries()
+		#A crash in the middle of the next append
+		with open(self.FILE, "ab") as file:
+			file.write(b'user1,journal,"{""version"": 3, ""records"": {""cut')
+		self.assertEqual(2, csvStorage.CsvStorage(self.FILE).getVersion("user1"))
+		self.handler.changeEntry("category", "1", "notices", "afterCrash")
+		self.handler.saveEntries()
+		self.handler.closeSession()
+		with open(self.FILE, "rb") as file:
+			self.assertNotIn(b"cut", file.read())
+		self.open()
+		self.assertEqual("beforeCrash", self.handler.getEntry("category", "0")["notices"])
+		self.assertEqual("afterCrash", self.handler.getEntry("category", "1")["notices"])
+		self.handler.closeSession()
+
+	def test_missingLineBreak(self):
+		#A complete last row without its line break is kept
+		with open(self.FILE, "rb") as file:
+			content = file.read()
+		with open(self.FILE, "wb") as file:
+			file.write(content.rstrip(b"\r\n"))
+		self.open()
+		self.handler.changeEntry("category", "0", "notices", "changed")
+		self.handler.saveEntries()
+		self.handler.closeSession()
+		self.open()
+		self.assertEqual(5, len(self.handler.getEntries("category")))
+		self.assertEqual("changed", self.handler.getEntry("category", "0")["notices"])
+		self.handler.closeSession()
+
+if __name__ == "__main__":
+	unittest.main()
@@ -2,7 +2,16 @@
 import unittest
 import dataHandler
 import cryptor
+import keyDerivation
+import vaultConverter
 import os
+import csv
+import base64
+import json
+import hashlib
+import threading
+import http.server
+from cryptography.fernet import InvalidToken
 
 class TestCaseBase(unittest.TestCase):
 	def assertIsFile(self, path):
@@ -15,6 +24,7 @@ class TestDataHandler(TestCaseBase):
 	dataHandler = dataHandler.DataHandler(cryptor)
 
 	FILE  = "tests/test_dataHandler_file.csv"
+	FORMAT = "csv"
 	USER1 = "testUser1"
 	USER2 = "testUser2"
 	KEY1  = "testKey1"
@@ -44,8 +54,15 @@ class TestDataHandler(TestCaseBase):
 		"timestamp": TIMESTAMP1
 	}
 
+	@classmethod
+	def tearDownClass(cls):
+		#The tests share one file, it is removed after the last one
+		for path in (cls.FILE, cls.FILE + ".lock", cls.FILE + "-wal", cls.FILE + "-shm"):
+			if os.path.exists(path):
+				os.remove(path)
+
 	def test_01_createFile(self):
-		self.dataHandler.createFile(self.FILE, self.USER1, self.cryptor.hashKey(self.KEY1, True))
+		self.dataHandler.createFile(self.FILE, self.USER1, self.cryptor.hashKey(self.KEY1, True), self.FORMAT)
 		self.assertIsFile(self.FILE)
 
 	def test_02_openFile(self):
@@ -97,7 +114,7 @@ class TestDataHandler(TestCaseBase):
 		self.assertIn(self.TITLE1, self.dataHandler.searchEntry(self.CATEGORY1)[self.CATEGORY1])
 		self.assertIn(self.TITLE1, self.dataHandler.searchEntry(self.TITLE1)[self.CATEGORY1])
 		self.assertIn(self.TITLE1, self.dataHandler.searchEntry(self.NAME1)[self.CATEGORY1])
-		self.assertIn(self.TITLE1, self.dataHandler.searchEntry(self.PASS1)[self.CATEGORY1])
+		self.assertNotIn(self.CATEGORY1, self.dataHandler.searchEntry(self.PASS1))
 		self.assertIn(self.TITLE1, self.dataHandler.searchEntry(self.URL1)[self.CATEGORY1])
 		self.assertIn(self.TITLE1, self.dataHandler.searchEntry(self.NOTICES1)[self.CATEGORY1])
 		self.assertIn(self.TITLE1, self.dataHandler.searchEntry(self.TIMESTAMP1)[self.CATEGORY1])
@@ -106,6 +123,7 @@ class TestDataHandler(TestCaseBase):
 		self.dataHandler.remEntry(self.CATEGORY1, self.TITLE2)
 		self.assertIn(self.TITLE1, self.dataHandler.getEntries(self.CATEGORY1))
 		self.assertNotIn(self.TITLE2, self.dataHandler.getEntries(self.CATEGORY1))
+		self.assertNotIn(self.CATEGORY1, self.dataHandler.searchEntry(self.NAME2))
 
 	def test_14_getEntry(self):
 		self.assertEqual(self.ENTRY1, self.dataHandler.getEntry(self.CATEGORY1, self.TITLE1))
@@ -135,6 +153,352 @@ class TestDataHandler(TestCaseBase):
 		self.dataHandler.remUser()
 		self.dataHandler.openFile(self.FILE)
 		self.assertNotIn(self.USER1, self.dataHandler.getUsers())
-		
+
+	def test_20_saveOnlyChangedRecords(self):
+		def readRecords():
+			return dataHandler.openStorage(self.FILE).loadRecords(self.USER2)[0]
+
+		self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+		self.dataHandler.startSession()
+		self.dataHandler.addCategory(self.CATEGORY1)
+		self.dataHandler.addEntry(self.CATEGORY1, self.TITLE1, self.NAME1, self.PASS1, self.URL1, self.NOTICES1, self.TIMESTAMP1)
+		self.dataHandler.addEntry(self.CATEGORY1, self.TITLE2, self.NAME2, self.PASS2, self.URL2, self.NOTICES2, self.TIMESTAMP2)
+		self.dataHandler.saveEntries()
+		before = readRecords()
+		self.dataHandler.changeEntry(self.CATEGORY1, self.TITLE1, "password", self.PASS2)
+		self.dataHandler.saveEntries()
+		after = readRecords()
+		self.assertEqual(before.keys(), after.keys())
+		self.assertEqual(1, sum(1 for recordId in before if before[recordId] != after[recordId]))
+		self.dataHandler.closeSession()
+
+	def test_21_legacyFormat(self):
+		self.dataHandler.openFile(self.FILE)
+		self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+		legacy = self.cryptor.encryptText(json.dumps({"entries":{self.CATEGORY2:{self.TITLE1:self.ENTRY1}}, "oldPasswords":[self.PASS1]}))
+		legacyFile = self.FILE + ".legacy.csv"
+		with open(legacyFile, "w", encoding="utf-8") as file:
+			writer = csv.writer(file, delimiter=",")
+			writer.writerow(["account", "key", "data"])
+			writer.writerow([self.USER2, self.cryptor.hashKey(self.KEY2, False), legacy])
+		if self.FORMAT == "csv":
+			os.replace(legacyFile, self.FILE)
+		else:
+			#The other formats get old accounts by a conversion, the open database is closed first
+			self.dataHandler.openFile(legacyFile)
+			os.remove(self.FILE)
+			vaultConverter.convertVault(legacyFile, self.FILE, self.FORMAT)
+			os.remove(legacyFile)
+			os.remove(legacyFile + ".lock")
+			self.dataHandler.openFile(self.FILE)
+			self.dataHandler.getKey(self.USER2)
+		self.dataHandler.startSession()
+		self.assertEqual(self.ENTRY1, self.dataHandler.getEntry(self.CATEGORY2, self.TITLE1))
+		self.assertIn(self.PASS1, self.dataHandler.getOldPasswords())
+		self.dataHandler.closeSession()
+		self.dataHandler.openFile(self.FILE)
+		self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+		self.dataHandler.startSession()
+		self.assertEqual(self.ENTRY1, self.dataHandler.getEntry(self.CATEGORY2, self.TITLE1))
+		self.dataHandler.closeSession()
+
+	def test_22_journalMode(self):
+		def countRows():
+			with open(self.FILE, "r", encoding="utf-8") as file:
+				return sum(1 for row in csv.DictReader(file))
+
+		self.dataHandler.setJournalMode(True)
+		self.dataHandler.openFile(self.FILE)
+		self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+		self.dataHandler.startSession()
+		rows = countRows() if self.FORMAT == "csv" else 0
+		self.dataHandler.addEntry(self.CATEGORY2, self.TITLE2, self.NAME2, self.PASS2, self.URL2, self.NOTICES2, self.TIMESTAMP2)
+		self.dataHandler.saveEntries()
+		self.dataHandler.remEntry(self.CATEGORY2, self.TITLE1)
+		self.dataHandler.closeSession()
+		if self.FORMAT == "csv":
+			self.assertEqual(rows + 2, countRows())
+
+		self.dataHandler.openFile(self.FILE)
+		self.assertEqual([self.USER2], self.dataHandler.getUsers())
+		self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+		self.dataHandler.startSession()
+		self.assertEqual([self.TITLE2], self.dataHandler.getEntries(self.CATEGORY2))
+		self.dataHandler.compact()
+		if self.FORMAT == "csv":
+			self.assertEqual(rows, countRows())
+		self.assertEqual([self.TITLE2], self.dataHandler.getEntries(self.CATEGORY2))
+		self.dataHandler.closeSession()
+		self.dataHandler.setJournalMode(False)
+
+	def test_23_userIndex(self):
+		self.dataHandler.openFile(self.FILE)
+		self.assertEqual([self.USER2], self.dataHandler.getUsers())
+		otherHandler = dataHandler.DataHandler(self.cryptor)
+		otherHandler.openFile(self.FILE)
+		otherHandler.addUser(self.USER1, self.cryptor.hashKey(self.KEY1, True))
+		self.assertEqual([self.USER2, self.USER1], self.dataHandler.getUsers())
+		self.assertEqual(self.cryptor.hashKey(self.KEY1, False), self.dataHandler.getKey(self.USER1))
+		self.cryptor.isCorrectKey(self.KEY1, self.dataHandler.getKey(self.USER1))
+		self.dataHandler.startSession()
+		self.assertEqual([], self.dataHandler.getCategories())
+		self.dataHandler.closeSession()
+
+	def test_24_auditEntries(self):
+		pwned = hashlib.sha1(self.PASS1.encode("utf-8")).hexdigest().upper()
+		requested = []
+
+		class RangeHandler(http.server.BaseHTTPRequestHandler):
+			def do_GET(self):
+				prefix = self.path.rsplit("/", 1)[1]
+				requested.append(prefix)
+				body = "0018A45C4D1DEF81644B54AB7F969B88D65:1\r\n"
+				if prefix == pwned[:5]:
+					body += pwned[5:] + ":3\r\n"
+				self.send_response(200)
+				self.end_headers()
+				self.wfile.write(body.encode("utf-8"))
+
+			def log_message(self, *args):
+				pass
+
+		server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+		thread = threading.Thread(target=server.serve_forever)
+		thread.start()
+		self.cryptor.setPwnedApi(f"http://127.0.0.1:{server.server_address[1]}/range/")
+		try:
+			self.dataHandler.openFile(self.FILE)
+			self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+			self.dataHandler.startSession()
+			self.dataHandler.addEntry(self.CATEGORY2, self.TITLE1, self.NAME1, self.PASS1, self.URL1, self.NOTICES1, self.TIMESTAMP1)
+			self.dataHandler.addEntry(self.CATEGORY2, "strong1", self.NAME1, "Str0ng!Passw0rd", self.URL1, self.NOTICES1, self.TIMESTAMP1)
+			self.dataHandler.addEntry(self.CATEGORY2, "strong2", self.NAME1, "Str0ng!Passw0rd", self.URL1, self.NOTICES1, self.TIMESTAMP1)
+			self.dataHandler.addEntry(self.CATEGORY2, "old", self.NAME1, "0ld!Passw0rd", self.URL1, self.NOTICES1, self.TIMESTAMP1)
+			self.dataHandler.addOldPassword("0ld!Passw0rd")
+			report = self.dataHandler.auditEntries(4)
+			self.dataHandler.closeSession()
+		finally:
+			server.shutdown()
+			server.server_close()
+			thread.join()
+			self.cryptor.setPwnedApi("https://api.pwnedpasswords.com/range/")
+
+		self.assertEqual(sorted([(self.CATEGORY2, self.TITLE1), (self.CATEGORY2, self.TITLE2)]), report["weak"])
+		self.assertEqual([(self.CATEGORY2, self.TITLE1)], report["breached"])
+		self.assertEqual([(self.CATEGORY2, "old"), (self.CATEGORY2, "strong1"), (self.CATEGORY2, "strong2"), (self.CATEGORY2, self.TITLE1)], report["reused"])
+		self.assertEqual([], report["unchecked"])
+		self.assertEqual(len(requested), len(set(requested)))
+
+	def test_25_transaction(self):
+		def readData():
+			return dataHandler.openStorage(self.FILE).loadRecords(self.USER2)
+
+		self.dataHandler.openFile(self.FILE)
+		self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+		self.dataHandler.startSession()
+		before = readData()
+		with self.dataHandler.transaction():
+			self.dataHandler.addCategory(self.CATEGORY1)
+			self.dataHandler.addEntry(self.CATEGORY1, self.TITLE1, self.NAME1, self.PASS1, self.URL1, self.NOTICES1, self.TIMESTAMP1)
+			self.dataHandler.changeEntry(self.CATEGORY2, self.TITLE2, "notices", "changedInTransaction")
+			self.dataHandler.remEntry(self.CATEGORY2, "old")
+			self.dataHandler.saveEntries()
+			self.assertEqual(before, readData())
+		self.assertNotEqual(before, readData())
+		self.dataHandler.closeSession()
+
+		self.dataHandler.openFile(self.FILE)
+		self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+		self.dataHandler.startSession()
+		self.assertEqual(self.ENTRY1, self.dataHandler.getEntry(self.CATEGORY1, self.TITLE1))
+		self.assertEqual("changedInTransaction", self.dataHandler.getEntry(self.CATEGORY2, self.TITLE2)["notices"])
+		self.assertNotIn("old", self.dataHandler.getEntries(self.CATEGORY2))
+		self.dataHandler.closeSession()
+
+	def test_26_transactionRollback(self):
+		self.dataHandler.openFile(self.FILE)
+		self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+		self.dataHandler.startSession()
+		categories = self.dataHandler.getCategories()
+		entry = dict(self.dataHandler.getEntry(self.CATEGORY2, self.TITLE2))
+		self.assertEqual({self.CATEGORY2: [self.TITLE2]}, self.dataHandler.searchEntry("changedInTransaction"))
+		with self.assertRaises(KeyError):
+			with self.dataHandler.transaction():
+				self.dataHandler.changeEntry(self.CATEGORY2, self.TITLE2, "notices", self.NOTICES2)
+				self.dataHandler.remEntry(self.CATEGORY2, "strong1")
+				self.dataHandler.addEntry(self.CATEGORY2, "new", self.NAME1, self.PASS1, self.URL1, self.NOTICES1, self.TIMESTAMP1)
+				self.dataHandler.remCategory(self.CATEGORY1)
+				self.dataHandler.addOldPassword(self.PASS2)
+				self.dataHandler.remEntry(self.CATEGORY2, "missing")
+		self.assertEqual(categories, self.dataHandler.getCategories())
+		self.assertEqual(entry, self.dataHandler.getEntry(self.CATEGORY2, self.TITLE2))
+		self.assertIn("strong1", self.dataHandler.getEntries(self.CATEGORY2))
+		self.assertNotIn("new", self.dataHandler.getEntries(self.CATEGORY2))
+		self.assertEqual(self.ENTRY1, self.dataHandler.getEntry(self.CATEGORY1, self.TITLE1))
+		self.assertNotIn(self.PASS2, self.dataHandler.getOldPasswords())
+		self.assertEqual({self.CATEGORY2: [self.TITLE2]}, self.dataHandler.searchEntry("changedInTransaction"))
+		self.dataHandler.closeSession()
+
+		self.dataHandler.openFile(self.FILE)
+		self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+		self.dataHandler.startSession()
+		self.assertEqual(entry, self.dataHandler.getEntry(self.CATEGORY2, self.TITLE2))
+		self.assertIn("strong1", self.dataHandler.getEntries(self.CATEGORY2))
+		self.dataHandler.closeSession()
+
+	def test_27_atomicWrite(self):
+		with open(self.FILE, "rb") as file:
+			before = file.read()
+		records = dataHandler.openStorage(self.FILE).loadRecords(self.USER2)
+		self.dataHandler.openFile(self.FILE)
+		self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+		self.dataHandler.startSession()
+		self.dataHandler.changeEntry(self.CATEGORY2, self.TITLE2, "notices", self.NOTICES2)
+		#csv and binary files are replaced by a new file, SQLite writes the rows in a transaction
+		module, name = (base64, "urlsafe_b64decode") if self.FORMAT == "sqlite" else (os, "replace")
+		original = getattr(module, name)
+		def crash(*args):
+			raise OSError("crash")
+		setattr(module, name, crash)
+		try:
+			with self.assertRaises(OSError):
+				self.dataHandler.saveEntries()
+		finally:
+			setattr(module, name, original)
+		self.assertEqual(records, dataHandler.openStorage(self.FILE).loadRecords(self.USER2))
+		if self.FORMAT != "sqlite":
+			with open(self.FILE, "rb") as file:
+				self.assertEqual(before, file.read())
+		#No temporary file is left behind
+		self.assertEqual([], [name for name in os.listdir("tests") if name.startswith("." + os.path.basename(self.FILE))])
+
+		with self.assertRaises(ValueError):
+			self.dataHandler.setFsyncPolicy("sometimes")
+		self.dataHandler.setFsyncPolicy("always")
+		self.dataHandler.closeSession()
+		self.dataHandler.setFsyncPolicy("close")
+		self.dataHandler.openFile(self.FILE)
+		self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2))
+		self.dataHandler.startSession()
+		self.assertEqual(self.NOTICES2, self.dataHandler.getEntry(self.CATEGORY2, self.TITLE2)["notices"])
+		self.dataHandler.closeSession()
+
+	def test_28_upgradeKey(self):
+		def login(key):
+			handler = dataHandler.DataHandler(cryptor.Cryptor())
+			handler.openFile(self.FILE)
+			return handler.getCryptor().isCorrectKey(key, handler.getKey(self.USER2))
+
+		def decryptsWithLegacyKey():
+			legacyCryptor = cryptor.Cryptor()
+			legacyCryptor.hashKey(self.KEY2, True)
+			records = dataHandler.openStorage(self.FILE).loadRecords(self.USER2)[0]
+			try:
+				for token in records.values():
+					legacyCryptor.decryptBytes(token)
+			except InvalidToken:
+				return False
+			return True
+
+		self.dataHandler.openFile(self.FILE)
+		legacyKey = self.dataHandler.getKey(self.USER2)
+		self.assertTrue(self.cryptor.isCorrectKey(self.KEY2, legacyKey))
+		self.assertTrue(decryptsWithLegacyKey())
+		for params in ("pbkdf2-sha256$i=1000", "scrypt$n=1024;r=8;p=1"):
+			self.cryptor.setKdfParams(params)
+			self.assertTrue(self.dataHandler.upgradeKey(self.KEY2))
+			self.assertFalse(self.dataHandler.upgradeKey(self.KEY2))
+			self.assertTrue(self.dataHandler.getKey(self.USER2).startswith("$" + params + "$"))
+			#The old hash got a new random master key, not the one of the global salt
+			self.assertFalse(decryptsWithLegacyKey())
+			self.dataHandler.startSession()
+			self.assertEqual(self.NOTICES2, self.dataHandler.getEntry(self.CATEGORY2, self.TITLE2)["notices"])
+			self.dataHandler.closeSession()
+			self.assertTrue(login(self.KEY2))
+			self.assertFalse(login(self.KEY1))
+			self.dataHandler.openFile(self.FILE)
+			self.assertTrue(self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2)))
+		self.cryptor.setKdfParams(keyDerivation.DEFAULT_PARAMS)
+
+	def test_29_changeKey(self):
+		self.dataHandler.openFile(self.FILE)
+		self.assertTrue(self.cryptor.isCorrectKey(self.KEY2, self.dataHandler.getKey(self.USER2)))
+		self.dataHandler.startSession()
+		self.dataHandler.changeEntry(self.CATEGORY2, self.TITLE2, "notices", "beforeChange")
+		self.assertFalse(self.dataHandler.checkKey("wrongKey"))
+		self.assertTrue(self.dataHandler.checkKey(self.KEY2))
+		self.cryptor.setKdfParams("pbkdf2-sha256$i=1000")
+		progress = []
+		count = self.dataHandler.changeKey("newKey2", lambda done, total: progress.append((done, total)))
+		self.assertEqual((count, count), progress[-1])
+		self.assertEqual(count, len(dataHandler.openStorage(self.FILE).loadRecords(self.USER2)[0]))
+		self.assertFalse(self.dataHandler.checkKey(self.KEY2))
+		self.assertTrue(self.dataHandler.checkKey("newKey2"))
+		#The session goes on with the new master key
+		self.assertEqual(self.ENTRY1, self.dataHandler.getEntry(self.CATEGORY1, self.TITLE1))
+		self.assertEqual("beforeChange", self.dataHandler.getEntry(self.CATEGORY2, self.TITLE2)["notices"])
+		self.dataHandler.changeEntry(self.CATEGORY2, self.TITLE2, "notices", "afterChange")
+		self.dataHandler.closeSession()
+		self.cryptor.setKdfParams(keyDerivation.DEFAULT_PARAMS)
+
+		handler = dataHandler.DataHandler(cryptor.Cryptor())
+		handler.openFile(self.FILE)
+		self.assertTrue(handler.getCryptor().isCorrectKey("newKey2", handler.getKey(self.USER2)))
+		handler.startSession()
+		self.assertEqual(self.ENTRY1, handler.getEntry(self.CATEGORY1, self.TITLE1))
+		self.assertEqual("afterChange", handler.getEntry(self.CATEGORY2, self.TITLE2)["notices"])
+		handler.closeSession()
+		#The other account keeps its password
+		handler.openFile(self.FILE)
+		self.assertTrue(handler.getCryptor().isCorrectKey(self.KEY1, handler.getKey(self.USER1)))
+		handler.startSession()
+		handler.closeSession()
+
+	def test_30_compression(self):
+		handler = dataHandler.DataHandler(cryptor.Cryptor())
+		with self.assertRaises(ValueError):
+			handler.setCompression("gzip")
+		handler.openFile(self.FILE)
+		self.assertTrue(handler.getCryptor().isCorrectKey("newKey2", handler.getKey(self.USER2)))
+		handler.startSession()
+		handler.setCompression("lzma")
+		handler.changeEntry(self.CATEGORY2, self.TITLE2, "notices", "compressed " * 200)
+		handler.closeSession()
+		#Only the records saved after the change are compressed, the others stay readable
+		records = dataHandler.openStorage(self.FILE).loadRecords(self.USER2)[0]
+		payloads = [handler.getCryptor().decryptBytes(token) for token in records.values()]
+		self.assertTrue(any(payload.startswith(b"\x02") for payload in payloads))
+		self.assertTrue(any(payload.startswith(b"{") for payload in payloads))
+
+		self.dataHandler.openFile(self.FILE)
+		self.assertTrue(self.cryptor.isCorrectKey("newKey2", self.dataHandler.getKey(self.USER2)))
+		self.dataHandler.startSession()
+		self.assertEqual("lzma", self.dataHandler.getCompression())
+		self.assertEqual("compressed " * 200, self.dataHandler.getEntry(self.CATEGORY2, self.TITLE2)["notices"])
+		self.assertEqual(self.ENTRY1, self.dataHandler.getEntry(self.CATEGORY1, self.TITLE1))
+		self.dataHandler.closeSession()
+
+class TestDataHandlerBinary(TestDataHandler):
+
+	cryptor = cryptor.Cryptor()
+	dataHandler = dataHandler.DataHandler(cryptor)
+	FILE = "tests/test_dataHandler_file.kwv"
+	FORMAT = "binary"
+
+class TestDataHandlerSqlite(TestDataHandler):
+
+	cryptor = cryptor.Cryptor()
+	dataHandler = dataHandler.DataHandler(cryptor)
+	FILE = "tests/test_dataHandler_file.sqlite"
+	FORMAT = "sqlite"
+
+class TestDataHandlerLazy(TestDataHandler):
+
+	cryptor = cryptor.Cryptor()
+	dataHandler = dataHandler.DataHandler(cryptor)
+	#Every entry is evicted as soon as another one is used
+	dataHandler.setLazyMode(True, 1)
+	FILE = "tests/test_dataHandler_file_lazy.csv"
+
 if __name__ == "__main__":
 	unittest.main()
@@ -0,0 +1,132 @@
+#pylint: disable=C
+import unittest
+import os
+import json
+import cryptor
+import dataHandler
+import entryCache
+
+class CountingCryptor(cryptor.Cryptor):
+
+	def __init__(self):
+		super().__init__()
+		self.decrypted = 0
+
+	def decryptBytes(self, text):
+		self.decrypted += 1
+		return super().decryptBytes(text)
+
+class TestEntryCache(unittest.TestCase):
+
+	FILE = "tests/test_entryCache_file.csv"
+
+	def setUp(self):
+		self.decrypted = []
+		self.cache = entryCache.EntryCache(self.decrypt, 2)
+		self.cache.load({recordId: json.dumps({"id": recordId}) for recordId in ("a", "b", "c")})
+
+	def tearDown(self):
+		for path in (self.FILE, self.FILE + ".lock"):
+			if os.path.exists(path):
+				os.remove(path)
+
+	def decrypt(self, token):
+		self.decrypted.append(json.loads(token)["id"])
+		return token
+
+	def test_lru(self):
+		self.assertEqual([], self.decrypted)
+		self.cache.get("a")
+		self.cache.get("b")
+		self.cache.get("a")
+		self.cache.get("c")
+		self.assertEqual(2, self.cache.getCachedCount())
+		#b was the least recently used
+		self.cache.get("a")
+		self.cache.get("b")
+		self.assertEqual(["a", "b", "c", "b"], self.decrypted)
+		self.cache.peek("c")
+		self.assertEqual(2, self.cache.getCachedCount())
+		with self.assertRaises(KeyError):
+			self.cache.get("d")
+
+	def test_pin(self):
+		self.cache.pin("a")["id"] = "changed"
+		self.cache.pin("d", {"id": "new"})
+		for recordId in ("b", "c", "b", "c"):
+			self.cache.get(recordId)
+		self.assertEqual("changed", self.cache.get("a")["id"])
+		self.assertEqual("new", self.cache.get("d")["id"])
+		self.cache.release("d")
+		self.assertEqual("new", self.cache.get("d")["id"])
+		self.cache.release("a", json.dumps({"id": "saved"}))
+		self.cache.get("b")
+		self.cache.get("c")
+		self.assertEqual("saved", self.cache.get("a")["id"])
+		self.cache.remove("a")
+		self.assertNotIn("a", self.cache)
+
+	def test_eager(self):
+		cache = entryCache.EntryCache(self.decrypt)
+		cache.load({recordId: json.dumps({"id": recordId}) for recordId in ("a", "b", "c")})
+		self.assertEqual(["a", "b", "c"], self.decrypted)
+		self.assertEqual(3, cache.getCachedCount())
+
+	def test_lazySession(self):
+		handler = dataHandler.DataHandler(CountingCryptor())
+		handler.createFile(self.FILE, "user", handler.getCryptor().hashKey("key", True))
+		handler.openFile(self.FILE)
+		handler.getKey("user")
+		handler.startSession()
+		handler.addCategory("category")
+		for number in range(50):
+			handler.addEntry("category", str(number), "name", f"password{number}", "url", "notices", "timestamp")
+		handler.closeSession()
+
+		handler.setLazyMode(True, 10)
+		handler.getCryptor().decrypted = 0
+		handler.openFile(self.FILE)
+		handler.getKey("user")
+		handler.startSession()
+		#Only the index
+		self.assertEqual(1, handler.getCryptor().decrypted)
+		self.assertEqual(50, len(handler.getEntries("category")))
+		self.assertEqual("timestamp", handler.getTimestamp("category", "3"))
+		self.assertEqual(1, handler.getCryptor().decrypted)
+		self.assertEqual("password7", handler.getEntry("category", "7")["password"])
+		handler.getEntry("category", "7")
+		self.assertEqual(2, handler.getCryptor().decrypted)
+		handler.changeEntry("category", "7", "password", "changed")
+		for number in range(50):
+			handler.getEntry("category", str(number))
+		self.assertEqual("changed", handler.getEntry("category", "7")["password"])
+		handler.closeSession()
+
+		handler.openFile(self.FILE)
+		handler.getKey("user")
+		handler.startSession()
+		self.assertEqual("changed", handler.getEntry("category", "7")["password"])
+		self.assertEqual(50, sum(1 for _ in handler.iterEntries()))
+		#A rolled back removal does not keep the entry pinned
+		with self.assertRaises(KeyError):
+			with handler.transaction():
+				handler.remEntry("category", "3")
+				handler.remEntry("category", "missing")
+		for number in range(20):
+			handler.getEntry("category", str(number))
+		decrypted = handler.getCryptor().decrypted
+		handler.getEntry("category", "3")
+		self.assertEqual(decrypted + 1, handler.getCryptor().decrypted)
+		handler.changeEntry("category", "3", "timestamp", "changed")
+		handler.closeSession()
+
+		handler.openFile(self.FILE)
+		handler.getKey("user")
+		handler.startSession()
+		decrypted = handler.getCryptor().decrypted
+		self.assertEqual("changed", handler.getTimestamp("category", "3"))
+		self.assertEqual(decrypted, handler.getCryptor().decrypted)
+		handler.closeSession()
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,113 @@
+#pylint: disable=C
+import unittest
+import os
+import json
+import cryptography.fernet
+import cryptor
+import dataHandler
+import exporter
+import importer
+
+class TestExporter(unittest.TestCase):
+
+	FILE = "tests/test_exporter_file.csv"
+	EXPORT = "tests/test_exporter_export"
+	USERS = {"user1": "testKey1", "user2": "testKey2"}
+
+	@classmethod
+	def setUpClass(cls):
+		handler = dataHandler.DataHandler(cryptor.Cryptor())
+		handler.createFile(cls.FILE, "user1", handler.getCryptor().hashKey(cls.USERS["user1"], True))
+		handler.openFile(cls.FILE)
+		handler.addUser("user2", handler.getCryptor().hashKey(cls.USERS["user2"], True))
+		for user, key in cls.USERS.items():
+			handler.openFile(cls.FILE)
+			handler.getCryptor().isCorrectKey(key, handler.getKey(user))
+			handler.startSession()
+			for category in ("Mail", "Shops"):
+				handler.addCategory(category)
+				for number in range(300):
+					handler.addEntry(category, f"{user}-{number}", "name", f"pass,\"{number}\"\n", "https://url.de", "notices", "2024-07-27 12:00:00")
+			handler.closeSession()
+
+	@classmethod
+	def tearDownClass(cls):
+		os.remove(cls.FILE)
+		os.remove(cls.FILE + ".lock")
+
+	def tearDown(self):
+		for extension in exporter.FORMATS:
+			if os.path.exists(f"{self.EXPORT}.{extension}"):
+				os.remove(f"{self.EXPORT}.{extension}")
+
+	def openSession(self, user):
+		handler = dataHandler.DataHandler(cryptor.Cryptor())
+		handler.openFile(self.FILE)
+		handler.getCryptor().isCorrectKey(self.USERS[user], handler.getKey(user))
+		handler.startSession()
+		return handler
+
+	def test_formats(self):
+		for extension in ("csv", "json", "jsonl"):
+			path = f"{self.EXPORT}.{extension}"
+			#An existing readable file is not exported into as it is
+			with open(path, "w", encoding="utf-8") as file:
+				file.write("old")
+			os.chmod(path, 0o644)
+			self.assertEqual(600, exporter.exportUsers(self.FILE, {"user1": self.USERS["user1"]}, path))
+			self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+			rows = list(importer.readFile(path))
+			self.assertEqual(600, len(rows))
+			self.assertEqual({"account": "user1", "category": "Mail", "title": "user1-7", "name": "name", "password": "pass,\"7\"\n",
+							  "url": "https://url.de", "notices": "notices", "timestamp": "2024-07-27 12:00:00"}, rows[7])
+
+	def test_importExport(self):
+		exporter.exportUsers(self.FILE, {"user1": self.USERS["user1"]}, self.EXPORT + ".csv")
+		handler = self.openSession("user2")
+		counts = importer.Importer(handler).importFile(self.EXPORT + ".csv")
+		self.assertEqual(600, counts["added"])
+		self.assertEqual("pass,\"7\"\n", handler.getEntry("Shops", "user1-7")["password"])
+		self.assertEqual(1200, sum(1 for _ in handler.iterEntries()))
+
+	def test_backup(self):
+		path = self.EXPORT + ".kwvb"
+		with exporter.Exporter(path, backupPassword="backupKey", chunkSize=100) as backup:
+			for user in self.USERS:
+				handler = self.openSession(user)
+				self.assertEqual(600, backup.writeSession(handler, user))
+				handler.closeSession()
+		with open(path, "r", encoding="utf-8") as file:
+			lines = file.read().splitlines()
+		self.assertEqual(exporter.BACKUP_FORMAT, json.loads(lines[0])["format"])
+		#12 chunks of entries and the end chunk
+		self.assertEqual(13, len(lines) - 1)
+		self.assertNotIn("user1-7", "".join(lines))
+
+		rows = list(exporter.readBackup(path, "backupKey"))
+		self.assertEqual(1200, len(rows))
+		self.assertEqual(("user2", "Shops", "user2-299"), (rows[-1]["account"], rows[-1]["category"], rows[-1]["title"]))
+		self.assertEqual(1200, sum(1 for _ in importer.readFile(path, backupPassword="backupKey")))
+		with self.assertRaises(cryptography.fernet.InvalidToken):
+			next(exporter.readBackup(path, "wrongKey"))
+		with self.assertRaises(ValueError):
+			exporter.Exporter(path)
+
+		def write(lines):
+			with open(path, "w", encoding="utf-8") as file:
+				file.write("\n".join(lines) + "\n")
+
+		#Cut off, a dropped chunk and swapped chunks
+		for changed in (lines[:-1], lines[:-2], lines[:3] + lines[4:], lines[:3] + [lines[4], lines[3]] + lines[5:]):
+			write(changed)
+			with self.assertRaises(ValueError):
+				list(exporter.readBackup(path, "backupKey"))
+		write(lines)
+		self.assertEqual(1200, sum(1 for _ in exporter.readBackup(path, "backupKey")))
+
+	def test_wrongPassword(self):
+		with self.assertRaises(ValueError):
+			exporter.exportUsers(self.FILE, {"user1": self.USERS["user1"], "user2": "wrong"}, self.EXPORT + ".csv")
+		self.assertFalse(os.path.exists(self.EXPORT + ".csv"))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,122 @@
+#pylint: disable=C
+import unittest
+import os
+import json
+import cryptor
+import dataHandler
+import importer
+import objectAlreadyExistsException
+
+class TestImporter(unittest.TestCase):
+
+	FILE = "tests/test_importer_file.csv"
+	EXPORT = "tests/test_importer_export"
+	KEY = "testKey"
+
+	def setUp(self):
+		self.handler = dataHandler.DataHandler(cryptor.Cryptor())
+		self.handler.createFile(self.FILE, "user", self.handler.getCryptor().hashKey(self.KEY, True))
+		self.handler.openFile(self.FILE)
+		self.handler.getKey("user")
+		self.handler.startSession()
+		self.handler.addCategory("Mail")
+		self.handler.addEntry("Mail", "posteo", "old", "oldPass", "", "", "2024-01-01 00:00:00")
+
+	def tearDown(self):
+		for path in (self.FILE, self.FILE + ".lock", self.EXPORT + ".csv", self.EXPORT + ".json", self.EXPORT + ".jsonl"):
+			if os.path.exists(path):
+				os.remove(path)
+
+	def reopen(self):
+		self.handler.closeSession()
+		self.handler.openFile(self.FILE)
+		self.handler.getKey("user")
+		self.handler.startSession()
+
+	def test_csv(self):
+		with open(self.EXPORT + ".csv", "w", encoding="utf-8") as file:
+			file.write('"Group","Title","Username","Password","URL","Notes"\n')
+			file.write('"Mail","posteo","new","newPass","https://posteo.de","line1\nline2"\n')
+			file.write('"Shops","shop","me","pass","https://shop.de",""\n')
+			file.write('"","bank","me","pass","",""\n')
+			file.write('"Shops","","me","pass","",""\n')
+		progress = []
+		counts = importer.Importer(self.handler, duplicates="rename", batchSize=2).importFile(self.EXPORT + ".csv", progress=lambda counts: progress.append(dict(counts)))
+		self.assertEqual({"added": 2, "renamed": 1, "replaced": 0, "skipped": 0, "invalid": 1}, counts)
+		self.assertEqual(2, len(progress))
+		self.reopen()
+		self.assertEqual(["Mail", "Shops", "default"], self.handler.getCategories())
+		self.assertEqual(["posteo", "posteo (2)"], self.handler.getEntries("Mail"))
+		entry = self.handler.getEntry("Mail", "posteo (2)")
+		self.assertEqual(("new", "newPass", "https://posteo.de", "line1\nline2"), (entry["name"], entry["password"], entry["url"], entry["notices"]))
+		self.assertEqual(["bank"], self.handler.getEntries("default"))
+
+	def test_duplicates(self):
+		with open(self.EXPORT + ".csv", "w", encoding="utf-8") as file:
+			file.write("name,url,username,password\n")
+			file.write("posteo,https://posteo.de,new,newPass\n")
+		counts = importer.Importer(self.handler, defaultCategory="Mail").importFile(self.EXPORT + ".csv")
+		self.assertEqual(1, counts["skipped"])
+		self.assertEqual("old", self.handler.getEntry("Mail", "posteo")["name"])
+		counts = importer.Importer(self.handler, defaultCategory="Mail", duplicates="replace").importFile(self.EXPORT + ".csv")
+		self.assertEqual(1, counts["replaced"])
+		self.assertEqual("new", self.handler.getEntry("Mail", "posteo")["name"])
+		with self.assertRaises(objectAlreadyExistsException.ObjectAlreadyExistsException):
+			importer.Importer(self.handler, defaultCategory="Mail", duplicates="fail").importFile(self.EXPORT + ".csv")
+		with self.assertRaises(ValueError):
+			importer.Importer(self.handler, duplicates="ignore")
+
+	def test_extraFields(self):
+		with open(self.EXPORT + ".csv", "w", encoding="utf-8") as file:
+			file.write("title,password\n")
+			file.write("site,pw,extra\n")
+			file.write("shop,pw\n")
+		counts = importer.Importer(self.handler).importFile(self.EXPORT + ".csv")
+		self.assertEqual(2, counts["added"])
+		self.assertEqual("pw", self.handler.getEntry("default", "site")["password"])
+
+	def test_renameMany(self):
+		with open(self.EXPORT + ".csv", "w", encoding="utf-8") as file:
+			file.write("title,password\n")
+			for number in range(5):
+				file.write(f"posteo,pw{number}\n")
+		counts = importer.Importer(self.handler, defaultCategory="Mail", duplicates="rename", batchSize=2).importFile(self.EXPORT + ".csv")
+		self.assertEqual(5, counts["renamed"])
+		self.assertEqual(["posteo"] + [f"posteo ({number})" for number in range(2, 7)], self.handler.getEntries("Mail"))
+		self.assertEqual("pw4", self.handler.getEntry("Mail", "posteo (6)")["password"])
+
+	def test_json(self):
+		rows = [{"name": f"site{number}", "folder": "Web", "login": {"username": "me", "password": str(number), "uris": [{"uri": "https://x.de"}]},
+				"notes": "x" * 1000} for number in range(200)]
+		with open(self.EXPORT + ".json", "w", encoding="utf-8") as file:
+			json.dump(rows, file, indent=2)
+		with open(self.EXPORT + ".jsonl", "w", encoding="utf-8") as file:
+			for row in rows:
+				file.write(json.dumps(row) + "\n")
+		importer.READ_SIZE = 512
+		try:
+			counts = importer.Importer(self.handler).importFile(self.EXPORT + ".json")
+		finally:
+			importer.READ_SIZE = 65536
+		self.assertEqual(200, counts["added"])
+		counts = importer.Importer(self.handler, categoryColumn="FOLDER", categoryMap={"Web": "Internet"}).importFile(self.EXPORT + ".jsonl")
+		self.assertEqual(200, counts["added"])
+		self.reopen()
+		self.assertEqual([f"site{number}" for number in range(200)], self.handler.getEntries("Web"))
+		entry = self.handler.getEntry("Internet", "site7")
+		self.assertEqual(("me", "7", "https://x.de"), (entry["name"], entry["password"], entry["url"]))
+
+	def test_rollbackBatch(self):
+		with open(self.EXPORT + ".csv", "w", encoding="utf-8") as file:
+			file.write("title,username,password,category\n")
+			for number in range(5):
+				file.write(f"entry{number},me,pass,New\n")
+			file.write("posteo,me,pass,Mail\n")
+		with self.assertRaises(objectAlreadyExistsException.ObjectAlreadyExistsException):
+			importer.Importer(self.handler, duplicates="fail", batchSize=4).importFile(self.EXPORT + ".csv")
+		self.assertEqual(["entry0", "entry1", "entry2", "entry3"], self.handler.getEntries("New"))
+		self.reopen()
+		self.assertEqual(["entry0", "entry1", "entry2", "entry3"], self.handler.getEntries("New"))
+
+if __name__ == "__main__":
+	unittest.main()
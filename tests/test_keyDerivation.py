@@ -0,0 +1,33 @@
+#pylint: disable=C
+import unittest
+import keyDerivation
+
+class TestKeyDerivation(unittest.TestCase):
+
+	def test_params(self):
+		self.assertEqual(("pbkdf2-sha256", {"i": 1000}), keyDerivation.parseParams("pbkdf2-sha256$i=1000"))
+		self.assertEqual(("scrypt", {"n": 1024, "r": 8, "p": 1}), keyDerivation.parseParams(keyDerivation.formatParams("scrypt", 1024)))
+		for params in ("md5$i=1", "pbkdf2-sha256$i=0", "pbkdf2-sha256$n=1000", "scrypt$n=1024;r=8", "scrypt$n=1000;r=8;p=1", "scrypt$n=x;r=8;p=1"):
+			with self.assertRaises(ValueError):
+				keyDerivation.parseParams(params)
+
+	def test_deriveKey(self):
+		key = keyDerivation.deriveKey("password", "scrypt$n=1024;r=8;p=1", bytes(16))
+		self.assertEqual(keyDerivation.KEY_LENGTH, len(key))
+		self.assertEqual(key, keyDerivation.deriveKey("password", "scrypt$n=1024;r=8;p=1", bytes(16)))
+		self.assertNotEqual(key, keyDerivation.deriveKey("password", "scrypt$n=1024;r=8;p=1", bytes(15) + b"\x01"))
+		self.assertNotEqual(key, keyDerivation.deriveKey("password", "scrypt$n=2048;r=8;p=1", bytes(16)))
+
+	def test_calibrate(self):
+		#A tiny target ends at the lower bound
+		self.assertEqual(keyDerivation.formatParams("pbkdf2-sha256", keyDerivation.MIN_COST["pbkdf2-sha256"]),
+		                 keyDerivation.calibrate(0.0001, "pbkdf2-sha256"))
+		params = keyDerivation.calibrate(0.2)
+		algorithm, values = keyDerivation.parseParams(params)
+		self.assertEqual("scrypt", algorithm)
+		self.assertGreaterEqual(values["n"], keyDerivation.MIN_COST["scrypt"])
+		with self.assertRaises(ValueError):
+			keyDerivation.calibrate(0.2, "md5")
+
+if __name__ == "__main__":
+	unittest.main()
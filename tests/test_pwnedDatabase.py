@@ -0,0 +1,51 @@
+#pylint: disable=C
+import unittest
+import os
+import hashlib
+import unittest.mock
+import cryptor
+import pwnedDatabase
+
+class TestPwnedDatabase(unittest.TestCase):
+
+	DUMP = "tests/test_pwnedDatabase_dump.txt"
+	FILE = "tests/test_pwnedDatabase_file.bin"
+	PASSWORDS = ["123456", "password", "123ABCabc.!-", "qwerty", "Nudelsalat90.,-+äöü"]
+
+	@classmethod
+	def setUpClass(cls):
+		with open(cls.DUMP, "w", encoding="utf-8") as file:
+			for password in cls.PASSWORDS + ["123456"]:
+				file.write(hashlib.sha1(password.encode("utf-8")).hexdigest().upper() + ":42\n")
+		#Small chunks, so the build merges several sorted runs in more than one pass
+		with unittest.mock.patch.object(pwnedDatabase, "CHUNK_SIZE", 2), unittest.mock.patch.object(pwnedDatabase, "MERGE_FAN_IN", 2):
+			cls.count = pwnedDatabase.PwnedDatabase.build(cls.DUMP, cls.FILE)
+		cls.database = pwnedDatabase.PwnedDatabase(cls.FILE)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.database.close()
+		os.remove(cls.DUMP)
+		os.remove(cls.FILE)
+
+	def test_build(self):
+		self.assertEqual(len(self.PASSWORDS), self.count)
+		self.assertEqual(len(self.PASSWORDS), self.database.getSize())
+		#No sorted chunk is left behind
+		self.assertEqual([], [name for name in os.listdir("tests") if name.startswith("pwned-")])
+
+	def test_containsPassword(self):
+		for password in self.PASSWORDS:
+			self.assertTrue(self.database.containsPassword(password))
+		self.assertFalse(self.database.containsPassword("nNjhZut677-.!aEjdFse9Af7"))
+		self.assertFalse(self.database.containsHash("0" * 40))
+		self.assertFalse(self.database.containsHash("F" * 40))
+
+	def test_isSafe(self):
+		localCryptor = cryptor.Cryptor()
+		localCryptor.setPwnedDatabase(self.database)
+		self.assertEqual((False, "Password is well known"), localCryptor.isSafe("123ABCabc.!-"))
+		self.assertEqual((True, ""), localCryptor.isSafe("nNjhZut677-.!aEjdFse9Af7"))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,80 @@
+#pylint: disable=C
+import unittest
+import os
+import time
+import hashlib
+import sqlite3
+import cryptor
+import rangeCache
+
+class TestRangeCache(unittest.TestCase):
+
+	FILE = "tests/test_rangeCache_file.sqlite"
+	SUFFIXES = {"0018A45C4D1DEF81644B54AB7F969B88D65", "00D4F6E8FA6EECAD2A3AA415EEC418D38EC"}
+
+	def tearDown(self):
+		self.cache.close()
+		os.remove(self.FILE)
+
+	def test_put_get(self):
+		self.cache = rangeCache.RangeCache(self.FILE)
+		self.assertIsNone(self.cache.get("21BD1"))
+		self.cache.put("21BD1", self.SUFFIXES)
+		self.assertEqual(self.SUFFIXES, self.cache.get("21BD1"))
+		self.cache.put("21BD2", set())
+		self.assertEqual(set(), self.cache.get("21BD2"))
+		self.cache.close()
+		self.cache = rangeCache.RangeCache(self.FILE)
+		self.assertEqual(self.SUFFIXES, self.cache.get("21BD1"))
+
+	def test_ttl(self):
+		self.cache = rangeCache.RangeCache(self.FILE, ttl=0.2)
+		self.cache.put("21BD1", self.SUFFIXES)
+		time.sleep(0.3)
+		self.assertIsNone(self.cache.get("21BD1"))
+		self.assertEqual(0, self.cache.getSize())
+
+	def test_lru(self):
+		size = len("\n".join(self.SUFFIXES))
+		self.cache = rangeCache.RangeCache(self.FILE, maxBytes=2 * size)
+		self.cache.put("00001", self.SUFFIXES)
+		time.sleep(0.01)
+		self.cache.put("00002", self.SUFFIXES)
+		time.sleep(0.01)
+		self.cache.get("00001")
+		time.sleep(0.01)
+		self.cache.put("00003", self.SUFFIXES)
+		self.assertEqual(2, self.cache.getSize())
+		self.assertIsNone(self.cache.get("00002"))
+		self.assertIsNotNone(self.cache.get("00001"))
+		self.assertIsNotNone(self.cache.get("00003"))
+
+	def test_batchedAccessTimes(self):
+		def readUsed():
+			with sqlite3.connect(self.FILE) as connection:
+				return connection.execute("SELECT used FROM ranges WHERE prefix = ?", ("21BD1",)).fetchone()[0]
+
+		self.cache = rangeCache.RangeCache(self.FILE)
+		self.cache.put("21BD1", self.SUFFIXES)
+		used = readUsed()
+		time.sleep(0.01)
+		#A hit does not write
+		self.cache.get("21BD1")
+		self.assertEqual(used, readUsed())
+		self.cache.close()
+		self.assertLess(used, readUsed())
+		self.cache = rangeCache.RangeCache(self.FILE)
+
+	def test_cryptor(self):
+		self.cache = rangeCache.RangeCache(self.FILE)
+		sha1 = hashlib.sha1("123ABCabc.!-".encode("utf-8")).hexdigest().upper()
+		self.cache.put(sha1[:5], {sha1[5:]})
+		cachedCryptor = cryptor.Cryptor()
+		cachedCryptor.setPwnedApi("http://127.0.0.1:9/range/")
+		cachedCryptor.setRangeCache(self.cache)
+		self.assertEqual((False, "Password is well known"), cachedCryptor.isSafe("123ABCabc.!-"))
+		cachedCryptor.clearRangeCache()
+		self.assertEqual(0, self.cache.getSize())
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,26 @@
+#pylint: disable=C
+import unittest
+import json
+import recordCompression
+
+class TestCompression(unittest.TestCase):
+
+	TEXT = json.dumps({"name": "name", "password": "password", "notices": "long notices " * 100})
+
+	def test_roundtrip(self):
+		for method in recordCompression.METHODS:
+			payload = recordCompression.compress(self.TEXT, method)
+			self.assertEqual(self.TEXT, recordCompression.decompress(payload))
+			if method != "none":
+				self.assertLess(len(payload), len(self.TEXT))
+		with self.assertRaises(ValueError):
+			recordCompression.compress(self.TEXT, "gzip")
+
+	def test_plain(self):
+		#Texts of older versions and texts that do not get smaller are the JSON itself
+		self.assertEqual(self.TEXT.encode("utf-8"), recordCompression.compress(self.TEXT, "none"))
+		self.assertEqual(b'{"a": 1}', recordCompression.compress('{"a": 1}', "zlib"))
+		self.assertEqual('{"a": "ä"}', recordCompression.decompress('{"a": "ä"}'.encode("utf-8")))
+
+if __name__ == "__main__":
+	unittest.main()
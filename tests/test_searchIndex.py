@@ -0,0 +1,38 @@
+#pylint: disable=C
+import unittest
+import searchIndex
+
+class TestSearchIndex(unittest.TestCase):
+
+	ENTRY1 = {"name": "Ben89HD", "password": "bello123", "url": "https://google.com", "notices": "Google is super", "timestamp": "2024-07-27"}
+	ENTRY2 = {"name": "Ben.Oeckl", "password": "bel875!", "url": "https://dhbw-moodle.de", "notices": "Nothing to do", "timestamp": "2023-11-04"}
+
+	def setUp(self):
+		self.index = searchIndex.SearchIndex()
+		self.index.add("1", "Web", "Google", self.ENTRY1)
+		self.index.add("2", "DHBW", "Moodle", self.ENTRY2)
+
+	def test_search(self):
+		self.assertEqual({"Web": ["Google"]}, self.index.search("google.com"))
+		self.assertEqual({"DHBW": ["Moodle"], "Web": ["Google"]}, self.index.search("Ben"))
+		self.assertEqual({"DHBW": ["Moodle"]}, self.index.search("w-"))
+		self.assertEqual({"Web": ["Google"]}, self.index.search("gle is sup"))
+		self.assertEqual({}, self.index.search("Google Web"))
+		self.assertEqual({"DHBW": ["Moodle"], "Web": ["Google"]}, self.index.search(""))
+
+	def test_noPasswords(self):
+		self.assertEqual({}, self.index.search("bello123"))
+		self.assertEqual({}, self.index.search("!"))
+
+	def test_remove(self):
+		self.index.remove("1")
+		self.assertEqual({}, self.index.search("google"))
+		self.assertEqual({"DHBW": ["Moodle"]}, self.index.search("Ben"))
+
+	def test_update(self):
+		self.index.add("1", "Web", "Google", dict(self.ENTRY1, notices="Search engine"))
+		self.assertEqual({}, self.index.search("super"))
+		self.assertEqual({"Web": ["Google"]}, self.index.search("engine"))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,107 @@
+#pylint: disable=C
+import unittest
+import os
+import time
+import threading
+from unittest import mock
+import cryptor
+import unlockAgent
+
+class TestUnlockAgent(unittest.TestCase):
+
+	KEY = "Test123"
+	HASH = "68644f3dd172089ae9a650e582ae4759df2ed943291b70729abbc96bca2521ac34f2fad8971c50210e173bd506f3c8e4260f932fd99c3b59c1884fd816cb24ee"
+
+	@classmethod
+	def setUpClass(cls):
+		cls.DIRECTORY = unlockAgent.newSocketDirectory()
+		cls.SOCKET = os.path.join(cls.DIRECTORY, "agent.sock")
+
+	@classmethod
+	def tearDownClass(cls):
+		os.rmdir(cls.DIRECTORY)
+
+	def setUp(self):
+		self.agent = unlockAgent.UnlockAgent(self.SOCKET, 0.5)
+		self.thread = threading.Thread(target=self.agent.serveForever)
+		self.thread.start()
+		self.client = unlockAgent.AgentClient(self.SOCKET)
+
+	def tearDown(self):
+		self.agent.shutdown()
+		self.thread.join()
+
+	def test_addKey_getKey(self):
+		self.assertIsNone(self.client.getKey("id", "proof"))
+		self.client.addKey("id", "masterKey", "proof")
+		self.assertEqual("masterKey", self.client.getKey("id", "proof"))
+		self.client.removeKey("id")
+		self.assertIsNone(self.client.getKey("id", "proof"))
+
+	def test_wrongProof(self):
+		self.client.addKey("id", "masterKey", "proof")
+		for _ in range(unlockAgent.MAX_FAILURES - 1):
+			self.assertIsNone(self.client.getKey("id", "wrong"))
+		self.assertEqual("masterKey", self.client.getKey("id", "proof"))
+		self.assertIsNone(self.client.getKey("id", "wrong"))
+		#Forgotten after too many wrong proofs
+		self.assertIsNone(self.client.getKey("id", "proof"))
+
+	def test_addKeepsFailures(self):
+		self.client.addKey("id", "masterKey", "proof")
+		for _ in range(unlockAgent.MAX_FAILURES - 1):
+			self.assertIsNone(self.client.getKey("id", "wrong"))
+		#Adding the key again does not allow more guesses
+		self.client.addKey("id", "masterKey", "proof")
+		self.assertIsNone(self.client.getKey("id", "wrong"))
+		self.assertIsNone(self.client.getKey("id", "proof"))
+
+	def test_socketDirectory(self):
+		self.assertEqual(0o700, os.stat(self.DIRECTORY).st_mode & 0o777)
+
+	def test_foreignAgent(self):
+		#An agent of another user gets nothing
+		with mock.patch("os.getuid", return_value=os.getuid() + 1):
+			self.client.addKey("id", "masterKey", "proof")
+			self.assertIsNone(self.client.getKey("id", "proof"))
+		self.assertIsNone(self.client.getKey("id", "proof"))
+
+	def test_ttl(self):
+		self.client.addKey("id", "masterKey", "proof")
+		time.sleep(0.6)
+		self.assertIsNone(self.client.getKey("id", "proof"))
+
+	def test_lock(self):
+		self.client.addKey("id", "masterKey", "proof")
+		self.client.lock()
+		self.assertIsNone(self.client.getKey("id", "proof"))
+
+	def test_noAgent(self):
+		self.assertIsNone(unlockAgent.AgentClient(self.SOCKET + ".missing").getKey("id", "proof"))
+
+	def test_sharedKey(self):
+		cryptor1 = cryptor.Cryptor()
+		cryptor1.setAgent(self.client)
+		self.assertTrue(cryptor1.isCorrectKey(self.KEY, self.HASH))
+		encryptedText = cryptor1.encryptText("text")
+
+		cryptor2 = cryptor.Cryptor()
+		cryptor2.setAgent(self.client)
+		start = time.perf_counter()
+		self.assertTrue(cryptor2.isCorrectKey(self.KEY, self.HASH))
+		self.assertLess(time.perf_counter() - start, 0.05)
+		self.assertEqual("text", cryptor2.decryptText(encryptedText))
+
+	def test_wrongPassword(self):
+		cryptor1 = cryptor.Cryptor()
+		cryptor1.setKdfParams("pbkdf2-sha256$i=1000")
+		cryptor1.setAgent(self.client)
+		hashedKey = cryptor1.newKey(self.KEY)
+		#The agent holds the key of the account, but only hands it out for the right password
+		cryptor2 = cryptor.Cryptor()
+		cryptor2.setAgent(self.client)
+		self.assertFalse(cryptor2.isCorrectKey("wrong", hashedKey))
+		self.assertTrue(cryptor2.isCorrectKey(self.KEY, hashedKey))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,100 @@
+#pylint: disable=C
+import unittest
+import os
+import tempfile
+import cryptor
+import dataHandler
+import importer
+import vaultAdmin
+
+class TestVaultAdmin(unittest.TestCase):
+
+	FILE = "tests/test_vaultAdmin_file.csv"
+	USERS = {"user1": "testKey1", "user2": "testKey2", "user3": "testKey3"}
+
+	def setUp(self):
+		handler = dataHandler.DataHandler(cryptor.Cryptor())
+		handler.createFile(self.FILE, "user1", handler.getCryptor().hashKey(self.USERS["user1"], True))
+		handler.openFile(self.FILE)
+		for user in ("user2", "user3"):
+			handler.addUser(user, handler.getCryptor().hashKey(self.USERS[user], True))
+		for user, key in self.USERS.items():
+			handler.openFile(self.FILE)
+			handler.getCryptor().isCorrectKey(key, handler.getKey(user))
+			handler.startSession()
+			handler.addCategory("Mail")
+			for number in range(20):
+				handler.addEntry("Mail", f"{user}-{number}", "name", f"Strong!Pass{number}", "url", "notices", "timestamp")
+			handler.addEntry("Mail", "weak", "name", "weak", "url", "notices", "timestamp")
+			handler.closeSession()
+
+	def tearDown(self):
+		for path in (self.FILE, self.FILE + ".lock"):
+			if os.path.exists(path):
+				os.remove(path)
+
+	def openSession(self, user):
+		handler = vaultAdmin.openAccount(self.FILE, user, self.USERS[user])
+		handler.startSession()
+		return handler
+
+	def test_reencrypt(self):
+		before = {user: dataHandler.openStorage(self.FILE).loadRecords(user)[0] for user in self.USERS}
+		self.assertEqual({user: 22 for user in self.USERS}, vaultAdmin.reencryptAccounts(self.FILE, self.USERS, 2, "pbkdf2-sha256$i=1000"))
+		storage = dataHandler.openStorage(self.FILE)
+		for user in self.USERS:
+			self.assertTrue(storage.getKey(user).startswith("$pbkdf2-sha256$i=1000$"))
+			records = storage.loadRecords(user)[0]
+			self.assertEqual(set(before[user]), set(records))
+			self.assertFalse(set(before[user].values()) & set(records.values()))
+			handler = self.openSession(user)
+			self.assertEqual("Strong!Pass7", handler.getEntry("Mail", f"{user}-7")["password"])
+			handler.closeSession()
+
+	def test_wrongPassword(self):
+		keys = dict(self.USERS, user2="wrong")
+		with self.assertRaises(ValueError) as context:
+			vaultAdmin.reencryptAccounts(self.FILE, keys, 1, "pbkdf2-sha256$i=1000")
+		self.assertIn("user2", str(context.exception))
+		#The other accounts are done anyway
+		self.assertTrue(dataHandler.openStorage(self.FILE).getKey("user3").startswith("$"))
+		self.assertFalse(dataHandler.openStorage(self.FILE).getKey("user2").startswith("$"))
+
+	def test_auditExport(self):
+		with tempfile.TemporaryDirectory() as directory:
+			pwnedPath = os.path.join(directory, "pwned.bin")
+			open(pwnedPath, "wb").close()
+			reports = vaultAdmin.auditAccounts(self.FILE, self.USERS, 2, pwnedPath)
+			self.assertEqual({user: [("Mail", "weak")] for user in self.USERS}, {user: report["weak"] for user, report in reports.items()})
+			self.assertEqual({user: 21 for user in self.USERS}, vaultAdmin.exportAccounts(self.FILE, self.USERS, directory))
+			rows = list(importer.readFile(os.path.join(directory, "user2.jsonl")))
+			self.assertEqual(21, len(rows))
+			self.assertEqual({"user2"}, {row["account"] for row in rows})
+
+	def test_exportName(self):
+		handler = vaultAdmin.openAccount(self.FILE, "user1", self.USERS["user1"])
+		handler.addUser("../evil", handler.getCryptor().hashKey("evilKey", True))
+		with tempfile.TemporaryDirectory() as parent:
+			directory = os.path.join(parent, "out")
+			os.mkdir(directory)
+			with self.assertRaises(ValueError) as context:
+				vaultAdmin.exportAccounts(self.FILE, {"user1": self.USERS["user1"], "../evil": "evilKey"}, directory, workers=1)
+			self.assertIn("../evil", str(context.exception))
+			self.assertEqual(["out"], os.listdir(parent))
+			self.assertEqual(["user1.jsonl"], os.listdir(directory))
+
+	def test_otherErrors(self):
+		calls = []
+		def function(user):
+			calls.append(user)
+			if user == "user2":
+				raise RuntimeError("broken")
+			return user
+		with self.assertRaises(ValueError) as context:
+			vaultAdmin.runAccounts(function, {user: (user,) for user in self.USERS}, 1)
+		self.assertEqual("Failed: user2: RuntimeError broken", str(context.exception))
+		#The jobs after the failed one are run anyway
+		self.assertEqual(list(self.USERS), calls)
+
+if __name__ == "__main__":
+	unittest.main()